@@ -0,0 +1,43 @@
+from powerdata_view.benchmark import run_benchmark, load_baseline, save_baseline, compare_to_baseline
+
+import warnings
+warnings.filterwarnings('ignore')
+
+import hydra
+import json
+import os
+os.environ["HYDRA_FULL_ERROR"] = "1"
+
+
+@hydra.main(version_base=None, config_path="config", config_name="benchmark")
+def main(cfg):
+
+    # Generate a synthetic dataset, and time each stage of the pipeline. Relative paths are relative to the launch
+    # directory, so that baselines are shared between runs.
+    work_dir = hydra.utils.to_absolute_path(cfg.work_dir)
+    baseline_path = hydra.utils.to_absolute_path(cfg.baseline_path)
+    results = run_benchmark(work_dir, cfg.source, n_samples=cfg.n_samples, n_snapshots=cfg.n_snapshots,
+                            n_versions=cfg.n_versions, metrics_processor_name=cfg.metrics_processor_name,
+                            metrics_processor_settings=cfg.metrics_processor_settings, storage_name=cfg.storage_name,
+                            compute_settings=cfg.compute_settings, render_settings=cfg.render_settings,
+                            render_metrics=cfg.render_metrics, figure_settings=cfg.figure_settings, seed=cfg.seed)
+
+    # Compare with the baseline, and save results in the output directory.
+    baseline = load_baseline(baseline_path)
+    table, regressions = compare_to_baseline(results, baseline, tolerance=cfg.tolerance)
+    print(table)
+    save_path = hydra.core.hydra_config.HydraConfig.get().runtime.output_dir
+    with open(os.path.join(save_path, "benchmark.json"), 'w') as f:
+        json.dump(results, f, indent=1)
+    with open(os.path.join(save_path, "benchmark.txt"), 'w') as f:
+        f.write(table + '\n')
+    if (baseline is None) or cfg.update_baseline:
+        save_baseline(results, baseline_path)
+        print("Baseline saved to {}.".format(baseline_path))
+    elif regressions:
+        print("{} stages are more than {:.0%} slower than the baseline: {}.".format(
+            len(regressions), cfg.tolerance, ", ".join(regressions)))
+
+
+if __name__ == '__main__':
+    main()
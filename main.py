@@ -12,16 +12,31 @@ os.environ["HYDRA_FULL_ERROR"] = "1"
 @hydra.main(version_base=None, config_path="config", config_name="config")
 def main(cfg):
 
+    # Stages of the run are timed, and the report is saved along with tables and figures.
+    pv.stage_profiler.reset()
+    pv.stage_profiler.set_sample_profiler(cfg.profile_settings.sample_profiler)
+
     # Check if metrics have already been computed for each dataset version. If not, computes them.
-    metrics_processor = get_metrics_processor(cfg.metrics_processor_name)
-    for version in cfg.dataset_versions:
-        pv.compute_save_metrics(version.path, metrics_processor, cfg.metrics_processor_name)
+    # If the simulator of the metrics processor is not installed, only metrics that are already cached are compared.
+    storage = pv.get_storage(cfg.storage_name)
+    try:
+        metrics_processor = get_metrics_processor(cfg.metrics_processor_name, **cfg.metrics_processor_settings)
+    except ImportError as e:
+        print("{} is not available ({}). Only cached metrics are compared.".format(cfg.metrics_processor_name, e))
+        metrics_processor = None
+    if metrics_processor is not None:
+        for version in cfg.dataset_versions:
+            pv.compute_save_metrics(version.path, metrics_processor, cfg.metrics_processor_name, storage,
+                                    metrics_selection=cfg.metrics_selection, **cfg.compute_settings)
 
     # Load metrics and compare the different versions.
-    df_dict_dict = pv.load_multiple_metrics(cfg.dataset_versions, cfg.metrics_processor_name)
+    df_dict_dict = pv.load_multiple_metrics(cfg.dataset_versions, cfg.metrics_processor_name, storage)
     color_dict = {version.name: version.color for version in cfg.dataset_versions}
     save_path = hydra.core.hydra_config.HydraConfig.get().runtime.output_dir
-    pv.compare_exhaustive(df_dict_dict, color_dict, save_path, **cfg.modes, **cfg.figure_settings)
+    pv.compare_exhaustive(df_dict_dict, color_dict, save_path, metrics_selection=cfg.metrics_selection, **cfg.modes,
+                          **cfg.figure_settings, **cfg.render_settings)
+    if cfg.profile_settings.report:
+        pv.stage_profiler.save_report(save_path)
 
 
 if __name__ == '__main__':
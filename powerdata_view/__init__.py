@@ -2,4 +2,10 @@ from powerdata_view.metrics_processor import *
 from powerdata_view.metrics import *
 from powerdata_view.compare import *
 from powerdata_view.plot import *
+from powerdata_view.profiling import *
+from powerdata_view.render import *
+from powerdata_view.samples import *
+from powerdata_view.selection import *
+from powerdata_view.statistics import *
+from powerdata_view.storage import *
 from powerdata_view.utils import *
@@ -0,0 +1,197 @@
+import shutil
+import json
+import time
+import os
+import numpy as np
+from tabulate import tabulate
+
+from powerdata_view.compare import aggregate_versions, compare_exhaustive
+from powerdata_view.metrics import compute_save_metrics, compute_metrics, load_metrics, save_metrics, \
+    load_multiple_metrics
+from powerdata_view.metrics_processor import get_metrics_processor
+from powerdata_view.storage import get_storage
+
+
+# Test networks of pandapower that may be used as benchmark sources, from small to large grids.
+BENCHMARK_NETWORKS = ["case30", "case118", "case1354pegase"]
+
+
+def load_source_network(source):
+    """Loads the network from which synthetic samples are generated: a pandapower JSON file or a test network."""
+    import pandapower as pp
+    if source in BENCHMARK_NETWORKS:
+        import pandapower.networks as pn
+        power_grid = getattr(pn, source)()
+    else:
+        power_grid = pp.from_json(source)
+    # Samples store power flow results, which are used to initialize power flows.
+    pp.runpp(power_grid, enforce_q_lims=True, delta_q=0.)
+    return power_grid
+
+
+def generate_samples(data_dir, source, n_samples, load_std=0.1, seed=0):
+    """Generates a synthetic pandapower dataset of `n_samples` samples in `data_dir`, from a source network.
+
+    Loads are scaled by a random factor shared by the whole grid, and by an independent factor per load, both of
+    standard deviation `load_std`. Generators are scaled by the shared factor. Existing samples are kept, so that
+    datasets can be grown incrementally.
+    """
+    import pandapower as pp
+    os.makedirs(data_dir, exist_ok=True)
+    power_grid = load_source_network(source)
+    rng = np.random.default_rng(seed)
+    load_p, load_q, gen_p = power_grid.load.p_mw.values, power_grid.load.q_mvar.values, power_grid.gen.p_mw.values
+    for i in range(n_samples):
+        shared = 1. + load_std * rng.standard_normal()
+        individual = 1. + load_std * rng.standard_normal(len(load_p))
+        filepath = os.path.join(data_dir, "sample_{:06d}.json".format(i))
+        if os.path.exists(filepath):
+            continue
+        power_grid.load.p_mw = load_p * shared * individual
+        power_grid.load.q_mvar = load_q * shared * individual
+        power_grid.gen.p_mw = gen_p * shared
+        pp.to_json(power_grid, filepath)
+
+
+def generate_metrics(metrics_dir, df_dict, n_snapshots, storage, noise_std=0.01, seed=0):
+    """Generates synthetic metrics of `n_snapshots` snapshots, by resampling the rows of computed metrics.
+
+    Float metrics are perturbed by a relative noise of standard deviation `noise_std`, so that versions generated with
+    different seeds differ. This allows to benchmark storage, aggregation and rendering at scales that would take too
+    long to simulate.
+    """
+    os.makedirs(metrics_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    rows = None
+    out = {}
+    for name, df in df_dict.items():
+        if rows is None:
+            rows = rng.integers(len(df.index), size=n_snapshots)
+        out[name] = df.iloc[rows % len(df.index)].copy() if len(df.index) else df
+        out[name].index = ["sample_{:06d}".format(i) for i in range(len(out[name].index))]
+        float_columns = out[name].select_dtypes('float').columns
+        noise = 1. + noise_std * rng.standard_normal((len(out[name].index), len(float_columns)))
+        out[name][float_columns] = out[name][float_columns].to_numpy() * noise
+    save_metrics(out, metrics_dir, storage)
+
+
+class BenchmarkVersion:
+    """Dataset version of a benchmark, with the same attributes as the dataset versions of the configuration file."""
+
+    def __init__(self, name, path, color):
+        self.name = name
+        self.path = path
+        self.color = color
+
+
+def timed_stage(results, stage, func, *args, **kwargs):
+    """Runs func(*args, **kwargs), and records its wall time in seconds as `stage` in `results`."""
+    start = time.perf_counter()
+    out = func(*args, **kwargs)
+    results[stage] = time.perf_counter() - start
+    return out
+
+
+def run_benchmark(work_dir, source, n_samples=100, n_snapshots=(1000, 10000), n_versions=2,
+                  metrics_processor_name="PandaPowerMetricsProcessor", metrics_processor_settings=None,
+                  storage_name="ParquetStorage", compute_settings=None, render_settings=None, render_metrics=None,
+                  figure_settings=None, seed=0):
+    """Runs the benchmark, and returns the wall time (in seconds) of each stage.
+
+    `n_samples` samples are generated from `source` in `work_dir`, and the following stages are timed:
+        - `ingestion`: building the binary sample cache (see `cache_samples`) ;
+        - `compute`: computing and saving all metrics with `compute_save_metrics` (from the sample cache) ;
+        - `compute_uncached`: computing all metrics with `compute_metrics`, parsing samples again.
+    Then, for each size of `n_snapshots`, synthetic metrics of `n_versions` versions are generated, and:
+        - `storage/<size>`: saving and loading all metrics with the `storage_name` backend ;
+        - `aggregation/<size>`: building all aggregates of all metrics in `all` and `object` focus ;
+        - `rendering/<size>`: rendering tables and plots of the `render_metrics` metrics (all if None) in `all` focus.
+    """
+    metrics_processor_settings = dict(metrics_processor_settings or {}, cache_samples=True)
+    compute_settings = compute_settings or {}
+    render_settings = render_settings or {}
+    figure_settings = figure_settings or {}
+    storage = get_storage(storage_name)
+    results = {}
+
+    data_dir = os.path.join(work_dir, "data")
+    generate_samples(data_dir, source, n_samples, seed=seed)
+    metrics_processor = get_metrics_processor(metrics_processor_name, **metrics_processor_settings)
+    shutil.rmtree(os.path.join(data_dir, "powerdata_view"), ignore_errors=True)
+    timed_stage(results, "ingestion", metrics_processor.ingest, data_dir)
+    timed_stage(results, "compute", compute_save_metrics, data_dir, metrics_processor, metrics_processor_name,
+                storage, **compute_settings)
+    uncached_processor = get_metrics_processor(metrics_processor_name, **dict(metrics_processor_settings,
+                                                                              cache_samples=False))
+    timed_stage(results, "compute_uncached", compute_metrics, data_dir, uncached_processor, **compute_settings)
+    df_dict = load_metrics(os.path.join(data_dir, "powerdata_view", metrics_processor_name), storage)
+
+    for size in n_snapshots:
+        versions = []
+        for k in range(n_versions):
+            version_dir = os.path.join(work_dir, "metrics_{}".format(size), "version_{}".format(k))
+            metrics_dir = os.path.join(version_dir, "powerdata_view", metrics_processor_name)
+            shutil.rmtree(version_dir, ignore_errors=True)
+            generate_metrics(metrics_dir, df_dict, size, storage, seed=seed + k)
+            versions.append(BenchmarkVersion("version_{}".format(k), version_dir, "C{}".format(k)))
+
+        def storage_round_trip():
+            for version in versions:
+                metrics_dir = os.path.join(version.path, "powerdata_view", metrics_processor_name)
+                save_metrics(load_metrics(metrics_dir, storage), metrics_dir, storage)
+        timed_stage(results, "storage/{}".format(size), storage_round_trip)
+
+        df_dict_dict = load_multiple_metrics(versions, metrics_processor_name, storage)
+
+        def aggregate_all():
+            for metrics_name in df_dict_dict:
+                for focus in ["all", "object"]:
+                    for _ in aggregate_versions(metrics_name, df_dict_dict[metrics_name], focus=focus):
+                        pass
+                df_dict_dict.release(metrics_name)
+        timed_stage(results, "aggregation/{}".format(size), aggregate_all)
+
+        render_dir = os.path.join(work_dir, "outputs_{}".format(size))
+        shutil.rmtree(render_dir, ignore_errors=True)
+        os.makedirs(render_dir)
+        color_dict = {version.name: version.color for version in versions}
+        modes = dict(display_modes={"table": True, "plot": True}, statistics_modes={"summary": True},
+                     focus_modes={"all": True})
+        timed_stage(results, "rendering/{}".format(size), compare_exhaustive, df_dict_dict, color_dict, render_dir,
+                    metrics_selection={"include": list(render_metrics or [])}, **modes, **figure_settings,
+                    **render_settings)
+    return results
+
+
+def load_baseline(path):
+    """Loads the stage timings of a baseline benchmark run, or returns None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_baseline(results, path):
+    """Saves the stage timings of a benchmark run as baseline."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=1)
+
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """Compares stage timings to a baseline, and returns the comparison table along with the regressed stages.
+
+    A stage has regressed if it is more than `tolerance` (relative) slower than in the baseline.
+    """
+    table, regressions = [], []
+    for stage, elapsed in results.items():
+        reference = None if baseline is None else baseline.get(stage)
+        ratio = None if not reference else elapsed / reference
+        regressed = (ratio is not None) and (ratio > 1. + tolerance)
+        if regressed:
+            regressions.append(stage)
+        table.append([stage, "{:.3f}".format(elapsed), "" if reference is None else "{:.3f}".format(reference),
+                      "" if ratio is None else "{:.2f}".format(ratio), "REGRESSION" if regressed else ""])
+    table = tabulate(table, headers=["Stage", "Time (s)", "Baseline (s)", "Ratio", ""], tablefmt='plain',
+                     numalign="right", disable_numparse=True)
+    return table, regressions
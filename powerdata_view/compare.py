@@ -1,33 +1,55 @@
+from functools import partial
 import numpy as np
 
 from powerdata_view.plot import plot_float_summary, plot_float_summary_grid, plot_float_correlation, \
-     plot_bool_summary, plot_float_summary_boxplot
+     plot_bool_summary, plot_float_summary_boxplot, FloatSummary, CorrelationSummary
+from powerdata_view.metrics import LazyMetrics
+from powerdata_view.profiling import stage_profiler
+from powerdata_view.render import RenderScheduler
+from powerdata_view.selection import select_metrics
+from powerdata_view.statistics import AggregateAccumulator, compute_statistics, format_values, iter_chunks
+from powerdata_view.storage import restore_bool_dtype
 from powerdata_view.utils import slugify, make_dir
 from tabulate import tabulate
 import matplotlib.pyplot as plt
 
 import pandas as pd
+import warnings
 import tqdm
 import os
 
 
-def display_table(key, df, path, statistics="summary"):
-    """Displays comparison tables. Depends on the desired statistics (summary or correlation), and on the data type."""
-    data_type = df.stack().dtype
-    if data_type in ['bool', 'object']:
-        if statistics == "summary":
-            table = pd.DataFrame((df.sum() / df.count()).map("{:.1%}".format), columns=['Percentage'])
-        elif statistics == "correlation":
-            table = df.corr().apply(lambda s: s.apply(lambda x: '{:.2e}'.format(x)))
-        else:
-            raise ValueError("Statistics {} is not valid.".format(statistics))
-    elif data_type in ['float', 'int']:
-        if statistics == "summary":
-            table = df.describe().apply(lambda s: s.apply(lambda x: '{:.2e}'.format(x)))
-        elif statistics == "correlation":
-            table = df.corr().apply(lambda s: s.apply(lambda x: '{:.2e}'.format(x)))
-        else:
-            raise ValueError("Statistics {} is not valid.".format(statistics))
+def display_table(key, df, path, statistics="summary", n_rows=None):
+    """Displays comparison tables. Depends on the desired statistics (summary or correlation), and on the data type.
+
+    Statistics are computed in a single pass over chunks of rows (see `StreamingStatistics`), and formatted at once.
+    If `n_rows` (number of rows of each version if all samples had been processed) is provided, the share of missing
+    rows is displayed along with percentages of boolean metrics.
+    """
+    if statistics not in ["summary", "correlation"]:
+        raise ValueError("Statistics {} is not valid.".format(statistics))
+    # Aggregates read by chunks come with their statistics.
+    if isinstance(df, AggregateAccumulator):
+        is_bool, stats = df.is_bool, df.statistics
+    else:
+        is_bool, stats = all(pd.api.types.is_bool_dtype(dtype) for dtype in df.dtypes), None
+    if statistics == "correlation":
+        if stats is None:
+            stats = compute_statistics(iter_chunks(df), df.columns, quantiles=(), correlation=True)
+        table = format_values(stats.correlation(), "%.2e")
+    elif is_bool:
+        if stats is None:
+            stats = compute_statistics(iter_chunks(df), df.columns, quantiles=(), correlation=False)
+        summary = stats.summary()
+        count, percentage = summary.loc["count"], summary.loc["mean"]
+        table = pd.DataFrame({'Percentage': format_values(100 * percentage, "%.1f%%")})
+        if n_rows is not None:
+            n_rows = np.maximum(n_rows, count)
+            table['Failed'] = format_values(100 * (n_rows - count) / n_rows, "%.1f%%")
+    else:
+        if stats is None:
+            stats = compute_statistics(iter_chunks(df), df.columns, correlation=False)
+        table = format_values(stats.summary(), "%.2e")
 
     if path is not None:
         key_slug = slugify(key)
@@ -37,8 +59,11 @@ def display_table(key, df, path, statistics="summary"):
             f.write(tabulate(table, headers='keys', tablefmt='latex', numalign="right", disable_numparse=True))
 
 
-def display_plot(key, color_dict, df, path, statistics="summary", val_range=None, **kwargs):
-    """Displays comparison plots. Depends on the desired statistics (summary or correlation), and on the data type."""
+def display_plot(key, color_dict, df, path, statistics="summary", val_range=None, n_rows=None, **kwargs):
+    """Displays comparison plots. Depends on the desired statistics (summary or correlation), and on the data type.
+
+    Aggregates read by chunks (see `AggregateAccumulator`) are plotted from their accumulators.
+    """
 
     night_mode = kwargs.get("night_mode", False)
     if night_mode:
@@ -48,89 +73,354 @@ def display_plot(key, color_dict, df, path, statistics="summary", val_range=None
     grid = kwargs.get("grid", None)
     extension = kwargs.get("extension", ".pdf")
     title = kwargs.get("title", True)
+    correlation_mode = kwargs.get("correlation_mode", "scatter")
+    max_scatter_points = kwargs.get("max_scatter_points", None)
 
-    data_type = df.stack().dtype
-    if data_type in ['bool', 'object']:
+    chunked = isinstance(df, AggregateAccumulator)
+    if chunked:
+        is_bool, is_float = df.is_bool, not df.is_bool
+    else:
+        data_type = df.stack().dtype
+        is_bool, is_float = pd.api.types.is_bool_dtype(data_type), pd.api.types.is_float_dtype(data_type)
+    if is_bool:
         if statistics == "summary":
-            plot_bool_summary(df, key, path, figsize, colors, extension=extension, title=title)
+            plot_bool_summary(df, key, path, figsize, colors, extension=extension, title=title, n_rows=n_rows)
         elif statistics == "correlation":
             pass ## Correlation plots for bool are not that interesting.
             #plot_bool_correlation(df, key, path, figsize, dpi, colors)
-    elif data_type == 'float':
+    elif is_float:
         if statistics == "summary":
-            plot_float_summary(df, val_range, key, path, figsize, colors, log=True, extension=extension, title=title)
-            plot_float_summary(df, val_range, key, path, figsize, colors, log=False, extension=extension, title=title)
-            plot_float_summary_grid(df, val_range, key, path, figsize, colors, log=True, grid=grid, extension=extension, title=title)
-            plot_float_summary_grid(df, val_range, key, path, figsize, colors, log=False, grid=grid, extension=extension, title=title)
-            plot_float_summary_boxplot(df, val_range, key, path, figsize, colors, extension=extension, title=title)
+            # Histograms and boxplot statistics are computed once, and shared by all plots.
+            summary = FloatSummary.from_accumulator(df) if chunked else FloatSummary(df, val_range)
+            plot_float_summary(df, val_range, key, path, figsize, colors, log=True, extension=extension, title=title,
+                               summary=summary)
+            plot_float_summary(df, val_range, key, path, figsize, colors, log=False, extension=extension, title=title,
+                               summary=summary)
+            plot_float_summary_grid(df, val_range, key, path, figsize, colors, log=True, grid=grid,
+                                    extension=extension, title=title, summary=summary)
+            plot_float_summary_grid(df, val_range, key, path, figsize, colors, log=False, grid=grid,
+                                    extension=extension, title=title, summary=summary)
+            plot_float_summary_boxplot(df, val_range, key, path, figsize, colors, extension=extension, title=title,
+                                       summary=summary)
         elif statistics == "correlation":
-            plot_float_correlation(df, key, path, figsize, colors, night_mode, extension=extension, title=title)
+            summary = CorrelationSummary.from_accumulator(df) if chunked else None
+            plot_float_correlation(df, key, path, figsize, colors, night_mode, extension=extension, title=title,
+                                   mode=correlation_mode, max_points=max_scatter_points, summary=summary)
 
 
-def aggregate_versions(metrics_name, df_dict, focus="all"):
+def align_versions(df_dict):
+    """Reindexes all versions of a metrics to a shared snapshot index and shared object columns, in one go.
+
+    Returns an array of shape (n_versions, n_snapshots, n_objects), along with snapshot and object names, and whether
+    the metrics is boolean. Snapshots and objects of the first version come first. Boolean metrics are stored as floats,
+    so that missing values can be represented as NaN.
+    """
+    frames = [restore_bool_dtype(df) for df in df_dict.values()]
+    snapshots, objects = frames[0].index, frames[0].columns
+    for df in frames[1:]:
+        snapshots = snapshots.append(df.index[~df.index.isin(snapshots)])
+        objects = objects.append(df.columns[~df.columns.isin(objects)])
+    is_bool = all(pd.api.types.is_bool_dtype(dtype) for df in frames for dtype in df.dtypes)
+
+    values = []
+    for df in frames:
+        if not (df.index.equals(snapshots) and df.columns.equals(objects)):
+            df = df.reindex(index=snapshots, columns=objects)
+        values.append(df.to_numpy(dtype=float, na_value=np.nan) if is_bool else df.to_numpy())
+    return np.stack(values), snapshots, objects, is_bool
+
+
+def get_val_range(values):
+    """Range of values displayed in plots: the min-max range of all versions, widened by 10% on both sides."""
+    if values.size == 0:
+        _min, _max = np.nan, np.nan
+    else:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            _min, _max = 1. * np.nanmin(values), 1. * np.nanmax(values)
+    return [_min - 0.1 * (_max - _min), _max + 0.1 * (_max - _min)]
+
+
+def make_aggregate(values, index, versions, is_bool):
+    """Wraps an array of shape (n_rows, n_versions) into a dataframe, without copying it unless it is boolean."""
+    df = pd.DataFrame(values, index=index, columns=versions, copy=False)
+    if is_bool:
+        df = df.astype('boolean') if np.isnan(values).any() else df.astype(bool)
+    return df
+
+
+def aggregate_versions(metrics_name, df_dict, focus="all", n_samples=None):
     """Aggregates together multiple versions of a metrics, depending on the focus. One column per version.
 
         - If focus is set to ``all'', all objects and snapshots are considered and concatenated in the same vector.
-        - If focus is set to ``snapshot'', each snapshot is considered separately.
-        - If focus is set to ``object'', each object is considered separately
+        - If focus is set to ``snapshot'', each snapshot (of the first version) is considered separately.
+        - If focus is set to ``object'', each object (of the first version) is considered separately.
 
+    This is a generator that lazily yields tuples (aggregate_name, aggregate_df, val_range, n_rows), so that a single
+    aggregate is built at a time. All versions are first aligned on shared snapshots and objects, and aggregates are
+    views of the aligned data. Missing values are set to NaN. The same range of values is used for all aggregates.
+    If the number of samples of each version (including those that could not be processed) is provided as
+    `n_samples`, `n_rows` is the number of rows each version would have if all samples had been processed. It is None
+    otherwise, and in snapshot focus.
     """
-    object_list = list(next(iter(df_dict.values())).columns.values)
-    snapshot_list = list(next(iter(df_dict.values())).index.values)
+    versions = list(df_dict.keys())
+    values, snapshots, objects, is_bool = align_versions(df_dict)
+    val_range = get_val_range(values)
+    first = next(iter(df_dict.values()))
+    if (n_samples is not None) and any(n_samples.get(version) is None for version in versions):
+        n_samples = None
 
-    out = {}
-    val_range = {}
-    tmp = pd.concat([pd.DataFrame(data=v.stack(), columns=[k]) for k, v in df_dict.items()], axis=1)
-    _min, _max = 1.*tmp.min().min(), 1.*tmp.max().max()
     if focus == "all":
-        out[metrics_name] = pd.concat([pd.DataFrame(data=v.stack(), columns=[k]) for k, v in df_dict.items()], axis=1)
-        val_range[metrics_name] = [_min - 0.1 * (_max - _min), _max + 0.1 * (_max - _min)]
+        flat = values.reshape(len(versions), -1).T
+        keep = ~pd.isna(flat).all(axis=1)
+        index = pd.MultiIndex.from_product([snapshots, objects])[keep]
+        n_rows = None if n_samples is None else \
+            pd.Series({version: n_samples[version] * df.shape[1] for version, df in df_dict.items()})
+        yield metrics_name, make_aggregate(flat[keep], index, versions, is_bool), val_range, n_rows
     elif focus == "snapshot":
-        for snapshot_name in snapshot_list:
-            dict_ = {}
-            for k, v in df_dict.items():
-                if snapshot_name in v.index.to_list():
-                    dict_[k] = v.loc[snapshot_name]
-                else:
-                    dict_[k] = np.nan
-            out[metrics_name + ' - ' + snapshot_name] = pd.DataFrame(dict_)
-            # out[metrics_name+' - '+snapshot_name] = pd.DataFrame({k: v.loc[snapshot_name] for k, v in df_dict.items()})
-            val_range[metrics_name+' - '+snapshot_name] = [_min - 0.1 * (_max - _min), _max + 0.1 * (_max - _min)]
+        for i, snapshot_name in zip(snapshots.get_indexer(first.index), first.index):
+            aggregate_name = '{} - {}'.format(metrics_name, snapshot_name)
+            yield aggregate_name, make_aggregate(values[:, i, :].T, objects, versions, is_bool), val_range, None
     elif focus == "object":
-        for object_name in object_list:
-            out[metrics_name+' - '+object_name] = pd.DataFrame({k: v[object_name] for k, v in df_dict.items()})
-            val_range[metrics_name + ' - ' + object_name] = [_min - 0.1 * (_max - _min), _max + 0.1 * (_max - _min)]
-    return out, val_range
+        for j, object_name in zip(objects.get_indexer(first.columns), first.columns):
+            aggregate_name = '{} - {}'.format(metrics_name, object_name)
+            n_rows = None if n_samples is None else \
+                pd.Series({version: n_samples[version] * (object_name in df.columns)
+                           for version, df in df_dict.items()})
+            yield aggregate_name, make_aggregate(values[:, :, j].T, snapshots, versions, is_bool), val_range, n_rows
+
+
+def align_chunks(chunks_dict):
+    """Aligns versions of a metrics read by chunks of snapshots, as `align_versions` does for whole dataframes.
+
+    `chunks_dict` maps each version to an iterator over chunks (dataframes) of its snapshots. This is a generator that
+    yields tuples (values, snapshots, objects, is_bool, has_snapshot, has_object), where values is an array of shape
+    (n_versions, n_snapshots, n_objects) over some of the snapshots, and has_snapshot and has_object tell which
+    versions have each snapshot and object. Objects of the first chunk of each version are shared by all chunks.
+    Snapshots are yielded once all versions that may still have them have been read up to them, so that only a few
+    chunks are held in memory as long as versions list their snapshots in the same order.
+    """
+    iterators = [iter(chunks) for chunks in chunks_dict.values()]
+    buffers = [None] * len(iterators)
+    exhausted = [False] * len(iterators)
+    objects = None
+    while not all(exhausted):
+        for k, iterator in enumerate(iterators):
+            if not exhausted[k]:
+                chunk = next(iterator, None)
+                if chunk is None:
+                    exhausted[k] = True
+                else:
+                    chunk = restore_bool_dtype(chunk)
+                    buffers[k] = chunk if buffers[k] is None else pd.concat([buffers[k], chunk])
+        frames = [df for df in buffers if df is not None]
+        if not frames:
+            return
+        if objects is None:
+            objects = frames[0].columns
+            for df in frames[1:]:
+                objects = objects.append(df.columns[~df.columns.isin(objects)])
+            is_bool = all(pd.api.types.is_bool_dtype(dtype) for df in frames for dtype in df.dtypes)
+            has_object = np.stack([objects.isin([] if df is None else df.columns) for df in buffers])
 
+        # A snapshot is ready once it has been read in all versions, except those that have been read entirely.
+        snapshots = frames[0].index
+        for df in frames[1:]:
+            snapshots = snapshots.append(df.index[~df.index.isin(snapshots)])
+        ready = np.ones(len(snapshots), dtype=bool)
+        for df, done in zip(buffers, exhausted):
+            if not done:
+                ready &= snapshots.isin(df.index)
+        if not ready.any():
+            continue
+        snapshots = snapshots[ready]
+        values, has_snapshot = [], []
+        for k, df in enumerate(buffers):
+            if df is None:
+                values.append(np.full((len(snapshots), len(objects)), np.nan))
+                has_snapshot.append(np.zeros(len(snapshots), dtype=bool))
+                continue
+            has_snapshot.append(snapshots.isin(df.index))
+            values.append(df.reindex(index=snapshots, columns=objects).to_numpy(dtype=float, na_value=np.nan))
+            buffers[k] = df[~df.index.isin(snapshots)]
+        yield np.stack(values), snapshots, objects, is_bool, np.stack(has_snapshot), has_object
 
-def compare_simple(df_dict_dict, color_dict, path, display="table", statistics="summary", focus="all", **kwargs):
-    """Compares features for a single tuple (display, statistics, focus)."""
-    pbar = tqdm.tqdm(df_dict_dict.items())
-    for metrics_name, df_dict in pbar:
+
+def make_accumulator(versions, is_bool, display="table", statistics="summary", buffer_size=10000, **kwargs):
+    """Accumulator of an aggregate read by chunks, which only accumulates what its tables or plots need."""
+    plot = (display == "plot") and not is_bool
+    correlation_mode = kwargs.get("correlation_mode", "scatter")
+    scatter = plot and (statistics == "correlation") and (correlation_mode == "scatter")
+    return AggregateAccumulator(versions, is_bool=is_bool,
+                                quantiles=(0.25, 0.5, 0.75) if (statistics == "summary") and not is_bool else (),
+                                correlation=(display == "table") and (statistics == "correlation"),
+                                histograms=plot and (statistics == "summary"),
+                                correlation_histograms=plot and (statistics == "correlation"),
+                                pairs=(correlation_mode == "density"),
+                                sample_size=kwargs.get("max_scatter_points") if scatter else 0,
+                                buffer_size=buffer_size)
+
+
+# Number of values kept as is by quantile sketches of each object, in object focus. Sketches of all objects are held
+# in memory at once, hence a smaller buffer than in other focus.
+OBJECT_BUFFER_SIZE = 1000
+
+
+def aggregate_versions_chunked(metrics_name, read_chunks, focus="all", n_samples=None, display="table",
+                               statistics="summary", **kwargs):
+    """Aggregates together multiple versions of a metrics read by chunks of snapshots, as `aggregate_versions` does for
+    metrics held in memory, and yields the same tuples (aggregate_name, aggregate, val_range, n_rows).
+
+    `read_chunks` returns a dictionary that maps each version to an iterator over chunks of its snapshots (see
+    `LazyMetrics.iter_chunks`), and is called for each pass over the metrics. The first pass computes the range of
+    values. In `all` and `object` focus, aggregates are never built: chunks are folded into one `AggregateAccumulator`
+    per aggregate, which only accumulates what the `display` and `statistics` modes need (with plot settings `kwargs`),
+    and histograms are accumulated in a second pass. In `snapshot` focus, each snapshot is yielded as a dataframe in a
+    second pass.
+    """
+    chunks_dict = read_chunks()
+    versions = list(chunks_dict.keys())
+    if (n_samples is not None) and any(n_samples.get(version) is None for version in versions):
+        n_samples = None
+    _min, _max = np.nan, np.nan
+    accumulators = {}
+    for values, snapshots, objects, is_bool, has_snapshot, has_object in align_chunks(chunks_dict):
+        if values.size:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                _min, _max = np.fmin(_min, np.nanmin(values)), np.fmax(_max, np.nanmax(values))
+        if focus == "all":
+            if not accumulators:
+                accumulators[metrics_name] = make_accumulator(versions, is_bool, display, statistics, **kwargs)
+            flat = values.reshape(len(versions), -1).T
+            accumulators[metrics_name].update(flat[~np.isnan(flat).all(axis=1)])
+        elif focus == "object":
+            if not accumulators:
+                for j in np.flatnonzero(has_object[0]):
+                    accumulators[j] = make_accumulator(versions, is_bool, display, statistics,
+                                                       buffer_size=OBJECT_BUFFER_SIZE, **kwargs)
+            for j, accumulator in accumulators.items():
+                accumulator.update(values[:, :, j].T)
+    val_range = get_val_range(np.array([_min, _max]))
+
+    if focus == "snapshot":
+        for values, snapshots, objects, is_bool, has_snapshot, has_object in align_chunks(read_chunks()):
+            for i in np.flatnonzero(has_snapshot[0]):
+                aggregate_name = '{} - {}'.format(metrics_name, snapshots[i])
+                yield aggregate_name, make_aggregate(values[:, i, :].T, objects, versions, is_bool), val_range, None
+        return
+
+    if any(accumulator.needs_second_pass for accumulator in accumulators.values()):
+        for accumulator in accumulators.values():
+            accumulator.start_second_pass(val_range)
+        for values, snapshots, objects, is_bool, has_snapshot, has_object in align_chunks(read_chunks()):
+            if focus == "all":
+                flat = values.reshape(len(versions), -1).T
+                accumulators[metrics_name].update(flat[~np.isnan(flat).all(axis=1)])
+            else:
+                for j, accumulator in accumulators.items():
+                    accumulator.update(values[:, :, j].T)
+
+    for key, accumulator in accumulators.items():
+        if focus == "all":
+            n_rows = None if n_samples is None else \
+                pd.Series({version: n_samples[version] * has_object[k].sum() for k, version in enumerate(versions)})
+            yield metrics_name, accumulator, val_range, n_rows
+        else:
+            aggregate_name = '{} - {}'.format(metrics_name, objects[key])
+            n_rows = None if n_samples is None else \
+                pd.Series({version: n_samples[version] * has_object[k, key] for k, version in enumerate(versions)})
+            yield aggregate_name, accumulator, val_range, n_rows
+
+
+def read_chunks(df_dict_dict, metrics_name, chunk_size):
+    """Returns, for each version, an iterator over chunks of `chunk_size` snapshots of a metrics.
+
+    Lazily loaded metrics are read from disk by chunks, while dataframes held in memory are sliced.
+    """
+    if isinstance(df_dict_dict, LazyMetrics):
+        return df_dict_dict.iter_chunks(metrics_name, chunk_size)
+    return {version: iter_chunks(df, chunk_size) for version, df in df_dict_dict[metrics_name].items()}
+
+
+def display_aggregate(key, color_dict, df, path, display="table", statistics="summary", val_range=None, n_rows=None,
+                      **kwargs):
+    """Displays the comparison table or plots of a single aggregate."""
+    with stage_profiler.timed("display/{}/{}".format(display, statistics)):
+        if display == "table":
+            display_table(key, df, path, statistics=statistics, n_rows=n_rows)
+        elif display == "plot":
+            display_plot(key, color_dict, df, path, statistics=statistics, val_range=val_range, n_rows=n_rows,
+                         **kwargs)
+
+
+def compare_simple(df_dict_dict, color_dict, path, display="table", statistics="summary", focus="all",
+                   metrics_names=None, scheduler=None, chunk_size=None, **kwargs):
+    """Compares features for a single tuple (display, statistics, focus). Only considers `metrics_names` if provided.
+
+    Each aggregate is rendered as a separate job of `scheduler` (a RenderScheduler), if provided. Otherwise, aggregates
+    are rendered one after another. Output files are the same in both cases.
+    If metrics are lazily loaded, samples that could not be processed are accounted for in boolean summaries.
+    If `chunk_size` is provided, metrics are read by chunks of `chunk_size` snapshots (out-of-core), and tables and
+    plots are rendered from accumulators (see `aggregate_versions_chunked`), so that metrics are never held in memory.
+    """
+    if metrics_names is None:
+        metrics_names = list(df_dict_dict.keys())
+    n_samples = df_dict_dict.n_samples if isinstance(df_dict_dict, LazyMetrics) else None
+    if scheduler is None:
+        scheduler = RenderScheduler(n_workers=1)
+    pbar = tqdm.tqdm(total=0)
+    for metrics_name in metrics_names:
         pbar.set_description('            Processing {}'.format(metrics_name))
         metrics_path = make_dir(path, metrics_name)
-        aggregate_dict, val_range = aggregate_versions(metrics_name, df_dict, focus=focus)
-        for aggregate_name, aggregate_df in aggregate_dict.items():
-            if display == "table":
-                display_table(aggregate_name, aggregate_df, metrics_path, statistics=statistics)
-            elif display == "plot":
-                display_plot(aggregate_name, color_dict, aggregate_df, metrics_path, statistics=statistics, val_range=val_range[aggregate_name], **kwargs)
+        if chunk_size is None:
+            df_dict = df_dict_dict[metrics_name]
+            aggregates = aggregate_versions(metrics_name, df_dict, focus=focus, n_samples=n_samples)
+        else:
+            df_dict = None
+            aggregates = aggregate_versions_chunked(metrics_name, partial(read_chunks, df_dict_dict, metrics_name,
+                                                                          chunk_size),
+                                                    focus=focus, n_samples=n_samples, display=display,
+                                                    statistics=statistics, **kwargs)
+        aggregates = stage_profiler.timed_iter("aggregate_versions/{}".format(focus), aggregates)
+        for aggregate_name, aggregate_df, val_range, n_rows in aggregates:
+            pbar.total += 1
+            pbar.refresh()
+            scheduler.submit(display_aggregate, (aggregate_name, color_dict, aggregate_df, metrics_path),
+                             dict(kwargs, display=display, statistics=statistics, val_range=val_range, n_rows=n_rows),
+                             callback=lambda: pbar.update(1))
+            del aggregate_df
 
+        # Only keep a single metrics in memory when metrics are lazily loaded.
+        del df_dict
+        if isinstance(df_dict_dict, LazyMetrics):
+            df_dict_dict.release(metrics_name)
+    scheduler.join()
+    pbar.close()
 
-def compare_exhaustive(df_dict_dict, color_dict, save_path, display_modes, statistics_modes, focus_modes, **kwargs):
-    """Compares multiple metrics dataframe together and store the resulting tables / plots."""
+
+def compare_exhaustive(df_dict_dict, color_dict, save_path, display_modes, statistics_modes, focus_modes,
+                       metrics_selection=None, n_workers=1, **kwargs):
+    """Compares multiple metrics dataframe together and store the resulting tables / plots.
+
+    Only metrics selected by `metrics_selection` (see `select_metrics`) are considered. Tables and plots are rendered
+    by a pool of `n_workers` processes (all available cores if None), or serially if `n_workers` is 1.
+    """
+    metrics_names = select_metrics(df_dict_dict.keys(), **(metrics_selection or {}))
 
     display_modes_list = [k for k, v in display_modes.items() if v]
     statistics_modes_list = [k for k, v in statistics_modes.items() if v]
     focus_modes_list = [k for k, v in focus_modes.items() if v]
 
-    for display in display_modes_list:
-        print("Display = {}".format(display))
-        display_path = make_dir(save_path, display)
-        for statistics in statistics_modes_list:
-            print("    Statistics = {}".format(statistics))
-            statistics_path = make_dir(display_path, statistics)
-            for focus in focus_modes_list:
-                print("        Focus = {}".format(focus))
-                focus_path = make_dir(statistics_path, focus)
-                compare_simple(df_dict_dict, color_dict, focus_path, display=display, statistics=statistics, focus=focus, **kwargs)
+    with RenderScheduler(n_workers=n_workers) as scheduler:
+        for display in display_modes_list:
+            print("Display = {}".format(display))
+            display_path = make_dir(save_path, display)
+            for statistics in statistics_modes_list:
+                print("    Statistics = {}".format(statistics))
+                statistics_path = make_dir(display_path, statistics)
+                for focus in focus_modes_list:
+                    print("        Focus = {}".format(focus))
+                    focus_path = make_dir(statistics_path, focus)
+                    compare_simple(df_dict_dict, color_dict, focus_path, display=display, statistics=statistics,
+                                   focus=focus, metrics_names=metrics_names, scheduler=scheduler, **kwargs)
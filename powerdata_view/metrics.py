@@ -1,56 +1,363 @@
+from collections.abc import Mapping
+import collections
+import multiprocessing
+import hashlib
+import json
 import os
 import tqdm
 import pandas as pd
 
+from powerdata_view.profiling import stage_profiler
+from powerdata_view.selection import select_metrics
+from powerdata_view.storage import CSVStorage, find_storage, convert_metrics, get_storage
 
-def compute_save_metrics(data_dir, metrics_processor, metrics_processor_name):
-    """Computes and saves metrics dictionary if it hasn't been done before."""
+
+MANIFEST_NAME = "manifest.json"
+
+# Statuses of samples that could not be loaded or simulated, see `SAMPLE_STATUSES`.
+FAILED_STATUSES = ["diverged", "load_error"]
+
+
+def compute_save_metrics(data_dir, metrics_processor, metrics_processor_name, storage=None, n_workers=1,
+                         chunk_size=16, metrics_selection=None, retry_failed=True):
+    """Computes and saves metrics dictionary, only processing samples that are new or have changed since last time.
+
+    A manifest stored next to the metrics records the size, modification time and content hash of each sample, along
+    with the version of the metrics and the list of metrics that have been computed. Results of deleted or modified
+    samples are dropped, new and modified samples are processed and merged into the existing results. Everything is
+    recomputed if the metrics version or the settings of the metrics processor (see `get_settings`) have changed.
+    If `retry_failed` is True, samples that could not be loaded or simulated last time are processed again.
+    Only metrics selected by `metrics_selection` (see `select_metrics`) are computed. Selected metrics that are not
+    cached yet are computed for all samples and added to the cache, while cached metrics are kept up to date.
+    Metrics are stored using the `storage` backend (CSV by default), and existing caches stored with another
+    backend are converted, without deleting their files. The status of each sample (see `process_sample`) is
+    recorded in the manifest, and can be read with `load_status`.
+    """
+    if storage is None:
+        storage = CSVStorage()
     panoramix_dir = os.path.join(data_dir, "powerdata_view")
     if not os.path.exists(panoramix_dir):
         os.mkdir(panoramix_dir)
     metrics_dir = os.path.join(panoramix_dir, metrics_processor_name)
     if not os.path.exists(metrics_dir):
         os.mkdir(metrics_dir)
-        df_dict = compute_metrics(data_dir, metrics_processor)
-        save_metrics(df_dict, metrics_dir)
+
+    manifest = load_manifest(metrics_dir)
+    if manifest is None:
+        cached_storage = find_storage(metrics_dir)
+    else:
+        cached_storage = get_storage(manifest.get("storage", "CSVStorage"))
+    if (cached_storage is not None) and (type(cached_storage) != type(storage)):
+        print("Converting {} to {}. {} files are kept.".format(metrics_dir, type(storage).__name__,
+                                                             type(cached_storage).__name__))
+        convert_metrics(metrics_dir, cached_storage, storage)
+    if (manifest is None) and (cached_storage is not None):
+        manifest = adopt_metrics(data_dir, metrics_dir, metrics_processor, storage)
+    settings_hash = hash_settings(metrics_processor)
+    if (manifest is None) or (manifest["metrics_version"] != metrics_processor.metrics_version) or \
+            (manifest.get("settings_hash") != settings_hash):
+        for name in storage.list_metrics(metrics_dir):
+            storage.remove(metrics_dir, name)
+        previous_samples, cached_metrics = {}, []
+    else:
+        previous_samples = manifest["samples"]
+        cached_metrics = manifest.get("metrics", storage.list_metrics(metrics_dir))
+
+    selected_metrics = select_metrics(metrics_processor.metrics_dict.keys(), **(metrics_selection or {}))
+    missing_metrics = [name for name in selected_metrics if name not in cached_metrics]
+    target_metrics = [name for name in metrics_processor.metrics_dict.keys()
+                      if (name in cached_metrics) or (name in selected_metrics)]
+
+    samples, modified_files = update_samples(data_dir, previous_samples)
+    if retry_failed:
+        failed_files = [file for file, entry in samples.items()
+                        if entry.get("status", {}).get("status") in FAILED_STATUSES]
+        modified_files = [file for file in samples.keys() if (file in modified_files) or (file in failed_files)]
+    deleted_files = [file for file in previous_samples.keys() if file not in samples]
+    unchanged_files = [file for file in samples.keys() if (file in previous_samples) and (file not in modified_files)]
+    if (not modified_files) and (not deleted_files) and (not missing_metrics):
+        print("{} is up to date. Metrics will not be computed again.".format(metrics_dir))
     else:
-        print("{} already exists. Metrics will not be computed again.".format(metrics_dir))
+        status_dict = {}
+        df_dict = compute_metrics(data_dir, metrics_processor, n_workers=n_workers, chunk_size=chunk_size,
+                                  data_files=modified_files, metrics_names=target_metrics, status_dict=status_dict)
+        if missing_metrics and unchanged_files:
+            missing_status_dict = {}
+            missing_df_dict = compute_metrics(data_dir, metrics_processor, n_workers=n_workers, chunk_size=chunk_size,
+                                              data_files=unchanged_files, metrics_names=missing_metrics,
+                                              status_dict=missing_status_dict)
+            df_dict = merge_metrics(df_dict, missing_df_dict, [])
+            # Unchanged samples keep their previous status, unless newly selected metrics could not be computed.
+            status_dict.update({file: status for file, status in missing_status_dict.items()
+                                if (status["status"] != "converged") or ("status" not in samples[file])})
+        for file, status in status_dict.items():
+            samples[file]["status"] = status
+        if cached_metrics:
+            stale_samples = [get_sample_name(file) for file in modified_files + deleted_files]
+            df_dict = merge_metrics(load_metrics(metrics_dir, storage), df_dict, stale_samples)
+        save_metrics(df_dict, metrics_dir, storage)
+    manifest = {"metrics_version": metrics_processor.metrics_version, "settings_hash": settings_hash,
+                "storage": type(storage).__name__, "metrics": target_metrics, "samples": samples}
+    save_manifest(manifest, metrics_dir)
 
 
-def compute_metrics(data_dir, problem):
-    """Computes metrics dictionary."""
-    df_dict = problem.initialize_table_dict()
-    data_files = os.listdir(data_dir)
-    for file in tqdm.tqdm(data_files, desc='Building metrics for {}'.format(data_dir)):
-        try:
-            problem.add_assessment_row(os.path.join(data_dir, file), df_dict)
-        except:
-           continue
-    return df_dict
+def print_failures(data_dir, status_dict):
+    """Prints how many samples could not be fully processed, by status."""
+    counts = collections.Counter(status["status"] for status in status_dict.values() if status["status"] != "converged")
+    if counts:
+        print("{} out of {} samples of {} could not be fully processed ({}).".format(
+            sum(counts.values()), len(status_dict), data_dir,
+            ", ".join("{}: {}".format(*item) for item in counts.items())))
 
 
-def save_metrics(df_dict, save_path):
-    """Saves dictionary of metrics dataframes."""
-    for name, df in df_dict.items():
-        path = os.path.join(save_path, name+'.csv')
-        df.to_csv(path)
+def load_status(metrics_dir):
+    """Loads the status of each sample, as recorded in the manifest, as a dataframe with one row per sample.
+
+    Columns are the `status` (see `SAMPLE_STATUSES`), the `error` raised if any, the number of power flow `iterations`,
+    and the time spent loading the sample, running the power flow and computing metrics (in seconds). Samples
+    processed before statuses were recorded have missing values.
+    """
+    manifest = load_manifest(metrics_dir) or {"samples": {}}
+    entries = {get_sample_name(file): entry.get("status", {}) for file, entry in manifest["samples"].items()}
+    columns = ["status", "error", "iterations", "load_time", "powerflow_time", "metrics_time"]
+    return pd.DataFrame.from_dict(entries, orient='index', columns=columns)
+
+
+def count_samples(metrics_dir):
+    """Number of samples recorded in the manifest, whether they could be processed or not. None if there is none."""
+    manifest = load_manifest(metrics_dir)
+    return None if manifest is None else len(manifest["samples"])
+
+
+def update_samples(data_dir, previous_samples):
+    """Builds the manifest entries of the samples of `data_dir`, and lists files that are new or have changed.
 
+    Content hashes are only computed for files whose size or modification time differ from their previous entry.
+    """
+    samples, modified_files = {}, []
+    for file in list_data_files(data_dir):
+        stat = os.stat(os.path.join(data_dir, file))
+        entry = previous_samples.get(file)
+        if (entry is not None) and (entry["size"] == stat.st_size) and (entry["mtime"] == stat.st_mtime_ns):
+            samples[file] = entry
+            continue
+        content_hash = hash_file(os.path.join(data_dir, file))
+        if (entry is None) or (entry["hash"] != content_hash):
+            modified_files.append(file)
+        samples[file] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": content_hash}
+    return samples, modified_files
 
-def load_metrics(path):
-    """Loads dictionary of metrics dataframes."""
-    df_dict = {}
-    for filename in os.listdir(path):
-        filepath = os.path.join(path, filename)
-        if filepath.endswith('.csv'):
-            name = os.path.splitext(filename)[0]
-            df_dict[name] = pd.read_csv(filepath, index_col=0)
-    return df_dict
 
+def adopt_metrics(data_dir, metrics_dir, metrics_processor, storage):
+    """Builds the manifest of metrics that were computed before manifests existed.
 
-def load_multiple_metrics(dataset_versions, problem_name):
-    """Loads one dictionary of metrics dataframes per dataset version."""
+    Samples that appear in the existing tables are considered up to date, all others will be processed.
+    """
+    df_dict = load_metrics(metrics_dir, storage)
+    sample_names = set()
+    for df in df_dict.values():
+        sample_names.update(df.index.astype(str))
+    samples, _ = update_samples(data_dir, {})
+    return {"metrics_version": metrics_processor.metrics_version, "settings_hash": hash_settings(metrics_processor),
+            "samples": {file: entry for file, entry in samples.items() if get_sample_name(file) in sample_names}}
+
+
+def merge_metrics(df_dict, new_df_dict, stale_samples):
+    """Drops stale samples from a dictionary of metrics dataframes, and appends newly computed rows."""
     out = {}
-    for version in dataset_versions:
-        metrics_dir = os.path.join(version.path, "powerdata_view", problem_name)
-        out[version.name] = load_metrics(metrics_dir)
-    return {mn: {vn: out[vn][mn] for vn in out.keys()} for mn in next(iter(out.values())).keys()}
+    for key in df_dict.keys() | new_df_dict.keys():
+        if key not in df_dict:
+            out[key] = new_df_dict[key]
+            continue
+        out[key] = df_dict[key].drop(index=stale_samples, errors='ignore')
+        if key in new_df_dict and len(new_df_dict[key].index) > 0:
+            out[key] = pd.concat([out[key], new_df_dict[key]], axis=0, join='outer')
+    return out
+
+
+def load_manifest(metrics_dir):
+    """Loads the manifest of cached metrics, or returns None if there is none."""
+    path = os.path.join(metrics_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, metrics_dir):
+    """Saves the manifest of cached metrics."""
+    with open(os.path.join(metrics_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+
+def hash_settings(metrics_processor):
+    """Returns the SHA-256 hex digest of the settings of a metrics processor that affect computed metrics."""
+    settings = json.dumps(metrics_processor.get_settings(), sort_keys=True, default=str)
+    return hashlib.sha256(settings.encode()).hexdigest()
+
+
+def hash_file(path, block_size=1 << 20):
+    """Returns the SHA-256 hex digest of the content of a file."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def list_data_files(data_dir):
+    """Lists sample files of a dataset directory, ignoring subdirectories such as the metrics cache."""
+    return sorted(file for file in os.listdir(data_dir) if os.path.isfile(os.path.join(data_dir, file)))
+
+
+def get_sample_name(file):
+    """Name of the sample stored in a file, used as index in metrics dataframes."""
+    return os.path.splitext(os.path.basename(file))[0]
+
+
+def compute_metrics(data_dir, problem, n_workers=1, chunk_size=16, data_files=None, metrics_names=None,
+                    status_dict=None):
+    """Computes metrics dictionary.
+
+    Only files listed in `data_files` are processed, if provided. Otherwise, all samples of `data_dir` are.
+    Similarly, only metrics listed in `metrics_names` are computed, if provided.
+    Samples that cannot be processed are left aside. If `status_dict` is provided, the status of each sample (see
+    `process_sample`) is stored in it, keyed by file name.
+    Stages are timed by the stage profiler, and samples are only profiled by its sample profiler if `n_workers` is 1.
+    If `n_workers` is larger than 1, samples are dispatched by chunks of `chunk_size` to a pool of worker processes,
+    each of which holds its own copy of the metrics processor. Rows are merged back in the order of the data files, so
+    that the output is identical to the serial one. Setting `n_workers` to None uses all available cores.
+    """
+    table_dict = problem.initialize_table_dict(metrics_names)
+    if data_files is None:
+        data_files = list_data_files(data_dir)
+    if status_dict is None:
+        status_dict = {}
+    desc = 'Building metrics for {}'.format(data_dir)
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    if n_workers > 1:
+        initargs = (problem, metrics_names)
+        with multiprocessing.Pool(n_workers, initializer=_init_worker, initargs=initargs) as pool:
+            filepaths = [os.path.join(data_dir, file) for file in data_files]
+            rows = _merge_records(pool.imap(_compute_worker_row, filepaths, chunksize=chunk_size))
+            _append_rows(data_files, rows, table_dict, status_dict, desc)
+    else:
+        rows = (_compute_row(problem, os.path.join(data_dir, file), metrics_names) for file in data_files)
+        _append_rows(data_files, rows, table_dict, status_dict, desc)
+    print_failures(data_dir, {file: status_dict[file] for file in data_files})
+    return table_dict.to_dict()
+
+
+def _append_rows(data_files, rows, table_dict, status_dict, desc):
+    """Appends computed rows to the metrics accumulator, and records the status of each sample."""
+    for file, (sample_name, row, status) in tqdm.tqdm(zip(data_files, rows), total=len(data_files), desc=desc):
+        if status["status"] in ["converged", "metric_error"]:
+            table_dict.append(sample_name, row)
+        status_dict[file] = status
+
+
+def _compute_row(problem, filepath, metrics_names):
+    """Computes the metrics row of a sample, along with its status."""
+    with stage_profiler.profile_sample():
+        return problem.process_sample(filepath, metrics_names)
+
+
+def _merge_records(results):
+    """Merges the stage records sent back by worker processes into the stage profiler, and yields rows."""
+    for row, records in results:
+        stage_profiler.merge(records)
+        yield row
+
+
+_worker_problem = None
+_worker_metrics_names = None
+
+
+def _init_worker(problem, metrics_names):
+    """Sets the metrics processor of a worker process."""
+    global _worker_problem, _worker_metrics_names
+    _worker_problem = problem
+    _worker_metrics_names = metrics_names
+    stage_profiler.drain()
+    stage_profiler.set_sample_profiler(None)
+
+
+def _compute_worker_row(filepath):
+    """Computes the metrics row of a sample inside a worker process, and sends stage records back."""
+    return _compute_row(_worker_problem, filepath, _worker_metrics_names), stage_profiler.drain()
+
+
+def save_metrics(df_dict, save_path, storage=None):
+    """Saves dictionary of metrics dataframes, using the `storage` backend (CSV by default)."""
+    if storage is None:
+        storage = CSVStorage()
+    for name, df in df_dict.items():
+        with stage_profiler.timed("storage/save"):
+            storage.save(df, save_path, name)
+
+
+def load_metrics(path, storage=None, columns=None):
+    """Loads dictionary of metrics dataframes, using the `storage` backend (CSV by default).
+
+    If `columns` is provided, only these columns (i.e. objects) are read.
+    """
+    if storage is None:
+        storage = CSVStorage()
+    return {name: storage.load(path, name, columns=columns) for name in storage.list_metrics(path)}
+
+
+def load_multiple_metrics(dataset_versions, problem_name, storage=None):
+    """Returns a lazy mapping from metrics names to dictionaries of metrics dataframes, with one item per version."""
+    if storage is None:
+        storage = CSVStorage()
+    metrics_dirs = {version.name: os.path.join(version.path, "powerdata_view", problem_name)
+                    for version in dataset_versions}
+    return LazyMetrics(metrics_dirs, storage)
+
+
+class LazyMetrics(Mapping):
+    """Mapping from metrics names to dictionaries of metrics dataframes (one per dataset version), loaded on demand.
+
+    A metrics is only read from disk the first time it is accessed, and is kept in memory until `release` is called,
+    so that peak memory scales with the largest metrics rather than with the whole cache.
+    The number of samples of each version, including those that could not be processed, is stored in `n_samples`.
+    """
+
+    def __init__(self, metrics_dirs, storage):
+        self.metrics_dirs = metrics_dirs
+        self.storage = storage
+        self.n_samples = {version_name: count_samples(metrics_dir)
+                          for version_name, metrics_dir in metrics_dirs.items()}
+        self.names = storage.list_metrics(next(iter(metrics_dirs.values())))
+        self.loaded = {}
+
+    def __getitem__(self, metrics_name):
+        if metrics_name not in self.names:
+            raise KeyError(metrics_name)
+        if metrics_name not in self.loaded:
+            with stage_profiler.timed("storage/load"):
+                self.loaded[metrics_name] = {version_name: self.storage.load(metrics_dir, metrics_name)
+                                             for version_name, metrics_dir in self.metrics_dirs.items()}
+        return self.loaded[metrics_name]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def iter_chunks(self, metrics_name, chunk_size):
+        """Returns, for each version, an iterator over chunks of about `chunk_size` snapshots of a metrics.
+
+        Chunks are read from disk one at a time, and are not kept in memory.
+        """
+        if metrics_name not in self.names:
+            raise KeyError(metrics_name)
+        return {version_name: stage_profiler.timed_iter("storage/load_chunk",
+                                                        self.storage.iter_chunks(metrics_dir, metrics_name, chunk_size))
+                for version_name, metrics_dir in self.metrics_dirs.items()}
+
+    def release(self, metrics_name):
+        """Releases a loaded metrics from memory. It will be read again from disk if accessed later."""
+        self.loaded.pop(metrics_name, None)
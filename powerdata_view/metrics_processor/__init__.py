@@ -1,12 +1,32 @@
-from powerdata_view.metrics_processor.interface import MetricsProcessorInterface
-from powerdata_view.metrics_processor.pandapower import PandaPowerMetricsProcessor
-from powerdata_view.metrics_processor.pypowsybl import PyPowSyblMetricsProcessor
+import importlib
 
+from powerdata_view.metrics_processor.accumulator import MetricsAccumulator
+from powerdata_view.metrics_processor.interface import MetricsProcessorInterface, SAMPLE_STATUSES
+from powerdata_view.metrics_processor.threshold import ThresholdFamily
 
-def get_metrics_processor(identifier):
-    if identifier == 'PandaPowerMetricsProcessor':
-        return PandaPowerMetricsProcessor()
-    elif identifier == 'PyPowSyblMetricsProcessor':
-        return PyPowSyblMetricsProcessor()
-    else:
+
+# Registry of metrics processors, along with the module in which each of them is defined. Modules are only imported
+# when their processor is requested, so that simulators are not needed to compare metrics that are already cached.
+METRICS_PROCESSORS = {
+    'PandaPowerMetricsProcessor': 'powerdata_view.metrics_processor.pandapower',
+    'PyPowSyblMetricsProcessor': 'powerdata_view.metrics_processor.pypowsybl',
+}
+
+
+def get_metrics_processor(identifier, **kwargs):
+    if identifier not in METRICS_PROCESSORS:
         raise NotImplementedError
+    return get_metrics_processor_class(identifier)(**kwargs)
+
+
+def get_metrics_processor_class(identifier):
+    """Imports the module of a metrics processor, and returns its class."""
+    module = importlib.import_module(METRICS_PROCESSORS[identifier])
+    return getattr(module, identifier)
+
+
+def __getattr__(name):
+    # Metrics processor classes remain accessible as attributes of this package, but are imported on first access.
+    if name in METRICS_PROCESSORS:
+        return get_metrics_processor_class(name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+
+def mangle_duplicate_columns(columns):
+    """Renames duplicate column names as `pd.read_csv` does (`name`, `name.1`, `name.2`, ...).
+
+    Objects may share the same name (e.g. parallel lines), and tables need unique column names to be merged.
+    """
+    counts = {}
+    out = []
+    for column in columns:
+        count = counts.get(column, 0)
+        out.append(column if count == 0 else '{}.{}'.format(column, count))
+        counts[column] = count + 1
+    return out
+
+
+class ColumnBuffer:
+    """Growable NumPy buffer that stores the rows of samples sharing the same set of columns."""
+
+    def __init__(self, columns, dtype, capacity=64):
+        self.columns = columns
+        self.index = []
+        self.data = np.empty((capacity, len(columns)), dtype=dtype)
+
+    def append(self, sample_name, values):
+        """Appends the row of a sample, growing and upcasting the buffer if needed."""
+        n = len(self.index)
+        if n == len(self.data):
+            data = np.empty((2 * n, len(self.columns)), dtype=self.data.dtype)
+            data[:n] = self.data
+            self.data = data
+        dtype = np.result_type(self.data.dtype, values.dtype)
+        if dtype != self.data.dtype:
+            self.data = self.data.astype(dtype)
+        self.data[n] = values
+        self.index.append(sample_name)
+
+    def to_frame(self):
+        """Builds the dataframe of the rows stored so far."""
+        columns = mangle_duplicate_columns(self.columns)
+        return pd.DataFrame(self.data[:len(self.index)], index=self.index, columns=columns)
+
+
+class MetricsAccumulator:
+    """Accumulates metrics sample after sample, and builds the dictionary of metrics dataframes once at the end.
+
+    For each metrics, rows are stored in NumPy buffers keyed by their set of columns (i.e. object names), so that
+    appending a sample does not copy previously stored ones. Samples whose objects differ are merged with an outer
+    join when dataframes are built.
+    """
+
+    def __init__(self, keys):
+        self.buffers = {key: {} for key in keys}
+        self.sample_names = {key: [] for key in keys}
+
+    def append(self, sample_name, row):
+        """Appends a row, i.e. a dictionary that maps each metrics name to a tuple (values, columns)."""
+        for key, (metrics_val, metrics_col) in row.items():
+            values = np.atleast_1d(np.asarray(metrics_val))
+            columns = tuple(np.atleast_1d(metrics_col).tolist())
+            buffer = self.buffers[key].get(columns)
+            if buffer is None:
+                buffer = self.buffers[key][columns] = ColumnBuffer(columns, values.dtype)
+            buffer.append(sample_name, values)
+            self.sample_names[key].append(sample_name)
+
+    def to_dict(self):
+        """Builds the dictionary of metrics dataframes, with one row per sample and one column per object."""
+        df_dict = {}
+        for key, buffers in self.buffers.items():
+            frames = [buffer.to_frame() for buffer in buffers.values()]
+            if len(frames) == 0:
+                df_dict[key] = pd.DataFrame([[]], columns=[], index=[])
+            elif len(frames) == 1:
+                df_dict[key] = frames[0]
+            else:
+                df_dict[key] = pd.concat(frames, axis=0, join='outer').loc[self.sample_names[key]]
+        return df_dict
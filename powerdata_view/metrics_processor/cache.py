@@ -0,0 +1,38 @@
+import functools
+
+
+class SnapshotContext:
+    """Evaluation context that memoizes the derived quantities of the snapshot currently being processed.
+
+    Cached values are tied to the power grid object they were computed on, and are dropped as soon as another power
+    grid is evaluated, or when the context is explicitly cleared.
+    """
+
+    def __init__(self):
+        self.power_grid = None
+        self.values = {}
+
+    def clear(self):
+        """Drops all cached values."""
+        self.power_grid = None
+        self.values = {}
+
+    def evaluate(self, func, power_grid):
+        """Returns func(power_grid), computing it only if it has not been computed yet for this power grid."""
+        if power_grid is not self.power_grid:
+            self.clear()
+            self.power_grid = power_grid
+        if func not in self.values:
+            self.values[func] = func(power_grid)
+        return self.values[func]
+
+
+snapshot_context = SnapshotContext()
+
+
+def snapshot_cached(func):
+    """Decorator that memoizes a metrics function within the current snapshot."""
+    @functools.wraps(func)
+    def wrapper(power_grid):
+        return snapshot_context.evaluate(func, power_grid)
+    return wrapper
@@ -1,5 +1,9 @@
 from abc import ABC, abstractmethod
-import pandas as pd
+from powerdata_view.metrics_processor.accumulator import MetricsAccumulator
+from powerdata_view.metrics_processor.cache import snapshot_context
+from powerdata_view.profiling import stage_profiler
+import traceback
+import time
 import os
 
 
@@ -10,6 +14,12 @@ class MetricsProcessorInterface(ABC):
     in the dictionary `metrics_dict`.
     """
 
+    # Version of the metrics definitions, recorded alongside cached metrics. Should be incremented whenever metrics
+    # functions change, so that previously cached metrics get recomputed.
+    # Version 2: eps-variants of illicit metrics are evaluated as threshold families, with snapshot-level variants of
+    # illicit reactive power for negative eps.
+    metrics_version = 2
+
     def __init__(self):
         pass
 
@@ -26,19 +36,104 @@ class MetricsProcessorInterface(ABC):
 
     @abstractmethod
     def run_powerflow(self, power_grid):
-        """Runs a power flow simulation. Should be overriden in a proper implementation."""
+        """Runs a power flow simulation. Should be overriden in a proper implementation.
+
+        Should raise an exception if the power flow diverges, and may return its number of iterations.
+        """
         pass
 
-    def initialize_table_dict(self):
-        """Initializes the dictionary of metrics as containing empty dataframes as items."""
-        return {key: pd.DataFrame([[]], columns=[], index=[]) for key in self.metrics_dict.keys()}
+    def get_settings(self):
+        """Returns the settings that affect computed metrics (e.g. thresholds, or the version of the simulator).
+
+        They are recorded alongside cached metrics, which get recomputed whenever they change. Defaults to none.
+        """
+        return {}
+
+    def prepare_snapshot(self, power_grid):
+        """Returns the object on which metrics functions are evaluated, once the power flow has been run.
+
+        Defaults to the power grid itself. May be overridden to extract data from the power grid once per snapshot.
+        """
+        return power_grid
+
+    def initialize_table_dict(self, metrics_names=None):
+        """Initializes the accumulator in which metrics are appended sample after sample.
+
+        Only metrics listed in `metrics_names` are considered, if provided.
+        """
+        if metrics_names is None:
+            metrics_names = self.metrics_dict.keys()
+        return MetricsAccumulator(metrics_names)
+
+    def process_sample(self, filepath, metrics_names=None):
+        """Imports and simulates a file, and computes its metrics, recording failures instead of raising them.
 
-    def add_assessment_row(self, filepath, df_dict):
-        """Imports and simulates a file, computes metrics and appends them to table_dict."""
-        power_grid = self.load_power_grid(filepath)
+        Returns the sample name, a dictionary that maps each metrics that could be computed to a tuple (values,
+        columns), and the status of the sample (see `SAMPLE_STATUSES`), along with the error raised if any, the number
+        of power flow iterations and the time spent in each stage. If some metrics fail, the others are still computed,
+        and the failing ones are listed in the error.
+        The time spent in each stage and in each metrics function is also recorded by the stage profiler. Quantities
+        shared by several metrics are only computed once per snapshot, by the first metrics that needs them.
+        """
+        if metrics_names is None:
+            metrics_names = self.metrics_dict.keys()
         sample_name = os.path.splitext(os.path.basename(filepath))[0]
-        self.run_powerflow(power_grid)
-        for key, metrics in self.metrics_dict.items():
-            metrics_val, metrics_col = metrics(power_grid)
-            r = pd.DataFrame([metrics_val], columns=[metrics_col], index=[sample_name])
-            df_dict[key] = pd.concat([r, df_dict[key]], axis=0, join='outer')
+        status = {"status": "converged", "error": None, "iterations": None, "load_time": None,
+                  "powerflow_time": None, "metrics_time": None}
+        row = {}
+        snapshot_context.clear()
+        try:
+            power_grid, status["load_time"], error = timed_call(self.load_power_grid, filepath)
+            stage_profiler.record("load_power_grid", status["load_time"])
+            if error is not None:
+                status.update(status="load_error", error=error)
+                return sample_name, row, status
+            status["iterations"], status["powerflow_time"], error = timed_call(self.run_powerflow, power_grid)
+            stage_profiler.record("run_powerflow", status["powerflow_time"])
+            if error is not None:
+                status.update(status="diverged", error=error)
+                return sample_name, row, status
+            start = time.perf_counter()
+            errors = []
+            snapshot, elapsed, error = timed_call(self.prepare_snapshot, power_grid)
+            stage_profiler.record("prepare_snapshot", elapsed)
+            if error is not None:
+                errors.append("prepare_snapshot: {}".format(error))
+            else:
+                for key in metrics_names:
+                    row[key], elapsed, error = timed_call(self.metrics_dict[key], snapshot)
+                    stage_profiler.record("metrics/{}".format(key), elapsed)
+                    if error is not None:
+                        del row[key]
+                        errors.append("{}: {}".format(key, error))
+            status["metrics_time"] = time.perf_counter() - start
+            if errors:
+                status.update(status="metric_error", error="; ".join(errors))
+            return sample_name, row, status
+        finally:
+            snapshot_context.clear()
+
+
+# Possible statuses of a processed sample.
+SAMPLE_STATUSES = ["converged", "diverged", "load_error", "metric_error"]
+
+
+def timed_call(func, *args):
+    """Calls func(*args), and returns its result, the elapsed time in seconds, and the error raised if any."""
+    start = time.perf_counter()
+    try:
+        return func(*args), time.perf_counter() - start, None
+    except Exception as e:
+        return None, time.perf_counter() - start, format_error(e)
+
+
+def format_error(e):
+    """Describes an exception raised inside timed_call, along with the location where it has been raised.
+
+    The location is the innermost frame inside powerdata_view if any, or the function called by timed_call otherwise.
+    """
+    frames = traceback.extract_tb(e.__traceback__)[1:]
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    frame = next((f for f in reversed(frames) if os.path.abspath(f.filename).startswith(package_dir)), frames[0])
+    return "{}: {} ({}:{} in {})".format(type(e).__name__, e, os.path.basename(frame.filename), frame.lineno,
+                                        frame.name)
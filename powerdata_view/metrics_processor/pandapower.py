@@ -1,7 +1,13 @@
 from abc import ABC
 import pandapower as pp
+from pandapower.pypower.idx_bus import VM, VA
+import pandas as pd
 import numpy as np
+import os
 from powerdata_view.metrics_processor.interface import MetricsProcessorInterface
+from powerdata_view.metrics_processor.cache import snapshot_cached
+from powerdata_view.metrics_processor.threshold import ThresholdFamily, threshold_metrics, snapshot_threshold_metrics
+from powerdata_view.samples import load_cached_sample, ingest_samples
 
 
 class PandaPowerMetricsProcessor(MetricsProcessorInterface, ABC):
@@ -9,8 +15,31 @@ class PandaPowerMetricsProcessor(MetricsProcessorInterface, ABC):
 
     metrics_dict = {}
 
-    def __init__(self):
+    # Name of the binary cache of samples, see `cache_samples`.
+    sample_cache_name = "pandapower"
+
+    def __init__(self, threshold_eps=None, reuse_structure=False, cache_samples=False):
         super().__init__()
+
+        # If `cache_samples` is True, samples are parsed once and stored in a binary cache, read by later runs.
+        self.cache_samples = cache_samples
+
+        # If `reuse_structure` is True, the internal power flow structures (admittance matrices, lookups) of the last
+        # fully simulated sample are kept, and reused for following samples that share its structure.
+        self.reuse_structure = reuse_structure
+        self.base_grid = None
+        self.base_structure = None
+        self.base_pid = None
+
+        # Thresholds of the eps-variants of illicit metrics. Additional thresholds may be provided by `threshold_eps`.
+        threshold_eps = list(threshold_eps or [])
+        self.threshold_eps = threshold_eps
+        voltage_family = ThresholdFamily(bus_normalized_voltage, [0.05, 0.1, 0.25, -0.05, -0.1] + threshold_eps)
+        current_family = ThresholdFamily(branch_normalized_current, [0.05, 0.1, -0.05, -0.1] + threshold_eps,
+                                         lower=False)
+        reactive_family = ThresholdFamily(generator_normalized_reactive_power, [0.05, 0.1, -0.05, -0.1] + threshold_eps)
+        families = [voltage_family, current_family, reactive_family]
+
         self.metrics_dict = {
 
             # Voltage set points
@@ -39,17 +68,9 @@ class PandaPowerMetricsProcessor(MetricsProcessorInterface, ABC):
             "Buses with Over Voltage": bus_over_voltage,
             "Buses with Under Voltage": bus_under_voltage,
             "Buses with Illicit Voltage": bus_illicit_voltage,
-            "Buses with Illicit Voltage, eps=0.05": bus_illicit_voltage_005,
-            "Buses with Illicit Voltage, eps=0.1": bus_illicit_voltage_01,
-            "Buses with Illicit Voltage, eps=0.25": bus_illicit_voltage_025,
-            "Buses with Illicit Voltage, eps=-0.05": bus_illicit_voltage_m005,
-            "Buses with Illicit Voltage, eps=-0.1": bus_illicit_voltage_m01,
+            **threshold_metrics("Buses with Illicit Voltage", voltage_family),
             "Snapshots with Illicit Voltage": snapshots_illicit_voltage,
-            "Snapshots with Illicit Voltage, eps=0.05": snapshots_illicit_voltage_005,
-            "Snapshots with Illicit Voltage, eps=0.1": snapshots_illicit_voltage_01,
-            "Snapshots with Illicit Voltage, eps=0.25": snapshots_illicit_voltage_025,
-            "Snapshots with Illicit Voltage, eps=-0.05": snapshots_illicit_voltage_m005,
-            "Snapshots with Illicit Voltage, eps=-0.1": snapshots_illicit_voltage_m01,
+            **snapshot_threshold_metrics("Snapshots with Illicit Voltage", [voltage_family]),
             "Voltage Violation Count per Snapshot": voltage_violation_count,
 
             # Branch loading
@@ -57,15 +78,9 @@ class PandaPowerMetricsProcessor(MetricsProcessorInterface, ABC):
             "Transformer Loading Percent (%)": trafo_loading_percent,
             "Branch Normalized Current": branch_normalized_current,
             "Branches with Illicit Current": branch_illicit_current,
-            "Branches with Illicit Current, eps=0.05": branch_illicit_current_005,
-            "Branches with Illicit Current, eps=0.1": branch_illicit_current_01,
-            "Branches with Illicit Current, eps=-0.05": branch_illicit_current_m005,
-            "Branches with Illicit Current, eps=-0.1": branch_illicit_current_m01,
+            **threshold_metrics("Branches with Illicit Current", current_family),
             "Snapshots with Illicit Current": snapshots_illicit_current,
-            "Snapshots with Illicit Current, eps=0.05": snapshots_illicit_current_005,
-            "Snapshots with Illicit Current, eps=0.1": snapshots_illicit_current_01,
-            "Snapshots with Illicit Current, eps=-0.05": snapshots_illicit_current_m005,
-            "Snapshots with Illicit Current, eps=-0.1": snapshots_illicit_current_m01,
+            **snapshot_threshold_metrics("Snapshots with Illicit Current", [current_family]),
             "Current Violation Count per Snapshot": current_violation_count,
 
             # Reactive Generation
@@ -77,21 +92,14 @@ class PandaPowerMetricsProcessor(MetricsProcessorInterface, ABC):
             "Generators with Over Reactive Power": generator_over_reactive_power,
             "Generators with Under Reactive Power": generator_under_reactive_power,
             "Generators with Illicit Reactive Power": generator_illicit_reactive_power,
-            "Generators with Illicit Reactive Power, eps=0.05": generator_illicit_reactive_power_005,
-            "Generators with Illicit Reactive Power, eps=0.1": generator_illicit_reactive_power_01,
-            "Generators with Illicit Reactive Power, eps=-0.05": generator_illicit_reactive_power_m005,
-            "Generators with Illicit Reactive Power, eps=-0.1": generator_illicit_reactive_power_m01,
+            **threshold_metrics("Generators with Illicit Reactive Power", reactive_family),
             "Snapshots with Illicit Reactive Power": snapshots_illicit_reactive_power,
-            "Snapshots with Illicit Reactive Power, eps=0.05": snapshots_illicit_reactive_power_005,
-            "Snapshots with Illicit Reactive Power, eps=0.1": snapshots_illicit_reactive_power_01,
+            **snapshot_threshold_metrics("Snapshots with Illicit Reactive Power", [reactive_family]),
             "Reactive Violation Count per Snapshot": reactive_violation_count,
 
             # Illicit Snapshots
             "Snapshots with Illicit Values": snapshots_illicit_power_grid,
-            "Snapshots with Illicit Values, eps=0.05": snapshots_illicit_power_grid_005,
-            "Snapshots with Illicit Values, eps=0.1": snapshots_illicit_power_grid_01,
-            "Snapshots with Illicit Values, eps=-0.05": snapshots_illicit_power_grid_m005,
-            "Snapshots with Illicit Values, eps=-0.1": snapshots_illicit_power_grid_m01,
+            **snapshot_threshold_metrics("Snapshots with Illicit Values", families),
             "Violation Count per Snapshot": violation_count,
 
             # Costs
@@ -118,18 +126,126 @@ class PandaPowerMetricsProcessor(MetricsProcessorInterface, ABC):
 
         Overrides run_powerflow of abstract base class.
         """
-        pp.runpp(power_grid, init='results', enforce_q_lims=True, delta_q=0.)
+        if self.reuse_structure:
+            iterations = self.run_recycled_powerflow(power_grid)
+        else:
+            pp.runpp(power_grid, init='results', enforce_q_lims=True, delta_q=0.)
+            iterations = power_grid._ppc["iterations"]
         if (power_grid.res_bus.vm_pu > 1.2).any():
-            raise Exception
+            raise Exception("Bus voltages above 1.2 p.u.")
+        return iterations
 
+    def run_recycled_powerflow(self, power_grid):
+        """Runs the power flow on the base grid if the structure is unchanged, and copies results back to power_grid.
+
+        Only injections and set points (see INJECTION_COLUMNS) are copied to the base grid, and its admittance
+        matrices and lookups are reused. If the topology, in_service flags or any other parameter has changed, a full
+        power flow is run on power_grid, which becomes the new base grid. Both power flows are initialized from the
+        bus results stored in power_grid (see seed_voltages), so that samples converge to the same solution, in the
+        same number of iterations, whether structures are reused or not. Returns the number of power flow iterations.
+        """
+        structure = grid_structure(power_grid)
+        if (self.base_grid is None) or (self.base_pid != os.getpid()) or \
+                (not same_structure(structure, self.base_structure)):
+            self.base_grid = None
+            pp.runpp(power_grid, init='results', enforce_q_lims=True, delta_q=0.)
+            self.base_grid, self.base_structure, self.base_pid = power_grid, structure, os.getpid()
+            return power_grid._ppc["iterations"]
+        base_grid, self.base_grid = self.base_grid, None
+        for table, columns in INJECTION_COLUMNS.items():
+            columns = [column for column in columns if column in power_grid[table].columns]
+            if len(columns) > 0:
+                base_grid[table][columns] = power_grid[table][columns].values
+        seed_voltages(base_grid, power_grid)
+        pp.runpp(base_grid, init='results', recycle=dict(bus_pq=True, gen=True, trafo=False), enforce_q_lims=True,
+                 delta_q=0.)
+        self.base_grid = base_grid
+        for key in base_grid.keys():
+            if key.startswith('res_'):
+                power_grid[key] = base_grid[key].copy()
+        return base_grid._ppc["iterations"]
+
+    def __getstate__(self):
+        # The base grid is not sent to worker processes, each of them simulates its own.
+        state = self.__dict__.copy()
+        state.update(base_grid=None, base_structure=None, base_pid=None)
+        return state
+
+    def get_settings(self):
+        """Returns the settings that affect computed metrics, including the version of PandaPower.
+
+        Overrides get_settings of abstract base class.
+        """
+        return {"threshold_eps": self.threshold_eps, "reuse_structure": self.reuse_structure,
+                "simulator_version": pp.__version__}
 
     def load_power_grid(self, filepath):
         """Loads a power grid in memory.
 
+        If `cache_samples` is True, the power grid is read from its binary cache, which is (re)built if needed.
         Overrides load_power_grid of abstract base class.
         """
+        if self.cache_samples:
+            return load_cached_sample(filepath, pp.from_json, self.sample_cache_name, pp.__version__)
         return pp.from_json(filepath)
 
+    def ingest(self, data_dir):
+        """Builds the binary cache of all samples of `data_dir` ahead of metrics computations."""
+        ingest_samples(data_dir, pp.from_json, self.sample_cache_name, pp.__version__)
+
+
+# Columns that may vary between samples that share the same power flow structures. They are updated in the internal
+# structures of pandapower when they are recycled. Any change in other columns of STRUCTURE_TABLES (e.g. in_service
+# flags, tap positions, shunt steps, line parameters) requires a full power flow.
+INJECTION_COLUMNS = {
+    'load': ['p_mw', 'q_mvar', 'scaling'],
+    'sgen': ['p_mw', 'q_mvar', 'scaling'],
+    'storage': ['p_mw', 'q_mvar', 'scaling'],
+    'gen': ['p_mw', 'vm_pu', 'scaling'],
+    'ext_grid': ['vm_pu', 'va_degree'],
+}
+STRUCTURE_TABLES = ['bus', 'line', 'trafo', 'trafo3w', 'impedance', 'switch', 'shunt', 'ward', 'xward', 'dcline',
+                    'load', 'sgen', 'storage', 'gen', 'ext_grid']
+
+
+def grid_structure(power_grid):
+    """Returns the parts of a power grid that define its power flow structures, i.e. all but injections."""
+    structure = {'sn_mva': power_grid.sn_mva, 'f_hz': power_grid.f_hz}
+    for table in STRUCTURE_TABLES:
+        if table in power_grid:
+            structure[table] = power_grid[table].drop(columns=INJECTION_COLUMNS.get(table, []), errors='ignore')
+    return structure
+
+
+def same_structure(structure, other):
+    """Checks whether two power grid structures, as returned by grid_structure, are identical."""
+    if structure.keys() != other.keys():
+        return False
+    for key, value in structure.items():
+        if isinstance(value, pd.DataFrame):
+            if not value.equals(other[key]):
+                return False
+        elif value != other[key]:
+            return False
+    return True
+
+
+def seed_voltages(base_grid, power_grid):
+    """Writes the bus results stored in power_grid as initial voltages of the recycled power flow of base_grid.
+
+    A recycled power flow is initialized from the internal structures of the base grid, which hold the solution of the
+    previous sample, rather than from its results tables. Auxiliary buses (e.g. star points of trafo3w) keep the
+    voltages of the previous solution.
+    """
+    res_bus = power_grid.res_bus
+    if not res_bus.index.equals(power_grid.bus.index):
+        return
+    vm, va = res_bus.vm_pu.values, res_bus.va_degree.values
+    known = np.isfinite(vm) & np.isfinite(va)
+    rows = base_grid._pd2ppc_lookups["bus"][res_bus.index.values[known]]
+    base_grid._ppc["bus"][rows, VM] = vm[known]
+    base_grid._ppc["bus"][rows, VA] = va[known]
+
 
 def generation_voltage_setpoint(power_grid):
     """Voltage set points in per-unit at all generators and ext_grids."""
@@ -213,6 +329,7 @@ def bus_voltage(power_grid):
     return power_grid.res_bus.vm_pu.values, power_grid.bus.name.values
 
 
+@snapshot_cached
 def bus_normalized_voltage(power_grid):
     """Bus voltages normalized by their min-max range. (0=min, 1=max)"""
     v = power_grid.res_bus.vm_pu.values
@@ -221,18 +338,21 @@ def bus_normalized_voltage(power_grid):
     return (v - v_min) / (v_max - v_min + 1e-4), power_grid.bus.name.values
 
 
+@snapshot_cached
 def bus_over_voltage(power_grid):
     """Buses whose voltages are above their maximal authorized value."""
     v_normalized, bus_name = bus_normalized_voltage(power_grid)
     return v_normalized > 1., bus_name
 
 
+@snapshot_cached
 def bus_under_voltage(power_grid):
     """Buses whose voltages are below their minimal authorized value."""
     v_normalized, bus_name = bus_normalized_voltage(power_grid)
     return v_normalized < 0., bus_name
 
 
+@snapshot_cached
 def bus_illicit_voltage(power_grid):
     """Buses whose voltages are out of their authorized range."""
     v_over, bus_name = bus_over_voltage(power_grid)
@@ -240,70 +360,14 @@ def bus_illicit_voltage(power_grid):
     return v_over | v_under, bus_name
 
 
-def bus_illicit_voltage_005(power_grid):
-    """Buses whose voltages are out of their authorized range, with 5% less on both sides."""
-    v_normalized, bus_name = bus_normalized_voltage(power_grid)
-    return (v_normalized < 0.05) | (v_normalized > 0.95), bus_name
-
-
-def bus_illicit_voltage_01(power_grid):
-    """Buses whose voltages are out of their authorized range, with 1O% less on both sides."""
-    v_normalized, bus_name = bus_normalized_voltage(power_grid)
-    return (v_normalized < 0.1) | (v_normalized > 0.9), bus_name
-
-def bus_illicit_voltage_025(power_grid):
-    """Buses whose voltages are out of their authorized range, with 1O% less on both sides."""
-    v_normalized, bus_name = bus_normalized_voltage(power_grid)
-    return (v_normalized < 0.25) | (v_normalized > 0.75), bus_name
-
-
-def bus_illicit_voltage_m005(power_grid):
-    """Buses whose voltages are out of their authorized range, with 5% more on both sides."""
-    v_normalized, bus_name = bus_normalized_voltage(power_grid)
-    return (v_normalized < -0.05) | (v_normalized > 1.05), bus_name
-
-
-def bus_illicit_voltage_m01(power_grid):
-    """Buses whose voltages are out of their authorized range, with 1O% more on both sides."""
-    v_normalized, bus_name = bus_normalized_voltage(power_grid)
-    return (v_normalized < -0.1) | (v_normalized > 1.1), bus_name
-
-
+@snapshot_cached
 def snapshots_illicit_voltage(power_grid):
     """Snapshots with at least one illicit voltage."""
     illicit_bus_voltages, _ = bus_illicit_voltage(power_grid)
     return illicit_bus_voltages.any(), '0'
 
 
-def snapshots_illicit_voltage_005(power_grid):
-    """Snapshots with at least one illicit voltage, with a range 5% smaller on both sides."""
-    illicit_bus_voltages, _ = bus_illicit_voltage_005(power_grid)
-    return illicit_bus_voltages.any(), '0'
-
-
-def snapshots_illicit_voltage_01(power_grid):
-    """Snapshots with at least one illicit voltage, with a range 10% smaller on both sides."""
-    illicit_bus_voltages, _ = bus_illicit_voltage_01(power_grid)
-    return illicit_bus_voltages.any(), '0'
-
-def snapshots_illicit_voltage_025(power_grid):
-    """Snapshots with at least one illicit voltage, with a range 10% smaller on both sides."""
-    illicit_bus_voltages, _ = bus_illicit_voltage_025(power_grid)
-    return illicit_bus_voltages.any(), '0'
-
-
-def snapshots_illicit_voltage_m005(power_grid):
-    """Snapshots with at least one illicit voltage, with a range 5% smaller on both sides."""
-    illicit_bus_voltages, _ = bus_illicit_voltage_m005(power_grid)
-    return illicit_bus_voltages.any(), '0'
-
-
-def snapshots_illicit_voltage_m01(power_grid):
-    """Snapshots with at least one illicit voltage, with a range 10% smaller on both sides."""
-    illicit_bus_voltages, _ = bus_illicit_voltage_m01(power_grid)
-    return illicit_bus_voltages.any(), '0'
-
-
+@snapshot_cached
 def voltage_violation_count(power_grid):
     """Counts the amount of voltage violations in each snapshot."""
     illicit_voltages, _ = bus_illicit_voltage(power_grid)
@@ -320,6 +384,7 @@ def trafo_loading_percent(power_grid):
     return power_grid.res_trafo.loading_percent.values, power_grid.trafo.name.values
 
 
+@snapshot_cached
 def branch_normalized_current(power_grid):
     """Branch normalized current."""
     line = power_grid.res_line.loading_percent.values / 100.
@@ -327,66 +392,21 @@ def branch_normalized_current(power_grid):
     return np.concatenate([line, trafo]), np.concatenate([power_grid.line.name.values, power_grid.trafo.name.values])
 
 
+@snapshot_cached
 def branch_illicit_current(power_grid):
     """Branches with illicit currents w.r.t. their thermal limits."""
     i_normalized, branch_name = branch_normalized_current(power_grid)
     return i_normalized > 1., branch_name
 
 
-def branch_illicit_current_005(power_grid):
-    """Branches with illicit currents w.r.t. 95% of their thermal limits."""
-    i_normalized, branch_name = branch_normalized_current(power_grid)
-    return i_normalized > 0.95, branch_name
-
-
-def branch_illicit_current_01(power_grid):
-    """Branches with illicit currents w.r.t. 90% of their thermal limits."""
-    i_normalized, branch_name = branch_normalized_current(power_grid)
-    return i_normalized > 0.9, branch_name
-
-
-def branch_illicit_current_m005(power_grid):
-    """Branches with illicit currents w.r.t. 105% of their thermal limits."""
-    i_normalized, branch_name = branch_normalized_current(power_grid)
-    return i_normalized > 1.05, branch_name
-
-
-def branch_illicit_current_m01(power_grid):
-    """Branches with illicit currents w.r.t. 110% of their thermal limits."""
-    i_normalized, branch_name = branch_normalized_current(power_grid)
-    return i_normalized > 1.1, branch_name
-
-
+@snapshot_cached
 def snapshots_illicit_current(power_grid):
     """Snapshots with at least one illicit current."""
     illicit_current, _ = branch_illicit_current(power_grid)
     return illicit_current.any(), "0"
 
 
-def snapshots_illicit_current_005(power_grid):
-    """Snapshots with at least one illicit current, with a range 5% smaller on both sides."""
-    illicit_current, _ = branch_illicit_current_005(power_grid)
-    return illicit_current.any(), "0"
-
-
-def snapshots_illicit_current_01(power_grid):
-    """Snapshots with at least one illicit current, with a range 10% smaller on both sides."""
-    illicit_current, _ = branch_illicit_current_01(power_grid)
-    return illicit_current.any(), "0"
-
-
-def snapshots_illicit_current_m005(power_grid):
-    """Snapshots with at least one illicit current, with a range 5% smaller on both sides."""
-    illicit_current, _ = branch_illicit_current_m005(power_grid)
-    return illicit_current.any(), "0"
-
-
-def snapshots_illicit_current_m01(power_grid):
-    """Snapshots with at least one illicit current, with a range 10% smaller on both sides."""
-    illicit_current, _ = branch_illicit_current_m01(power_grid)
-    return illicit_current.any(), "0"
-
-
+@snapshot_cached
 def current_violation_count(power_grid):
     """Counts the amount of current violations in each snapshot."""
     illicit_currents, _ = branch_illicit_current(power_grid)
@@ -413,6 +433,7 @@ def generator_total_reactive_power(power_grid):
     return np.nansum(np.concatenate([power_grid.res_gen.q_mvar.values, power_grid.res_ext_grid.q_mvar.values])), '0'
 
 
+@snapshot_cached
 def generator_normalized_reactive_power(power_grid):
     """Generator reactive power normalized by their min-max range. (0=min, 1=max)"""
     q = np.concatenate([power_grid.res_gen.q_mvar.values, power_grid.res_ext_grid.q_mvar.values])
@@ -421,84 +442,42 @@ def generator_normalized_reactive_power(power_grid):
     return (q - q_min) / (q_max - q_min), np.concatenate([power_grid.gen.name.values, power_grid.ext_grid.name.values])
 
 
+@snapshot_cached
 def generator_over_reactive_power(power_grid):
     """Generators with a reactive power larger than their maximal authorized value."""
     q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
     return q_normalized > 1., gen_name
 
 
+@snapshot_cached
 def generator_under_reactive_power(power_grid):
     """Generators with a reactive power smaller than their minimal authorized value."""
     q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
     return q_normalized < 0., gen_name
 
 
+@snapshot_cached
 def generator_illicit_reactive_power(power_grid):
     """Generators with reactive power out of their authorized value."""
     q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
     return (q_normalized < 0.) | (q_normalized > 1.), gen_name
 
 
-def generator_illicit_reactive_power_005(power_grid):
-    """Generators with reactive power out of their authorized value, with a range 5% smaller on both sides."""
-    q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
-    return (q_normalized < 0.05) | (q_normalized > 0.95), gen_name
-
-
-def generator_illicit_reactive_power_01(power_grid):
-    """Generators with reactive power out of their authorized value, with a range 10% smaller on both sides."""
-    q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
-    return (q_normalized < 0.1) | (q_normalized > 0.9), gen_name
-
-
-def generator_illicit_reactive_power_m005(power_grid):
-    """Generators with reactive power out of their authorized value, with a range 5% larger on both sides."""
-    q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
-    return (q_normalized < -0.05) | (q_normalized > 1.05), gen_name
-
-
-def generator_illicit_reactive_power_m01(power_grid):
-    """Generators with reactive power out of their authorized value, with a range 10% larger on both sides."""
-    q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
-    return (q_normalized < -0.1) | (q_normalized > 1.1), gen_name
-
-
+@snapshot_cached
 def snapshots_illicit_reactive_power(power_grid):
     """Snapshots with at least one illicit reactive power."""
     illicit_reactive_power, _ = generator_illicit_reactive_power(power_grid)
     return illicit_reactive_power.any(), "0"
 
 
-def snapshots_illicit_reactive_power_005(power_grid):
-    """Snapshots with at least one illicit reactive power, with a range 5% smaller on both sides."""
-    illicit_reactive_power, _ = generator_illicit_reactive_power_005(power_grid)
-    return illicit_reactive_power.any(), "0"
-
-
-def snapshots_illicit_reactive_power_01(power_grid):
-    """Snapshots with at least one illicit reactive power, with a range 10% smaller on both sides."""
-    illicit_reactive_power, _ = generator_illicit_reactive_power_01(power_grid)
-    return illicit_reactive_power.any(), "0"
-
-
+@snapshot_cached
 def reactive_violation_count(power_grid):
     """Counts the amount of reactive violations in each snapshot."""
     illicit_reactive, _ = generator_illicit_reactive_power(power_grid)
     return np.sum(illicit_reactive) * 1., '0'
 
 
-def snapshots_illicit_reactive_power_m005(power_grid):
-    """Snapshots with at least one illicit reactive power, with a range 5% smaller on both sides."""
-    illicit_reactive_power, _ = generator_illicit_reactive_power_m005(power_grid)
-    return illicit_reactive_power.any(), "0"
-
-
-def snapshots_illicit_reactive_power_m01(power_grid):
-    """Snapshots with at least one illicit reactive power, with a range 10% smaller on both sides."""
-    illicit_reactive_power, _ = generator_illicit_reactive_power_m01(power_grid)
-    return illicit_reactive_power.any(), "0"
-
-
+@snapshot_cached
 def snapshots_illicit_power_grid(power_grid):
     """Snapshot with at least one illicit value."""
     v, _ = snapshots_illicit_voltage(power_grid)
@@ -507,38 +486,6 @@ def snapshots_illicit_power_grid(power_grid):
     return v | i | q, '0'
 
 
-def snapshots_illicit_power_grid_005(power_grid):
-    """Snapshot with at least one illicit value, with a range 5% smaller on both sides."""
-    v, _ = snapshots_illicit_voltage_005(power_grid)
-    i, _ = snapshots_illicit_current_005(power_grid)
-    q, _ = snapshots_illicit_reactive_power_005(power_grid)
-    return v | i | q, '0'
-
-
-def snapshots_illicit_power_grid_01(power_grid):
-    """Snapshot with at least one illicit value, with a range 1O% smaller on both sides."""
-    v, _ = snapshots_illicit_voltage_01(power_grid)
-    i, _ = snapshots_illicit_current_01(power_grid)
-    q, _ = snapshots_illicit_reactive_power_01(power_grid)
-    return v | i | q, '0'
-
-
-def snapshots_illicit_power_grid_m005(power_grid):
-    """Snapshot with at least one illicit value, with a range 5% smaller on both sides."""
-    v, _ = snapshots_illicit_voltage_m005(power_grid)
-    i, _ = snapshots_illicit_current_m005(power_grid)
-    q, _ = snapshots_illicit_reactive_power_m005(power_grid)
-    return v | i | q, '0'
-
-
-def snapshots_illicit_power_grid_m01(power_grid):
-    """Snapshot with at least one illicit value, with a range 1O% smaller on both sides."""
-    v, _ = snapshots_illicit_voltage_m01(power_grid)
-    i, _ = snapshots_illicit_current_m01(power_grid)
-    q, _ = snapshots_illicit_reactive_power_m01(power_grid)
-    return v | i | q, '0'
-
-
 def violation_count(power_grid):
     """Counts the total amount of violations per snapshot."""
     current_count, _ = current_violation_count(power_grid)
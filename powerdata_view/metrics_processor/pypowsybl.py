@@ -1,7 +1,14 @@
 from abc import ABC
+import xml.parsers.expat
 import pypowsybl as pp
+import pandas as pd
 import numpy as np
+import hashlib
+import os
 from powerdata_view.metrics_processor.interface import MetricsProcessorInterface
+from powerdata_view.metrics_processor.cache import snapshot_cached
+from powerdata_view.metrics_processor.threshold import ThresholdFamily, threshold_metrics, snapshot_threshold_metrics
+from powerdata_view.samples import load_cached_sample, ingest_samples
 
 
 class PyPowSyblMetricsProcessor(MetricsProcessorInterface, ABC):
@@ -9,8 +16,31 @@ class PyPowSyblMetricsProcessor(MetricsProcessorInterface, ABC):
 
     metrics_dict = {}
 
-    def __init__(self):
+    # Name of the binary cache of samples, see `cache_samples`.
+    sample_cache_name = "pypowsybl"
+
+    def __init__(self, threshold_eps=None, reuse_structure=False, cache_samples=False):
         super().__init__()
+
+        # If `cache_samples` is True, samples are parsed once and stored in a binary cache, read by later runs.
+        self.cache_samples = cache_samples
+
+        # If `reuse_structure` is True, the network of the first sample is kept as a base network, and each following
+        # sample that shares its structure is applied to it as a variant, instead of being loaded from scratch.
+        self.reuse_structure = reuse_structure
+        self.base_network = None
+        self.base_structure = None
+        self.base_pid = None
+
+        # Thresholds of the eps-variants of illicit metrics. Additional thresholds may be provided by `threshold_eps`.
+        threshold_eps = list(threshold_eps or [])
+        self.threshold_eps = threshold_eps
+        voltage_family = ThresholdFamily(bus_normalized_voltage, [0.05, 0.1, 0.25, -0.05, -0.1] + threshold_eps)
+        current_family = ThresholdFamily(branch_normalized_current, [0.05, 0.1, -0.05, -0.1] + threshold_eps,
+                                         lower=False)
+        reactive_family = ThresholdFamily(generator_normalized_reactive_power, [0.05, 0.1, -0.05, -0.1] + threshold_eps)
+        families = [voltage_family, current_family, reactive_family]
+
         self.metrics_dict = {
 
             # Voltage set points
@@ -40,17 +70,9 @@ class PyPowSyblMetricsProcessor(MetricsProcessorInterface, ABC):
             "Buses with Over Voltage": bus_over_voltage,
             "Buses with Under Voltage": bus_under_voltage,
             "Buses with Illicit Voltage": bus_illicit_voltage,
-            "Buses with Illicit Voltage, eps=0.05": bus_illicit_voltage_005,
-            "Buses with Illicit Voltage, eps=0.1": bus_illicit_voltage_01,
-            "Buses with Illicit Voltage, eps=0.25": bus_illicit_voltage_025,
-            "Buses with Illicit Voltage, eps=-0.05": bus_illicit_voltage_m005,
-            "Buses with Illicit Voltage, eps=-0.1": bus_illicit_voltage_m01,
+            **threshold_metrics("Buses with Illicit Voltage", voltage_family),
             "Snapshots with Illicit Voltage": snapshots_illicit_voltage,
-            "Snapshots with Illicit Voltage, eps=0.05": snapshots_illicit_voltage_005,
-            "Snapshots with Illicit Voltage, eps=0.1": snapshots_illicit_voltage_01,
-            "Snapshots with Illicit Voltage, eps=0.25": snapshots_illicit_voltage_025,
-            "Snapshots with Illicit Voltage, eps=-0.05": snapshots_illicit_voltage_m005,
-            "Snapshots with Illicit Voltage, eps=-0.1": snapshots_illicit_voltage_m01,
+            **snapshot_threshold_metrics("Snapshots with Illicit Voltage", [voltage_family]),
             "Voltage Violation Count per Snapshot": voltage_violation_count,
 
             # Branch loading
@@ -59,15 +81,9 @@ class PyPowSyblMetricsProcessor(MetricsProcessorInterface, ABC):
             "Three Windings Transformer Loading Percent (%)": three_wt_loading_percent,
             "Branch Normalized Current": branch_normalized_current,
             "Branches with Illicit Current": branch_illicit_current,
-            "Branches with Illicit Current, eps=0.05": branch_illicit_current_005,
-            "Branches with Illicit Current, eps=0.1": branch_illicit_current_01,
-            "Branches with Illicit Current, eps=-0.05": branch_illicit_current_m005,
-            "Branches with Illicit Current, eps=-0.1": branch_illicit_current_m01,
+            **threshold_metrics("Branches with Illicit Current", current_family),
             "Snapshots with Illicit Current": snapshots_illicit_current,
-            "Snapshots with Illicit Current, eps=0.05": snapshots_illicit_current_005,
-            "Snapshots with Illicit Current, eps=0.1": snapshots_illicit_current_01,
-            "Snapshots with Illicit Current, eps=-0.05": snapshots_illicit_current_m005,
-            "Snapshots with Illicit Current, eps=-0.1": snapshots_illicit_current_m01,
+            **snapshot_threshold_metrics("Snapshots with Illicit Current", [current_family]),
             "Current Violation Count per Snapshot": current_violation_count,
 
             # Reactive Generation
@@ -79,21 +95,14 @@ class PyPowSyblMetricsProcessor(MetricsProcessorInterface, ABC):
             "Generators with Over Reactive Power": generator_over_reactive_power,
             "Generators with Under Reactive Power": generator_under_reactive_power,
             "Generators with Illicit Reactive Power": generator_illicit_reactive_power,
-            "Generators with Illicit Reactive Power, eps=0.05": generator_illicit_reactive_power_005,
-            "Generators with Illicit Reactive Power, eps=0.1": generator_illicit_reactive_power_01,
-            "Generators with Illicit Reactive Power, eps=-0.05": generator_illicit_reactive_power_m005,
-            "Generators with Illicit Reactive Power, eps=-0.1": generator_illicit_reactive_power_m01,
+            **threshold_metrics("Generators with Illicit Reactive Power", reactive_family),
             "Snapshots with Illicit Reactive Power": snapshots_illicit_reactive_power,
-            "Snapshots with Illicit Reactive Power, eps=0.05": snapshots_illicit_reactive_power_005,
-            "Snapshots with Illicit Reactive Power, eps=0.1": snapshots_illicit_reactive_power_01,
+            **snapshot_threshold_metrics("Snapshots with Illicit Reactive Power", [reactive_family]),
             "Reactive Violation Count per Snapshot": reactive_violation_count,
 
             # Illicit Snapshots
             "Snapshots with Illicit Values": snapshots_illicit_power_grid,
-            "Snapshots with Illicit Values, eps=0.05": snapshots_illicit_power_grid_005,
-            "Snapshots with Illicit Values, eps=0.1": snapshots_illicit_power_grid_01,
-            "Snapshots with Illicit Values, eps=-0.05": snapshots_illicit_power_grid_m005,
-            "Snapshots with Illicit Values, eps=-0.1": snapshots_illicit_power_grid_m01,
+            **snapshot_threshold_metrics("Snapshots with Illicit Values", families),
             "Violation Count per Snapshot": violation_count,
 
             # Costs
@@ -119,19 +128,216 @@ class PyPowSyblMetricsProcessor(MetricsProcessorInterface, ABC):
 
         Overrides run_powerflow of abstract base class.
         """
-        _ = pp.loadflow.run_ac(power_grid)
+        results = pp.loadflow.run_ac(power_grid)
+        if results[0].status != pp.loadflow.ComponentStatus.CONVERGED:
+            raise Exception("Load flow {}".format(results[0].status_text))
+        return results[0].iteration_count
+
+    def get_settings(self):
+        """Returns the settings that affect computed metrics, including the version of PyPowSybl.
+
+        Overrides get_settings of abstract base class.
+        """
+        return {"threshold_eps": self.threshold_eps, "reuse_structure": self.reuse_structure,
+                "simulator_version": pp.__version__}
 
     def load_power_grid(self, filepath):
         """Loads a power grid in memory.
 
+        If `reuse_structure` is True, samples that share the structure of the base network are only read for their
+        injections, set points and statuses, which are applied to a variant of the base network. Samples whose
+        structure differs, and samples that are not plain XIIDM files (e.g. compressed, JIIDM, BIIDM, MATPOWER or
+        UCTE files), are loaded from scratch.
+        If `cache_samples` is True, networks are read from their binary cache, which is (re)built if needed.
         Overrides load_power_grid of abstract base class.
         """
+        if (not self.reuse_structure) or (not filepath.lower().endswith(XIIDM_EXTENSIONS)):
+            return self.read_network(filepath)
+        try:
+            structure, updates = read_sample_state(filepath)
+        except (xml.parsers.expat.ExpatError, OSError, ValueError):
+            return self.read_network(filepath)
+        if (self.base_network is None) or (self.base_pid != os.getpid()):
+            # Java networks cannot be shared with forked worker processes, each of them loads its own base network.
+            self.base_network = self.read_network(filepath)
+            self.base_structure = structure
+            self.base_pid = os.getpid()
+        elif structure != self.base_structure:
+            return self.read_network(filepath)
+        return apply_sample_state(self.base_network, updates)
+
+    def read_network(self, filepath):
+        """Reads the network of a sample, from its binary cache if `cache_samples` is True."""
+        if self.cache_samples:
+            return load_cached_sample(filepath, pp.network.load, self.sample_cache_name, pp.__version__)
         return pp.network.load(filepath)
 
+    def ingest(self, data_dir):
+        """Builds the binary cache of all samples of `data_dir` ahead of metrics computations."""
+        ingest_samples(data_dir, pp.network.load, self.sample_cache_name, pp.__version__)
+
+    def __getstate__(self):
+        # The base network is not sent to worker processes, each of them loads its own.
+        state = self.__dict__.copy()
+        state.update(base_network=None, base_structure=None, base_pid=None)
+        return state
+
+    def prepare_snapshot(self, power_grid):
+        """Wraps the network into a bundle of tables, so that each table is extracted only once per snapshot.
+
+        Overrides prepare_snapshot of abstract base class.
+        """
+        return NetworkTables(power_grid)
+
+
+class NetworkTables:
+    """Snapshot-scoped bundle of the tables of a PyPowSybl network.
+
+    It exposes the same `get_*` methods as the network, but each table is extracted from the network the first time
+    it is requested, and then reused by all metrics functions of the snapshot. The per-unit view of the network is
+    bundled in the same way, and is returned by `per_unit()`.
+    """
+
+    def __init__(self, network):
+        self.network = network
+        self.tables = {}
+        self._per_unit = None
+
+    def per_unit(self):
+        """Returns the bundle of the tables of the per-unit view of the network, created on first call.
+
+        This is a method rather than a property, so that errors raised while building the per-unit view are not
+        turned into an AttributeError by `__getattr__`.
+        """
+        if self._per_unit is None:
+            self._per_unit = NetworkTables(pp.perunit.per_unit_view(self.network))
+        return self._per_unit
+
+    def __getattr__(self, name):
+        if not name.startswith('get_'):
+            raise AttributeError(name)
+        getter = getattr(self.network, name)
+
+        def get_table(**kwargs):
+            key = (name, tuple(sorted(kwargs.items())))
+            if key not in self.tables:
+                self.tables[key] = getter(**kwargs)
+            return self.tables[key]
+        return get_table
+
+
+# IIDM attributes that may vary from one sample to another, along with the update method and column through which they
+# are applied to a pypowsybl network. Tap positions are stored in children of transformers, and are applied with their
+# parent's id. Connections to buses (bus-breaker topology) are handled separately.
+SAMPLE_ATTRIBUTES = {
+    'load': ('update_loads', {'p0': 'p0', 'q0': 'q0'}),
+    'generator': ('update_generators', {'targetP': 'target_p', 'targetQ': 'target_q', 'targetV': 'target_v',
+                                        'voltageRegulatorOn': 'voltage_regulator_on'}),
+    'battery': ('update_batteries', {'targetP': 'target_p', 'targetQ': 'target_q'}),
+    'shuntCompensator': ('update_shunt_compensators', {'sectionCount': 'section_count'}),
+    'switch': ('update_switches', {'open': 'open'}),
+    'ratioTapChanger': ('update_ratio_tap_changers', {'tapPosition': 'tap'}),
+    'phaseTapChanger': ('update_phase_tap_changers', {'tapPosition': 'tap'}),
+}
+SAMPLE_CONNECTIONS = {
+    'load': ('update_loads', {'bus': 'connected'}),
+    'generator': ('update_generators', {'bus': 'connected'}),
+    'battery': ('update_batteries', {'bus': 'connected'}),
+    'shuntCompensator': ('update_shunt_compensators', {'bus': 'connected'}),
+    'line': ('update_lines', {'bus1': 'connected1', 'bus2': 'connected2'}),
+    'twoWindingsTransformer': ('update_2_windings_transformers', {'bus1': 'connected1', 'bus2': 'connected2'}),
+}
+
+# IIDM attributes that store load flow results or metadata, and that are neither part of the structure of the network
+# nor of the state of a sample.
+IGNORED_ATTRIBUTES = {'p', 'q', 'p1', 'q1', 'p2', 'q2', 'p3', 'q3', 'v', 'angle', 'solvedTapPosition',
+                      'solvedSectionCount', 'caseDate', 'forecastDistance'}
+
+SAMPLE_VARIANT = 'powerdata_view_sample'
+
+# Extensions of plain XIIDM files, the only ones whose state can be read without building a network.
+XIIDM_EXTENSIONS = ('.xiidm', '.iidm', '.xml')
+
+
+def read_sample_state(filepath):
+    """Reads the injections, set points and statuses of an IIDM file, without building a pypowsybl network.
+
+    Returns a hash of the structure of the network (i.e. all other attributes), along with the dictionary of updates
+    to apply to a network of the same structure: {update method: {tuple of element ids: {column: values}}}.
+    Raises a ValueError if the file is an XML file whose root is not an IIDM network (e.g. CGMES).
+    """
+    structure = hashlib.sha256()
+    updates = {}
+    parents = []
+
+    def add_update(method, element_id, column, value):
+        updates.setdefault(method, {}).setdefault(column, {})[element_id] = value
+
+    def start_element(name, attributes):
+        tag = name.rpartition(':')[2]
+        if (not parents) and (tag != 'network'):
+            raise ValueError("{} is not an IIDM network.".format(filepath))
+        element_id = attributes.get('id', parents[-1] if parents else None)
+        parents.append(element_id)
+        variable = set()
+        if tag in SAMPLE_ATTRIBUTES:
+            method, columns = SAMPLE_ATTRIBUTES[tag]
+            for attribute, column in columns.items():
+                if attribute in attributes:
+                    add_update(method, element_id, column, parse_iidm_value(attributes[attribute]))
+                    variable.add(attribute)
+        if tag in SAMPLE_CONNECTIONS:
+            method, columns = SAMPLE_CONNECTIONS[tag]
+            for attribute, column in columns.items():
+                connectable = 'connectableBus' + attribute[3:]
+                if connectable in attributes:
+                    add_update(method, element_id, column, attribute in attributes)
+                    variable.add(attribute)
+        structural = [(k, v) for k, v in attributes.items() if (k not in variable) and (k not in IGNORED_ATTRIBUTES)]
+        structure.update(repr((tag, structural, sorted(variable))).encode())
+
+    def end_element(name):
+        parents.pop()
+
+    parser = xml.parsers.expat.ParserCreate()
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    with open(filepath, 'rb') as f:
+        parser.ParseFile(f)
+    return structure.hexdigest(), updates
+
+
+def parse_iidm_value(value):
+    """Converts an IIDM attribute value to a bool, an int or a float."""
+    if value in ('true', 'false'):
+        return value == 'true'
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def apply_sample_state(network, updates):
+    """Applies the updates of a sample (see `read_sample_state`) to a fresh variant of a base network.
+
+    The variant is cloned from the initial variant of the network, and is set as the working variant.
+    """
+    network.set_working_variant(network.get_variant_ids()[0])
+    network.clone_variant(network.get_variant_ids()[0], SAMPLE_VARIANT, True)
+    network.set_working_variant(SAMPLE_VARIANT)
+    for method, columns in updates.items():
+        # Columns that are defined for the same elements are applied at once.
+        groups = {}
+        for column, values in columns.items():
+            groups.setdefault(tuple(values.keys()), {})[column] = list(values.values())
+        for element_ids, group in groups.items():
+            getattr(network, method)(pd.DataFrame(group, index=pd.Index(element_ids, name='id')))
+    return network
+
 
 def generation_voltage_setpoint(power_grid):
     """Voltage set points in per-unit at all generators and ext_grids."""
-    per_unit_grid = pp.perunit.per_unit_view(power_grid)
+    per_unit_grid = power_grid.per_unit()
     gen_table = per_unit_grid.get_generators()
     gen_on = gen_table.loc[gen_table.connected.values]
     gen_vm_pu = gen_on.target_v.values
@@ -139,6 +345,7 @@ def generation_voltage_setpoint(power_grid):
     return gen_vm_pu, gen_name
 
 
+@snapshot_cached
 def line_joule_losses(power_grid):
     """Joule losses in MW at all transmission lines."""
     line_table = power_grid.get_lines()
@@ -147,6 +354,7 @@ def line_joule_losses(power_grid):
     return line_joule_losses, line_name
 
 
+@snapshot_cached
 def two_windings_trafo_joule_losses(power_grid):
     """Joule losses in MW at all 2 windings transformers."""
     trafo_table = power_grid.get_2_windings_transformers()
@@ -155,6 +363,7 @@ def two_windings_trafo_joule_losses(power_grid):
     return trafo_joule_losses, trafo_name
 
 
+@snapshot_cached
 def three_windings_trafo_joule_losses(power_grid):
     """Joule losses in MW at all 3 windings transformers."""
     trafo_table = power_grid.get_3_windings_transformers()
@@ -163,6 +372,7 @@ def three_windings_trafo_joule_losses(power_grid):
     return trafo_joule_losses, trafo_name
 
 
+@snapshot_cached
 def total_joule_losses(power_grid):
     """Total Joule losses in MW summed over the power grid."""
     line_joule, _ = line_joule_losses(power_grid)
@@ -171,6 +381,7 @@ def total_joule_losses(power_grid):
     return np.sum(line_joule) + np.sum(two_wt_joule) + np.sum(three_wt_joule), '0'
 
 
+@snapshot_cached
 def normalized_joule_losses(power_grid):
     """Total Joule losses summed over the power grid, divided by the total consumption."""
     total_joule, _ = total_joule_losses(power_grid)
@@ -232,14 +443,15 @@ def load_power_factor(power_grid):
 
 def bus_voltage(power_grid):
     """Bus voltages in per-unit."""
-    per_unit_grid = pp.perunit.per_unit_view(power_grid)
+    per_unit_grid = power_grid.per_unit()
     bus_table = per_unit_grid.get_buses()
     return bus_table.v_mag.values, bus_table.index.values
 
 
+@snapshot_cached
 def bus_normalized_voltage(power_grid):
     """Bus voltages normalized by their min-max range. (0=min, 1=max)"""
-    per_unit_grid = pp.perunit.per_unit_view(power_grid)
+    per_unit_grid = power_grid.per_unit()
     voltage_level_table = per_unit_grid.get_voltage_levels()
     bus_table = per_unit_grid.get_buses()
     v = bus_table.v_mag.values
@@ -248,18 +460,21 @@ def bus_normalized_voltage(power_grid):
     return (v - v_min) / (v_max - v_min), bus_table.index.values
 
 
+@snapshot_cached
 def bus_over_voltage(power_grid):
     """Buses whose voltages are above their maximal authorized value."""
     v_normalized, bus_name = bus_normalized_voltage(power_grid)
     return v_normalized > 1., bus_name
 
 
+@snapshot_cached
 def bus_under_voltage(power_grid):
     """Buses whose voltages are below their minimal authorized value."""
     v_normalized, bus_name = bus_normalized_voltage(power_grid)
     return v_normalized < 0., bus_name
 
 
+@snapshot_cached
 def bus_illicit_voltage(power_grid):
     """Buses whose voltages are out of their authorized range."""
     v_over, bus_name = bus_over_voltage(power_grid)
@@ -267,76 +482,21 @@ def bus_illicit_voltage(power_grid):
     return v_over | v_under, bus_name
 
 
-def bus_illicit_voltage_005(power_grid):
-    """Buses whose voltages are out of their authorized range, with 5% less on both sides."""
-    v_normalized, bus_name = bus_normalized_voltage(power_grid)
-    return (v_normalized < 0.05) | (v_normalized > 0.95), bus_name
-
-
-def bus_illicit_voltage_01(power_grid):
-    """Buses whose voltages are out of their authorized range, with 1O% less on both sides."""
-    v_normalized, bus_name = bus_normalized_voltage(power_grid)
-    return (v_normalized < 0.1) | (v_normalized > 0.9), bus_name
-
-def bus_illicit_voltage_025(power_grid):
-    """Buses whose voltages are out of their authorized range, with 1O% less on both sides."""
-    v_normalized, bus_name = bus_normalized_voltage(power_grid)
-    return (v_normalized < 0.25) | (v_normalized > 0.75), bus_name
-
-
-def bus_illicit_voltage_m005(power_grid):
-    """Buses whose voltages are out of their authorized range, with 5% more on both sides."""
-    v_normalized, bus_name = bus_normalized_voltage(power_grid)
-    return (v_normalized < -0.05) | (v_normalized > 1.05), bus_name
-
-
-def bus_illicit_voltage_m01(power_grid):
-    """Buses whose voltages are out of their authorized range, with 1O% more on both sides."""
-    v_normalized, bus_name = bus_normalized_voltage(power_grid)
-    return (v_normalized < -0.1) | (v_normalized > 1.1), bus_name
-
-
+@snapshot_cached
 def snapshots_illicit_voltage(power_grid):
     """Snapshots with at least one illicit voltage."""
     illicit_bus_voltages, _ = bus_illicit_voltage(power_grid)
     return illicit_bus_voltages.any(), '0'
 
 
-def snapshots_illicit_voltage_005(power_grid):
-    """Snapshots with at least one illicit voltage, with a range 5% smaller on both sides."""
-    illicit_bus_voltages, _ = bus_illicit_voltage_005(power_grid)
-    return illicit_bus_voltages.any(), '0'
-
-
-def snapshots_illicit_voltage_01(power_grid):
-    """Snapshots with at least one illicit voltage, with a range 10% smaller on both sides."""
-    illicit_bus_voltages, _ = bus_illicit_voltage_01(power_grid)
-    return illicit_bus_voltages.any(), '0'
-
-def snapshots_illicit_voltage_025(power_grid):
-    """Snapshots with at least one illicit voltage, with a range 10% smaller on both sides."""
-    illicit_bus_voltages, _ = bus_illicit_voltage_025(power_grid)
-    return illicit_bus_voltages.any(), '0'
-
-
-def snapshots_illicit_voltage_m005(power_grid):
-    """Snapshots with at least one illicit voltage, with a range 5% smaller on both sides."""
-    illicit_bus_voltages, _ = bus_illicit_voltage_m005(power_grid)
-    return illicit_bus_voltages.any(), '0'
-
-
-def snapshots_illicit_voltage_m01(power_grid):
-    """Snapshots with at least one illicit voltage, with a range 10% smaller on both sides."""
-    illicit_bus_voltages, _ = bus_illicit_voltage_m01(power_grid)
-    return illicit_bus_voltages.any(), '0'
-
-
+@snapshot_cached
 def voltage_violation_count(power_grid):
     """Counts the amount of voltage violations in each snapshot."""
     illicit_voltages, _ = bus_illicit_voltage(power_grid)
     return np.sum(illicit_voltages) * 1., '0'
 
 
+@snapshot_cached
 def line_loading_percent(power_grid):
     """Line loading percentage, 100 corresponds to a fully loaded line."""
     operational_limits_table = power_grid.get_operational_limits()
@@ -349,6 +509,7 @@ def line_loading_percent(power_grid):
     return 100 * np.maximum(np.abs(i1/i1_max), np.abs(i2/i2_max)), line_table.index.values
 
 
+@snapshot_cached
 def two_wt_loading_percent(power_grid):
     """Two windings transformer loading percentage, 100 corresponds to a fully loaded line."""
     operational_limits_table = power_grid.get_operational_limits()
@@ -361,6 +522,7 @@ def two_wt_loading_percent(power_grid):
     return 100 * np.maximum(np.abs(i1 / i1_max), np.abs(i2 / i2_max)), line_table.index.values
 
 
+@snapshot_cached
 def three_wt_loading_percent(power_grid):
     """Three windings transformer loading percentage, 100 corresponds to a fully loaded line."""
     operational_limits_table = power_grid.get_operational_limits()
@@ -373,6 +535,7 @@ def three_wt_loading_percent(power_grid):
     return 100 * np.maximum(np.abs(i1 / i1_max), np.abs(i2 / i2_max)), line_table.index.values
 
 
+@snapshot_cached
 def branch_normalized_current(power_grid):
     """Branch normalized current."""
     line_percentage, line_name = line_loading_percent(power_grid)
@@ -385,66 +548,21 @@ def branch_normalized_current(power_grid):
     return current, name
 
 
+@snapshot_cached
 def branch_illicit_current(power_grid):
     """Branches with illicit currents w.r.t. their thermal limits."""
     i_normalized, branch_name = branch_normalized_current(power_grid)
     return i_normalized > 1., branch_name
 
 
-def branch_illicit_current_005(power_grid):
-    """Branches with illicit currents w.r.t. 95% of their thermal limits."""
-    i_normalized, branch_name = branch_normalized_current(power_grid)
-    return i_normalized > 0.95, branch_name
-
-
-def branch_illicit_current_01(power_grid):
-    """Branches with illicit currents w.r.t. 90% of their thermal limits."""
-    i_normalized, branch_name = branch_normalized_current(power_grid)
-    return i_normalized > 0.9, branch_name
-
-
-def branch_illicit_current_m005(power_grid):
-    """Branches with illicit currents w.r.t. 105% of their thermal limits."""
-    i_normalized, branch_name = branch_normalized_current(power_grid)
-    return i_normalized > 1.05, branch_name
-
-
-def branch_illicit_current_m01(power_grid):
-    """Branches with illicit currents w.r.t. 110% of their thermal limits."""
-    i_normalized, branch_name = branch_normalized_current(power_grid)
-    return i_normalized > 1.1, branch_name
-
-
+@snapshot_cached
 def snapshots_illicit_current(power_grid):
     """Snapshots with at least one illicit current."""
     illicit_current, _ = branch_illicit_current(power_grid)
     return illicit_current.any(), "0"
 
 
-def snapshots_illicit_current_005(power_grid):
-    """Snapshots with at least one illicit current, with a range 5% smaller on both sides."""
-    illicit_current, _ = branch_illicit_current_005(power_grid)
-    return illicit_current.any(), "0"
-
-
-def snapshots_illicit_current_01(power_grid):
-    """Snapshots with at least one illicit current, with a range 10% smaller on both sides."""
-    illicit_current, _ = branch_illicit_current_01(power_grid)
-    return illicit_current.any(), "0"
-
-
-def snapshots_illicit_current_m005(power_grid):
-    """Snapshots with at least one illicit current, with a range 5% smaller on both sides."""
-    illicit_current, _ = branch_illicit_current_m005(power_grid)
-    return illicit_current.any(), "0"
-
-
-def snapshots_illicit_current_m01(power_grid):
-    """Snapshots with at least one illicit current, with a range 10% smaller on both sides."""
-    illicit_current, _ = branch_illicit_current_m01(power_grid)
-    return illicit_current.any(), "0"
-
-
+@snapshot_cached
 def current_violation_count(power_grid):
     """Counts the amount of current violations in each snapshot."""
     illicit_currents, _ = branch_illicit_current(power_grid)
@@ -475,6 +593,7 @@ def generator_total_reactive_power(power_grid):
     return np.sum(gen_table.q.values), '0'
 
 
+@snapshot_cached
 def generator_normalized_reactive_power(power_grid):
     """Generator reactive power normalized by their min-max range. (0=min, 1=max)"""
     gen_table = power_grid.get_generators(all_attributes=True)
@@ -484,84 +603,42 @@ def generator_normalized_reactive_power(power_grid):
     return (-q - q_min) / (q_max - q_min), gen_table.index.values
 
 
+@snapshot_cached
 def generator_over_reactive_power(power_grid):
     """Generators with a reactive power larger than their maximal authorized value."""
     q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
     return q_normalized > 1., gen_name
 
 
+@snapshot_cached
 def generator_under_reactive_power(power_grid):
     """Generators with a reactive power smaller than their minimal authorized value."""
     q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
     return q_normalized < 0., gen_name
 
 
+@snapshot_cached
 def generator_illicit_reactive_power(power_grid):
     """Generators with reactive power out of their authorized value."""
     q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
     return (q_normalized < 0.) | (q_normalized > 1.), gen_name
 
 
-def generator_illicit_reactive_power_005(power_grid):
-    """Generators with reactive power out of their authorized value, with a range 5% smaller on both sides."""
-    q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
-    return (q_normalized < 0.05) | (q_normalized > 0.95), gen_name
-
-
-def generator_illicit_reactive_power_01(power_grid):
-    """Generators with reactive power out of their authorized value, with a range 10% smaller on both sides."""
-    q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
-    return (q_normalized < 0.1) | (q_normalized > 0.9), gen_name
-
-
-def generator_illicit_reactive_power_m005(power_grid):
-    """Generators with reactive power out of their authorized value, with a range 5% larger on both sides."""
-    q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
-    return (q_normalized < -0.05) | (q_normalized > 1.05), gen_name
-
-
-def generator_illicit_reactive_power_m01(power_grid):
-    """Generators with reactive power out of their authorized value, with a range 10% larger on both sides."""
-    q_normalized, gen_name = generator_normalized_reactive_power(power_grid)
-    return (q_normalized < -0.1) | (q_normalized > 1.1), gen_name
-
-
+@snapshot_cached
 def snapshots_illicit_reactive_power(power_grid):
     """Snapshots with at least one illicit reactive power."""
     illicit_reactive_power, _ = generator_illicit_reactive_power(power_grid)
     return illicit_reactive_power.any(), "0"
 
 
-def snapshots_illicit_reactive_power_005(power_grid):
-    """Snapshots with at least one illicit reactive power, with a range 5% smaller on both sides."""
-    illicit_reactive_power, _ = generator_illicit_reactive_power_005(power_grid)
-    return illicit_reactive_power.any(), "0"
-
-
-def snapshots_illicit_reactive_power_01(power_grid):
-    """Snapshots with at least one illicit reactive power, with a range 10% smaller on both sides."""
-    illicit_reactive_power, _ = generator_illicit_reactive_power_01(power_grid)
-    return illicit_reactive_power.any(), "0"
-
-
+@snapshot_cached
 def reactive_violation_count(power_grid):
     """Counts the amount of reactive violations in each snapshot."""
     illicit_reactive, _ = generator_illicit_reactive_power(power_grid)
     return np.sum(illicit_reactive), '0'
 
 
-def snapshots_illicit_reactive_power_m005(power_grid):
-    """Snapshots with at least one illicit reactive power, with a range 5% smaller on both sides."""
-    illicit_reactive_power, _ = generator_illicit_reactive_power_m005(power_grid)
-    return illicit_reactive_power.any(), "0"
-
-
-def snapshots_illicit_reactive_power_m01(power_grid):
-    """Snapshots with at least one illicit reactive power, with a range 10% smaller on both sides."""
-    illicit_reactive_power, _ = generator_illicit_reactive_power_m01(power_grid)
-    return illicit_reactive_power.any(), "0"
-
-
+@snapshot_cached
 def snapshots_illicit_power_grid(power_grid):
     """Snapshot with at least one illicit value."""
     v, _ = snapshots_illicit_voltage(power_grid)
@@ -570,38 +647,6 @@ def snapshots_illicit_power_grid(power_grid):
     return v | i | q, '0'
 
 
-def snapshots_illicit_power_grid_005(power_grid):
-    """Snapshot with at least one illicit value, with a range 5% smaller on both sides."""
-    v, _ = snapshots_illicit_voltage_005(power_grid)
-    i, _ = snapshots_illicit_current_005(power_grid)
-    q, _ = snapshots_illicit_reactive_power_005(power_grid)
-    return v | i | q, '0'
-
-
-def snapshots_illicit_power_grid_01(power_grid):
-    """Snapshot with at least one illicit value, with a range 1O% smaller on both sides."""
-    v, _ = snapshots_illicit_voltage_01(power_grid)
-    i, _ = snapshots_illicit_current_01(power_grid)
-    q, _ = snapshots_illicit_reactive_power_01(power_grid)
-    return v | i | q, '0'
-
-
-def snapshots_illicit_power_grid_m005(power_grid):
-    """Snapshot with at least one illicit value, with a range 5% smaller on both sides."""
-    v, _ = snapshots_illicit_voltage_m005(power_grid)
-    i, _ = snapshots_illicit_current_m005(power_grid)
-    q, _ = snapshots_illicit_reactive_power_m005(power_grid)
-    return v | i | q, '0'
-
-
-def snapshots_illicit_power_grid_m01(power_grid):
-    """Snapshot with at least one illicit value, with a range 1O% smaller on both sides."""
-    v, _ = snapshots_illicit_voltage_m01(power_grid)
-    i, _ = snapshots_illicit_current_m01(power_grid)
-    q, _ = snapshots_illicit_reactive_power_m01(power_grid)
-    return v | i | q, '0'
-
-
 def violation_count(power_grid):
     """Counts the total amount of violations per snapshot."""
     current_count, _ = current_violation_count(power_grid)
@@ -0,0 +1,80 @@
+import numpy as np
+from powerdata_view.metrics_processor.cache import snapshot_context
+
+
+def get_eps_name(name, eps):
+    """Name of the variant of metrics `name` for threshold `eps` (e.g. `"Buses with Illicit Voltage, eps=0.05"`)."""
+    return '{}, eps={}'.format(name, eps)
+
+
+class ThresholdFamily:
+    """Family of metrics that flag objects whose normalized value (0=min, 1=max) is illicit, for a list of thresholds.
+
+    For a threshold eps, objects are illicit if their normalized value is above 1-eps, or below eps if `lower` is True.
+    Positive values of eps shrink the authorized range, while negative values widen it. The base metrics (eps=0) is
+    defined separately, and is not part of the family.
+    All thresholds are evaluated at once with a single broadcast comparison, which is memoized within the current
+    snapshot and shared by all metrics of the family.
+    """
+
+    def __init__(self, normalized, eps_list, lower=True):
+        self.normalized = normalized
+        self.lower = lower
+        self.eps_list = []
+        self.add_eps(eps_list)
+
+    def add_eps(self, eps_list):
+        """Adds thresholds to the family, ignoring eps=0 and thresholds that are already defined."""
+        for eps in eps_list:
+            if (eps != 0) and (eps not in self.eps_list):
+                self.eps_list.append(eps)
+
+    def evaluate(self, power_grid):
+        """Boolean array of shape (n_eps, n_objects) that flags illicit objects for each threshold, and object names."""
+        return snapshot_context.evaluate(self._evaluate, power_grid)
+
+    def _evaluate(self, power_grid):
+        values, names = self.normalized(power_grid)
+        eps = np.array(self.eps_list, dtype=float)[:, None]
+        illicit = values > 1. - eps
+        if self.lower:
+            illicit |= values < eps
+        return illicit, names
+
+
+class ThresholdMetrics:
+    """Metrics function that flags illicit objects of a threshold family, for threshold eps."""
+
+    def __init__(self, family, eps):
+        self.family = family
+        self.eps = eps
+
+    def __call__(self, power_grid):
+        illicit, names = self.family.evaluate(power_grid)
+        return illicit[self.family.eps_list.index(self.eps)], names
+
+
+class SnapshotThresholdMetrics:
+    """Metrics function that flags snapshots with an illicit object in any of `families`, for threshold eps."""
+
+    def __init__(self, families, eps):
+        self.families = families
+        self.eps = eps
+
+    def __call__(self, power_grid):
+        illicit = False
+        for family in self.families:
+            family_illicit, _ = family.evaluate(power_grid)
+            illicit = illicit | family_illicit[family.eps_list.index(self.eps)].any()
+        return illicit, '0'
+
+
+def threshold_metrics(name, family):
+    """Dictionary of the metrics of a threshold family, one per threshold, named after `name`."""
+    return {get_eps_name(name, eps): ThresholdMetrics(family, eps) for eps in family.eps_list}
+
+
+def snapshot_threshold_metrics(name, families):
+    """Dictionary of the snapshot-level metrics of threshold families, for each threshold shared by all families."""
+    eps_list = [eps for eps in families[0].eps_list if all(eps in family.eps_list for family in families)]
+    return {get_eps_name(name, eps): SnapshotThresholdMetrics(families, eps) for eps in eps_list}
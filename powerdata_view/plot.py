@@ -1,43 +1,247 @@
+from powerdata_view.profiling import stage_profiler
+from powerdata_view.statistics import CorrelationHistograms
 from powerdata_view.utils import slugify
-import matplotlib.pyplot as plt
 import matplotlib
 matplotlib.use("Agg")
+from matplotlib import cbook
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.path import Path
+import collections
 import numpy as np
 import pandas as pd
 import os
 import gc
 
-def plot_float_summary(df, val_range, key, path, figsize, colors, log=False, extension=".pdf", title=True):
-    """Plots of the different histogram versions."""
-    fig, ax = plt.subplots(figsize=figsize)
-    if title:
-        if log:
-            plt.title(key + ' - Log Scale')  # , loc='center', wrap=True)
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class FloatSummary:
+    """Statistics of the columns of a float aggregate, computed once and shared by all summary plots.
+
+    For each column, NaN values are dropped, and the histogram (`bins` bins over `val_range`) and the boxplot
+    statistics (quartiles, whiskers and fliers) are computed with NumPy.
+    """
+
+    def __init__(self, df, val_range, bins=100):
+        self.columns = list(df.columns)
+        self.val_range = val_range
+        self.counts = {}
+        self.edges = {}
+        self.boxplot_stats = {}
+        for name in self.columns:
+            data = df[name].astype(float).to_numpy()
+            data = data[~np.isnan(data)]
+            self.counts[name], self.edges[name] = np.histogram(data, bins=bins, range=val_range)
+            self.boxplot_stats[name] = cbook.boxplot_stats(data, labels=[name])[0]
+
+    @classmethod
+    def from_accumulator(cls, accumulator):
+        """Builds the summary of an aggregate read by chunks, from its `AggregateAccumulator` (after both passes)."""
+        summary = cls.__new__(cls)
+        summary.columns = list(accumulator.columns)
+        summary.val_range = accumulator.histograms.val_range
+        summary.counts = dict(zip(summary.columns, accumulator.histograms.counts))
+        summary.edges = {name: accumulator.histograms.edges for name in summary.columns}
+        summary.boxplot_stats = accumulator.boxplot_stats()
+        return summary
+
+    def density(self, name):
+        """Returns the density histogram of column `name` (values and bin edges). Empty columns have a null density."""
+        counts, edges = self.counts[name], self.edges[name]
+        total = counts.sum()
+        if total == 0:
+            return np.zeros(len(counts)), edges
+        return counts / (total * np.diff(edges)), edges
+
+
+class FigureState:
+    """State of a figure that renders change besides the data of its artists: subplot parameters (and thus the
+    position of axes, which `tight_layout` moves), limits and autoscaling of each axes, titles and legends.
+
+    The state is saved when the figure is created, and `restore` brings the figure back to it. The figure title, if
+    any, is created along with the figure (see `_create_float_summary_grid`) and set by each render.
+    """
+
+    def __init__(self, fig):
+        self.fig = fig
+        params = fig.subplotpars
+        self.subplot_params = dict(left=params.left, right=params.right, bottom=params.bottom, top=params.top,
+                                   wspace=params.wspace, hspace=params.hspace)
+        self.axes = [(ax, ax.get_xlim(), ax.get_ylim(), ax.get_autoscalex_on(), ax.get_autoscaley_on(),
+                      ax.dataLim.frozen(), ax.ignore_existing_data_limits, ax.get_title(), ax.get_legend())
+                     for ax in fig.axes]
+
+    def restore(self):
+        """Resets the figure to the saved state."""
+        self.fig.subplots_adjust(**self.subplot_params)
+        for ax, xlim, ylim, autoscalex, autoscaley, data_lim, ignore_limits, title, legend in self.axes:
+            ax.set_xlim(xlim)
+            ax.set_ylim(ylim)
+            ax.set_autoscalex_on(autoscalex)
+            ax.set_autoscaley_on(autoscaley)
+            ax.dataLim.set(data_lim)
+            ax.ignore_existing_data_limits = ignore_limits
+            ax.set_title(title)
+            if (ax.get_legend() is not None) and (ax.get_legend() is not legend):
+                ax.get_legend().remove()
+
+
+class FigurePool:
+    """Figures reused across renders, one per layout (kind of plot, figure size, grid, number of versions...).
+
+    Each figure is created once, along with the artists of its plot, and later renders only update the data of these
+    artists in place, which avoids creating and destroying a figure for each plot. Figures are not managed by pyplot.
+    Before a figure is reused, its layout, limits, titles and legends are reset to their state right after creation
+    (see `FigureState`), so that a render does not depend on the previous ones.
+    At most `max_figures` figures are kept (least recently used ones are dropped first), and the pool is emptied
+    whenever Matplotlib settings change (e.g. in night mode), since figures are styled when they are created.
+    """
+
+    def __init__(self, max_figures=32, min_available_memory=0.1):
+        self.max_figures = max_figures
+        self.min_available_memory = min_available_memory
+        self.figures = collections.OrderedDict()
+        self.rc_params = None
+
+    def get(self, layout, create, *args):
+        """Returns the figure of `layout` along with its artists, created by create(*args) if there is none yet."""
+        rc_params = matplotlib.rcParams.copy()
+        if rc_params != self.rc_params:
+            self.clear()
+            self.rc_params = rc_params
+        if layout in self.figures:
+            self.figures.move_to_end(layout)
+            template, state = self.figures[layout]
+            state.restore()
         else:
-            plt.title(key)
-    #_range = [df.min().min(), df.max().max()]
-    for i, name in enumerate(df.columns):
-        data = df[name].astype(float).to_numpy()
-        plt.hist(data[~np.isnan(data)], density=True, bins=100, alpha=0.5, color=colors[i], label=name, range=val_range)
+            template = create(*args)
+            self.figures[layout] = template, FigureState(template["fig"])
+            while len(self.figures) > self.max_figures:
+                self.figures.popitem(last=False)
+        return template
+
+    def clear(self):
+        """Drops all figures."""
+        self.figures.clear()
+
+    def collect(self):
+        """Drops all figures and runs the garbage collector, only if the system is running out of memory.
+
+        Memory is short if less than `min_available_memory` (share of the total memory) is available. Checking it
+        requires psutil: otherwise, garbage collection is left to Python.
+        """
+        if psutil is None:
+            return
+        memory = psutil.virtual_memory()
+        if memory.available < self.min_available_memory * memory.total:
+            self.clear()
+            gc.collect()
+
+
+# Figures of the current process. Worker processes start with an empty pool.
+figure_pool = FigurePool()
+
+
+def new_figure(figsize, nrows=1, ncols=1):
+    """Creates a figure that is not managed by pyplot, along with its 2D array of axes."""
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots(nrows, ncols, squeeze=False)
+
+
+def new_histogram(ax, **kwargs):
+    """Creates an empty filled histogram on `ax`, whose values and edges are later set with `set_data`."""
+    kwargs.setdefault("linewidth", 0)
+    return ax.stairs([0.], [0., 1.], fill=True, **kwargs)
+
+
+def autoscale_histograms(ax, histograms):
+    """Autoscales `ax` so that it fits `histograms`, as if bars had been drawn (including on a log scale)."""
+    x_min, x_max, y_max, y_min_positive = np.inf, -np.inf, 0., np.inf
+    for histogram in histograms:
+        values, edges = histogram.get_data().values, histogram.get_data().edges
+        x_min, x_max = min(x_min, edges[0]), max(x_max, edges[-1])
+        y_max = max(y_max, values.max())
+        positive = values[values > 0]
+        if len(positive):
+            y_min_positive = min(y_min_positive, positive.min())
+    points = [[x_min, 0.], [x_max, y_max]]
+    if np.isfinite(y_min_positive):
+        points.append([x_min, y_min_positive])
+    ax.ignore_existing_data_limits = True
+    ax.update_datalim(points)
+    ax.autoscale()
+
+
+def savefig(fig, name, **kwargs):
+    """Saves `fig`, recording the time spent as the `savefig` stage."""
+    with stage_profiler.timed("savefig"):
+        fig.savefig(name, **kwargs)
+
+
+def _create_float_summary(figsize, n_columns, log):
+    fig, axs = new_figure(figsize)
+    ax = axs[0, 0]
+    histograms = [new_histogram(ax, alpha=0.5) for _ in range(n_columns)]
+    if log:
+        ax.set_yscale('log')
     ax.yaxis.set_ticks([])
+    return {"fig": fig, "ax": ax, "histograms": histograms}
+
 
-    plt.legend()
+def plot_float_summary(df, val_range, key, path, figsize, colors, log=False, extension=".pdf", title=True,
+                       summary=None):
+    """Plots of the different histogram versions. Histograms are taken from `summary` (a FloatSummary), if provided."""
+    if summary is None:
+        summary = FloatSummary(df, val_range)
+    layout = ("float_summary", tuple(figsize), len(df.columns), log, title)
+    template = figure_pool.get(layout, _create_float_summary, figsize, len(df.columns), log)
+    fig, ax = template["fig"], template["ax"]
+    if title:
+        if log:
+            ax.set_title(key + ' - Log Scale')  # , loc='center', wrap=True)
+        else:
+            ax.set_title(key)
+    for histogram, name, color in zip(template["histograms"], df.columns, colors):
+        histogram.set_data(*summary.density(name))
+        histogram.set_facecolor(color)
+        histogram.set_label(name)
+    autoscale_histograms(ax, template["histograms"])
+    ax.legend()
     if log:
-        plt.yscale('log')
-        ax.yaxis.set_ticks([])
         name = os.path.join(path, slugify(key) + '_log_scale' + extension)
     else:
         name = os.path.join(path, slugify(key) + extension)
-    plt.tight_layout()
-    plt.savefig(name, bbox_inches='tight')
-    plt.cla()
-    plt.clf()
-    plt.close()
-    gc.collect()
+    fig.tight_layout()
+    savefig(fig, name, bbox_inches='tight')
+    figure_pool.collect()
 
 
-def plot_float_summary_grid(df, val_range, key, path, figsize, colors, log=False, grid=None, extension=".pdf", title=True):
-    """Grid of plots of the different histogram versions."""
+def _create_float_summary_grid(figsize, nx, ny, n_columns, log, title):
+    fig, axs = new_figure(figsize, nx, ny)
+    axs_flat = list(axs.flat)
+    histograms = []
+    for ax in axs_flat[:n_columns]:
+        histograms.append(new_histogram(ax))
+        ax.label_outer()
+        if log:
+            ax.set_yscale('log')
+        # Ticks are hidden rather than removed, so that y ranges are autoscaled as with the default tick locators.
+        ax.tick_params(axis='y', which='major', left=False, labelleft=False)
+    for ax in axs_flat[n_columns:]:
+        ax.set_axis_off()  # Make unused subplots invisible
+    # The title is only created if needed, since its space is taken from the axes by `tight_layout`.
+    suptitle = fig.suptitle('') if title else None
+    return {"fig": fig, "axs": axs_flat[:n_columns], "histograms": histograms, "suptitle": suptitle}
+
+
+def plot_float_summary_grid(df, val_range, key, path, figsize, colors, log=False, grid=None, extension=".pdf",
+                            title=True, summary=None):
+    """Grid of plots of the different histogram versions. Histograms are taken from `summary`, if provided."""
 
     def get_layout(df):
         """Returns the right values of nrows and ncol such that grid data is displayed evenly."""
@@ -50,180 +254,284 @@ def plot_float_summary_grid(df, val_range, key, path, figsize, colors, log=False
         elif N <= (n + 1) ** 2:
             return n + 1, n + 1
 
+    if summary is None:
+        summary = FloatSummary(df, val_range)
     if grid is None:
         nx, ny = get_layout(df)
     else:
         nx, ny = grid[0], grid[1]
-    fig, axs = plt.subplots(nx, ny, figsize=figsize)
+    layout = ("float_summary_grid", tuple(figsize), nx, ny, len(df.columns), log, title)
+    template = figure_pool.get(layout, _create_float_summary_grid, figsize, nx, ny, len(df.columns), log, title)
+    fig = template["fig"]
     if title:
         if log:
-            fig.suptitle(key+' - Log Scale')#, loc='center', wrap=True)
+            template["suptitle"].set_text(key+' - Log Scale')#, loc='center', wrap=True)
         else:
-            fig.suptitle(key)
-    #_range = [df.min().min(), df.max().max()]
-    y_max = 0
-    y_max_log = 0
-    y_min_log = 1e12
-
-    if len(df.columns) == 1 :
-        axs_flat = [axs]
-    else:
-        axs_flat = axs.flat
-
-    for i, name in enumerate(df.columns):
-        data = df[name].astype(float).to_numpy().astype(float)
-        axs_flat[i].hist(data[~np.isnan(data)], density=True, bins=100, color=colors[i], range=val_range)
-        axs_flat[i].set_title(name)
-        axs_flat[i].label_outer()
-        y_max = max(y_max, axs_flat[i].get_ylim()[1])
-
-        # Get limits for log scale
-        axs_flat[i].set_yscale('log')
-        y_max_log = max(y_max_log, axs_flat[i].get_ylim()[1])
-        y_min_log = min(y_min_log, axs_flat[i].get_ylim()[0])
-        axs_flat[i].set_yscale('linear')
-
+            template["suptitle"].set_text(key)
 
-
-    for i, name in enumerate(df.columns):
+    # All histograms share the same y range.
+    y_min, y_max = np.inf, 0.
+    for ax, histogram, name, color in zip(template["axs"], template["histograms"], df.columns, colors):
+        histogram.set_data(*summary.density(name))
+        histogram.set_facecolor(color)
+        ax.set_title(name)
+        autoscale_histograms(ax, [histogram])
+        y_min, y_max = min(y_min, ax.get_ylim()[0]), max(y_max, ax.get_ylim()[1])
+    for ax in template["axs"]:
         if log:
-            axs_flat[i].set_yscale('log')
-            axs_flat[i].set_ylim([y_min_log, y_max_log])
-            axs_flat[i].yaxis.set_ticks([])
+            ax.set_ylim([y_min, y_max])
         else:
-            axs_flat[i].set_ylim([0, y_max])
-            axs_flat[i].yaxis.set_ticks([])
-    for ax in axs_flat[len(df.columns):]:
-        ax.set_axis_off()  # Make unused subplots invisible
-
+            ax.set_ylim([0, y_max])
 
     if log:
         name = os.path.join(path, slugify(key) + '_grid_log_scale' + extension)
     else:
         name = os.path.join(path, slugify(key) + '_grid' + extension)
-    plt.tight_layout()
-    plt.savefig(name, bbox_inches='tight')
-    plt.cla()
-    plt.clf()
-    plt.close()
-    gc.collect()
+    fig.tight_layout()
+    savefig(fig, name, bbox_inches='tight')
+    figure_pool.collect()
+
+
+# Width of boxes in boxplots, as set by Matplotlib for boxes drawn one at a time.
+BOX_WIDTH = 0.15
+
 
+def _create_float_summary_boxplot(figsize, n_columns):
+    fig, axs = new_figure(figsize)
+    ax = axs[0, 0]
+    stats = {"med": 0., "q1": 0., "q3": 0., "whislo": 0., "whishi": 0., "fliers": []}
+    boxes = [ax.bxp([stats], positions=[0.25*i], widths=BOX_WIDTH, patch_artist=True, manage_ticks=False)
+             for i in range(n_columns)]
+    for box in boxes:
+        box['boxes'][0].set_facecolor("None")
+    ax.set_xlim([-0.15, 0.25*(n_columns-1)+0.15])
+    return {"fig": fig, "ax": ax, "boxes": boxes}
+
+
+def update_box(box, stats, position, color):
+    """Updates in place the artists of a box drawn by `Axes.bxp`, so that they display `stats` at `position`."""
+    box_left, box_right = position - BOX_WIDTH / 2, position + BOX_WIDTH / 2
+    cap_left, cap_right = position - BOX_WIDTH / 4, position + BOX_WIDTH / 4
+    box['boxes'][0].set_path(Path([[box_left, stats['q1']], [box_right, stats['q1']], [box_right, stats['q3']],
+                                   [box_left, stats['q3']], [box_left, stats['q1']]], closed=True))
+    box['medians'][0].set_data([box_left, box_right], [stats['med'], stats['med']])
+    box['whiskers'][0].set_data([position, position], [stats['q1'], stats['whislo']])
+    box['whiskers'][1].set_data([position, position], [stats['q3'], stats['whishi']])
+    box['caps'][0].set_data([cap_left, cap_right], [stats['whislo'], stats['whislo']])
+    box['caps'][1].set_data([cap_left, cap_right], [stats['whishi'], stats['whishi']])
+    box['fliers'][0].set_data(np.full(len(stats['fliers']), position), stats['fliers'])
+    box['boxes'][0].set_edgecolor(color)
+    for line in box['medians'] + box['whiskers'] + box['caps']:
+        line.set_color(color)
+    box['fliers'][0].set_markeredgecolor(color)
 
-def plot_float_summary_boxplot(df, val_range, key, path, figsize, colors, extension=".pdf", title=True):
-    """Boxplots of the different histogram versions."""
-    fig, ax = plt.subplots(figsize=figsize)
+
+def plot_float_summary_boxplot(df, val_range, key, path, figsize, colors, extension=".pdf", title=True, summary=None):
+    """Boxplots of the different histogram versions. Boxplot statistics are taken from `summary`, if provided."""
+    if summary is None:
+        summary = FloatSummary(df, val_range)
+    layout = ("float_summary_boxplot", tuple(figsize), len(df.columns), title)
+    template = figure_pool.get(layout, _create_float_summary_boxplot, figsize, len(df.columns))
+    fig, ax = template["fig"], template["ax"]
     if title:
         ax.set_title(key)#, loc='center', wrap=True)
-    for i, c in enumerate(df.columns):
-        data = df[c]
-        box = plt.boxplot([data[~np.isnan(data)]], positions=[0.25*i], patch_artist=True, labels=[c])
-        box['boxes'][0].set_facecolor("None")
-        box['boxes'][0].set_edgecolor(colors[i])
-        box['medians'][0].set_color(colors[i])
-        box['whiskers'][0].set_color(colors[i])
-        box['whiskers'][1].set_color(colors[i])
-        box['caps'][0].set_color(colors[i])
-        box['caps'][1].set_color(colors[i])
-        for flier in box['fliers']:
-            flier.set_markeredgecolor(colors[i])
-
-    plt.xlim([-0.15, 0.25*(len(df.columns)-1)+0.15])
-    plt.ylim(val_range)
-
-    # box = plt.boxplot([df[c] for c in df.columns], patch_artist=True, labels=df.columns)
-    # #for i, patch in enumerate(box['boxes']):
-    # for i in range(len(df.columns)):
-    #     #patch.set_facecolor("None")
-    #     #patch.set_edgecolor(colors(i))
-    #     box['boxes'][i].set_facecolor("None")
-    #     box['boxes'][i].set_edgecolor(colors(i))
-    #     box['medians'][i].set_color(colors(i))
-    #     box['whiskers'][2*i].set_color(colors(i))
-    #     box['whiskers'][2*i+1].set_color(colors(i))
-    #     box['caps'][2*i].set_color(colors(i))
-    #     box['caps'][2*i+1].set_color(colors(i))
-    #     box['fliers'][i].set_color(colors(i))
-    plt.tight_layout()
-    plt.savefig(os.path.join(path, slugify(key) + '_boxplot' + extension), bbox_inches='tight')
-    plt.cla()
-    plt.clf()
-    plt.close()
-    gc.collect()
-
-
-def plot_float_correlation(df, key, path, figsize, colors, night_mode, extension=".pdf", title=True):
-    """Correlation scatter plot for float metrics."""
-    _min, _max = df.min().min(), df.max().max()
-    _range = [_min - 0.1*(_max - _min), _max + 0.1*(_max - _min)]
-
-    color = 'firebrick' if night_mode else 'royalblue'
-    axs = pd.plotting.scatter_matrix(df, alpha=1., s=1., figsize=figsize,
-                                     hist_kwds={'bins': 100, 'color': colors[0], 'range':_range},
-                                     color=color)
-    for i, subaxis in enumerate(axs):
-        for j, ax in enumerate(subaxis):
-            ax.set_xlim(_range)
+    for i, (c, box) in enumerate(zip(df.columns, template["boxes"])):
+        update_box(box, summary.boxplot_stats[c], 0.25*i, colors[i])
+    ax.set_xticks([0.25*i for i in range(len(df.columns))], list(df.columns))
+    ax.set_ylim(val_range)
+    fig.tight_layout()
+    savefig(fig, os.path.join(path, slugify(key) + '_boxplot' + extension), bbox_inches='tight')
+    figure_pool.collect()
+
+
+CORRELATION_MODES = ["scatter", "density"]
+
+# Number of bins of histograms in correlation plots, along each axis.
+CORRELATION_BINS = 100
+
+
+def reservoir_sample(values, max_rows, seed=0):
+    """Returns at most `max_rows` rows of `values`, drawn uniformly without replacement and kept in their order.
+
+    Each row is given a random key, and rows with the `max_rows` smallest keys are kept (bottom-k reservoir sampling).
+    The seed is fixed, so that plots do not change from one run to another.
+    """
+    if (max_rows is None) or (len(values) <= max_rows):
+        return values
+    keys = np.random.default_rng(seed).random(len(values))
+    return values[np.sort(np.argpartition(keys, max_rows)[:max_rows])]
+
+
+def _create_float_correlation(figsize, n_columns, mode, title):
+    fig, axs = new_figure(figsize, n_columns, n_columns)
+    fig.subplots_adjust(wspace=0, hspace=0)
+    artists = {}
+    for i in range(n_columns):
+        for j in range(n_columns):
+            ax = axs[i, j]
+            if i == j:
+                artists[i, j] = new_histogram(ax, linewidth=1.)
+            else:
+                if mode == "scatter":
+                    artists[i, j] = ax.scatter([], [], marker='.', s=1., alpha=1., edgecolors='none')
+                else:
+                    artists[i, j] = ax.imshow(np.zeros((CORRELATION_BINS, CORRELATION_BINS)), origin='lower',
+                                              aspect='auto', interpolation='nearest', norm='log', rasterized=True)
+                artists[i, j, "line"] = ax.axline((0, 0), slope=1., linewidth=1., alpha=0.5)
+            if j != 0:
+                ax.yaxis.set_visible(False)
+            if i != n_columns - 1:
+                ax.xaxis.set_visible(False)
             ax.yaxis.set_ticks([])
+            ax.tick_params(axis='x', labelsize=8, labelrotation=0)
+    suptitle = fig.suptitle('') if title else None
+    return {"fig": fig, "axs": axs, "artists": artists, "suptitle": suptitle}
+
+
+class CorrelationSummary:
+    """Data of the correlation plot of a float aggregate: the range of values, and histograms of each column.
+
+    Values are binned over `CORRELATION_BINS` bins of the range (see `CorrelationHistograms`). In `scatter` mode, at
+    most `max_points` rows (all if None) are drawn by reservoir sampling. In `density` mode, 2D histograms of each pair
+    of columns are computed.
+    """
+
+    def __init__(self, df, mode="scatter", max_points=None):
+        if mode not in CORRELATION_MODES:
+            raise ValueError("Correlation mode {} is not valid.".format(mode))
+        _min, _max = df.min().min(), df.max().max()
+        self.columns = list(df.columns)
+        self.range = [_min - 0.1*(_max - _min), _max + 0.1*(_max - _min)]
+        values = df.to_numpy(dtype=float)
+        self.histograms = CorrelationHistograms(len(self.columns), self.range, CORRELATION_BINS,
+                                                pairs=(mode == "density"))
+        self.histograms.update(values)
+        self.sample = reservoir_sample(values, max_points) if mode == "scatter" else None
+
+    @classmethod
+    def from_accumulator(cls, accumulator):
+        """Builds the summary of an aggregate read by chunks, from its `AggregateAccumulator` (after both passes)."""
+        summary = cls.__new__(cls)
+        summary.columns = list(accumulator.columns)
+        summary.range = accumulator.correlation_range
+        summary.histograms = accumulator.correlation_histograms
+        summary.sample = None if accumulator.sample is None else accumulator.sample.sample()
+        return summary
+
+
+def plot_float_correlation(df, key, path, figsize, colors, night_mode, extension=".pdf", title=True, mode="scatter",
+                           max_points=None, summary=None):
+    """Correlation plot for float metrics, with histograms on the diagonal.
+
+    In `scatter` mode, off-diagonal panels are scatter plots of at most `max_points` snapshots (all if None), drawn by
+    reservoir sampling. In `density` mode, they are rasterized 2D histograms (with a log color scale) of all
+    snapshots, so that render time and file size do not depend on the number of snapshots.
+    Histograms and sampled snapshots are taken from `summary` (a CorrelationSummary), if provided.
+    """
+    if mode not in CORRELATION_MODES:
+        raise ValueError("Correlation mode {} is not valid.".format(mode))
+    if summary is None:
+        summary = CorrelationSummary(df, mode, max_points)
+    _range, histograms = summary.range, summary.histograms
+    edges = histograms.edges
+
+    n = len(df.columns)
+    layout = ("float_correlation", tuple(figsize), n, title, mode)
+    template = figure_pool.get(layout, _create_float_correlation, figsize, n, mode, title)
+    fig, axs, artists = template["fig"], template["axs"], template["artists"]
+    if mode == "scatter":
+        sample = summary.sample
+        sample_mask = ~np.isnan(sample)
+
+    for i, a in enumerate(df.columns):
+        for j, b in enumerate(df.columns):
+            ax = axs[i, j]
             if i == j:
-                # Change color of diagonal elements
-                [bar.set_color(colors[i]) for bar in ax.patches]
+                artists[i, j].set_data(histograms.counts[i], edges)
+                artists[i, j].set_color(colors[i])
+                autoscale_histograms(ax, [artists[i, j]])
             else:
+                if mode == "scatter":
+                    common = sample_mask[:, i] & sample_mask[:, j]
+                    artists[i, j].set_offsets(np.column_stack([sample[common, j], sample[common, i]]))
+                    artists[i, j].set_facecolor('firebrick' if night_mode else 'royalblue')
+                else:
+                    counts = histograms.pair(i, j)
+                    # Empty bins are left transparent.
+                    artists[i, j].set_data(np.ma.masked_equal(counts, 0))
+                    artists[i, j].set_extent([edges[0], edges[-1], edges[0], edges[-1]])
+                    artists[i, j].set_clim(1, max(counts.max(), 1))
                 # Plot x=y for non-diagonal elements
-                color = 'white' if night_mode else 'black'
-                ax.axline((0, 0), slope=1., color=color, linewidth=1., alpha=0.5)
+                artists[i, j, "line"].set_color('white' if night_mode else 'black')
                 ax.set_ylim(_range)
-            ax.tick_params(axis='x', labelrotation=0)
-    if title:
-        plt.suptitle(key)#, loc='center', wrap=True)
-    plt.tight_layout()
-    plt.savefig(os.path.join(path, slugify(key) + extension), bbox_inches='tight')
-    plt.cla()
-    plt.clf()
-    plt.close()
-    gc.collect()
-
-
-def plot_bool_summary(df, key, path, figsize, colors, extension=".pdf", title=True):
-    """Bar plot for bool metrics."""
-    fig, ax = plt.subplots(figsize=figsize)
+            ax.set_xlim(_range)
+            ax.set_xlabel(b)
+            ax.set_ylabel(a)
     if title:
-        ax.set_title(key)#, loc='center', wrap=True)
-    percentage = pd.DataFrame((df.sum() / df.count()), columns=['Percentage'])
+        template["suptitle"].set_text(key)#, loc='center', wrap=True)
+    fig.tight_layout()
+    savefig(fig, os.path.join(path, slugify(key) + extension), bbox_inches='tight')
+    figure_pool.collect()
 
 
-    div = 10000 - df.count()
-    percentage = pd.DataFrame(((df.sum() + div) / 10000), columns=['Percentage'])
-    # # TODO : il faut trouver un moyen de capturer les divergences plutôt que juste les exclure.
-    percentage.plot(kind='bar', legend=False, stacked=True, ax=ax, ylim=[0, 1.1])
-    for i, bar in enumerate(ax.patches):
+def _create_bool_summary(figsize, n_columns):
+    fig, axs = new_figure(figsize)
+    ax = axs[0, 0]
+    bars = ax.bar(range(n_columns), np.zeros(n_columns), width=0.5)
+    texts = [ax.text(i, 0., '', horizontalalignment='center', verticalalignment='bottom') for i in range(n_columns)]
+    ax.set_xlim([-0.5, n_columns - 0.5])
+    ax.set_ylim([0, 1.1])
+    ax.tick_params(axis='x', labelrotation=0)
+    ax.set_yticks([0., 0.5, 1.], [f'{x:.0%}' for x in [0., 0.5, 1.]])
+    return {"fig": fig, "ax": ax, "bars": bars, "texts": texts}
+
+
+def plot_bool_summary(df, key, path, figsize, colors, extension=".pdf", title=True, n_rows=None):
+    """Bar plot for bool metrics.
+
+    If `n_rows` (number of rows of each version if all samples had been processed) is provided, missing rows (e.g.
+    diverged samples) are counted as True.
+    """
+    layout = ("bool_summary", tuple(figsize), len(df.columns), title)
+    template = figure_pool.get(layout, _create_bool_summary, figsize, len(df.columns))
+    fig, ax = template["fig"], template["ax"]
+    if title:
+        ax.set_title(key)#, loc='center', wrap=True)
+    if n_rows is None:
+        percentage = df.sum() / df.count()
+    else:
+        n_rows = np.maximum(n_rows, df.count())
+        div = n_rows - df.count()
+        percentage = (df.sum() + div) / n_rows
+    for i, (bar, text, p) in enumerate(zip(template["bars"], template["texts"], percentage.values)):
+        bar.set_height(p)
         bar.set_color(colors[i])
-        p = percentage.iloc[i].values[0]
-        ax.text(i, p+0.03, '{:.2%}'.format(p), horizontalalignment='center', verticalalignment='bottom')
-    #ax.set_ylim([0, 1.1])
+        text.set_y(p+0.03)
+        text.set_text('{:.2%}'.format(p))
+    ax.set_xticks(range(len(df.columns)), list(df.columns))
+    fig.tight_layout()
+    savefig(fig, os.path.join(path, slugify(key) + extension), bbox_inches='tight')
+    figure_pool.collect()
 
-    ax.tick_params(axis='x', labelrotation=0)
-    ax.set_yticks([0., 0.5, 1.])  # Useless, but avoids a UserWarning.
-    ax.set_yticklabels([f'{x:.0%}' for x in ax.get_yticks().tolist()])
-    plt.tight_layout()
-    plt.savefig(os.path.join(path, slugify(key) + extension), bbox_inches='tight')
-    plt.cla()
-    plt.clf()
-    plt.close()
-    gc.collect()
+
+def _create_bool_correlation(figsize, n_columns):
+    fig, axs = new_figure(figsize)
+    ax = axs[0, 0]
+    im = ax.matshow(np.zeros((n_columns, n_columns)), vmin=-1, vmax=1)
+    fig.colorbar(im)
+    return {"fig": fig, "ax": ax, "im": im}
 
 
 def plot_bool_correlation(df, key, path, figsize, colors, extension=".pdf", title=True):
     """Correlation matrix for boolean metrics."""
-    fig, ax = plt.subplots(figsize=figsize)
+    layout = ("bool_correlation", tuple(figsize), len(df.columns), title)
+    template = figure_pool.get(layout, _create_bool_correlation, figsize, len(df.columns))
+    fig, ax = template["fig"], template["ax"]
     if title:
         ax.set_title(key)#, loc='center', wrap=True)
-    im = ax.matshow(df.corr(), vmin=-1, vmax=1)
+    template["im"].set_data(df.corr())
     ax.set_xticks(range(len(df.columns)), df.columns)
     ax.set_yticks(range(len(df.columns)), df.columns)
-    fig.colorbar(im)
-    plt.tight_layout()
-    plt.savefig(os.path.join(path, slugify(key) + extension), bbox_inches='tight')
-    plt.cla()
-    plt.clf()
-    plt.close()
-    gc.collect()
+    fig.tight_layout()
+    savefig(fig, os.path.join(path, slugify(key) + extension), bbox_inches='tight')
+    figure_pool.collect()
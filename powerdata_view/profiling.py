@@ -0,0 +1,137 @@
+import contextlib
+import cProfile
+import pstats
+import json
+import time
+import os
+from tabulate import tabulate
+
+
+SAMPLE_PROFILERS = [None, "cProfile", "pyinstrument"]
+
+
+class StageProfiler:
+    """Records the wall time and number of calls of each stage of a run (loading, power flow, metrics, rendering...).
+
+    Stages may be nested (e.g. `savefig` is part of `display/plot/summary`), so that their times do not add up.
+    Records made in worker processes are drained after each job, and merged into the profiler of the main process.
+    Optionally, each sample processed in the main process can be profiled with cProfile or pyinstrument.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.start_time = time.perf_counter()
+        self.sample_profiler_name = None
+        self.sample_profiler = None
+
+    def record(self, stage, elapsed, count=1):
+        """Adds `elapsed` seconds and `count` calls to a stage."""
+        total, n = self.records.get(stage, (0., 0))
+        self.records[stage] = (total + elapsed, n + count)
+
+    @contextlib.contextmanager
+    def timed(self, stage):
+        """Context manager that records the time spent inside it as one call of `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def timed_iter(self, stage, iterable):
+        """Iterates over `iterable`, recording the time spent producing each item as one call of `stage`."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.record(stage, time.perf_counter() - start, count=0)
+                return
+            self.record(stage, time.perf_counter() - start)
+            yield item
+
+    def drain(self):
+        """Returns the records made so far, and clears them."""
+        records, self.records = self.records, {}
+        return records
+
+    def merge(self, records):
+        """Merges records drained from another profiler (e.g. in a worker process)."""
+        for stage, (elapsed, count) in records.items():
+            self.record(stage, elapsed, count)
+
+    def reset(self):
+        """Clears records, and restarts the wall clock of the run."""
+        self.records = {}
+        self.start_time = time.perf_counter()
+        self.set_sample_profiler(self.sample_profiler_name)
+
+    def set_sample_profiler(self, name=None):
+        """Sets the profiler applied to each sample (None, "cProfile" or "pyinstrument")."""
+        if name not in SAMPLE_PROFILERS:
+            raise ValueError("Sample profiler {} is not valid.".format(name))
+        self.sample_profiler_name = name
+        if name == "cProfile":
+            self.sample_profiler = cProfile.Profile()
+        elif name == "pyinstrument":
+            import pyinstrument
+            self.sample_profiler = pyinstrument.Profiler()
+        else:
+            self.sample_profiler = None
+
+    @contextlib.contextmanager
+    def profile_sample(self):
+        """Context manager that profiles the processing of a sample, if a sample profiler is set.
+
+        Profiles of all samples are accumulated, and saved along with the report.
+        """
+        if self.sample_profiler is None:
+            yield
+        elif self.sample_profiler_name == "cProfile":
+            self.sample_profiler.enable()
+            try:
+                yield
+            finally:
+                self.sample_profiler.disable()
+        else:
+            self.sample_profiler.start()
+            try:
+                yield
+            finally:
+                self.sample_profiler.stop()
+
+    def report(self):
+        """Returns the list of stages, sorted by decreasing total time, along with the wall time of the run."""
+        wall_time = time.perf_counter() - self.start_time
+        stages = [{"stage": stage, "total_time": total, "calls": count, "mean_time": total / count if count else None,
+                   "share": total / wall_time if wall_time else None}
+                  for stage, (total, count) in self.records.items()]
+        return {"wall_time": wall_time, "stages": sorted(stages, key=lambda s: s["total_time"], reverse=True)}
+
+    def save_report(self, path, name="profile"):
+        """Saves the report as JSON and as a text table in directory `path`, along with sample profiles if any."""
+        report = self.report()
+        with open(os.path.join(path, name + '.json'), 'w') as f:
+            json.dump(report, f, indent=1)
+        table = [[s["stage"], "{:.3f}".format(s["total_time"]), s["calls"],
+                  "" if s["mean_time"] is None else "{:.2e}".format(s["mean_time"]),
+                  "" if s["share"] is None else "{:.1%}".format(s["share"])] for s in report["stages"]]
+        with open(os.path.join(path, name + '.txt'), 'w') as f:
+            f.write("Wall time: {:.3f} s\n\n".format(report["wall_time"]))
+            f.write(tabulate(table, headers=["Stage", "Total (s)", "Calls", "Mean (s)", "Share"], tablefmt='plain',
+                             numalign="right", disable_numparse=True))
+            f.write('\n')
+        if (self.sample_profiler_name == "cProfile") and self.sample_profiler.getstats():
+            self.sample_profiler.dump_stats(os.path.join(path, name + '_samples.prof'))
+            with open(os.path.join(path, name + '_samples.txt'), 'w') as f:
+                pstats.Stats(self.sample_profiler, stream=f).sort_stats('cumulative').print_stats(50)
+        elif (self.sample_profiler_name == "pyinstrument") and (self.sample_profiler.last_session is not None):
+            with open(os.path.join(path, name + '_samples.html'), 'w') as f:
+                f.write(self.sample_profiler.output_html())
+            with open(os.path.join(path, name + '_samples.txt'), 'w') as f:
+                f.write(self.sample_profiler.output_text())
+
+
+# Profiler shared by the whole run. Worker processes have their own, whose records are sent back to the main process.
+stage_profiler = StageProfiler()
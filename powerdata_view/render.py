@@ -0,0 +1,86 @@
+import collections
+import multiprocessing
+import matplotlib
+import os
+
+from powerdata_view.plot import figure_pool
+from powerdata_view.profiling import stage_profiler
+
+
+class RenderScheduler:
+    """Runs rendering jobs (tables and figures), either serially or in a pool of worker processes.
+
+    Jobs are independent, and each of them writes its own files, so that outputs do not depend on the number of
+    workers. At most `max_pending` jobs are in flight at once, which bounds the amount of data waiting to be rendered.
+    Errors raised inside a worker are raised again in the main process, and stage records made inside a worker are
+    merged into the stage profiler of the main process.
+    """
+
+    def __init__(self, n_workers=1, max_pending=None):
+        if n_workers is None:
+            n_workers = os.cpu_count()
+        self.n_workers = n_workers
+        self.max_pending = max_pending or 2 * n_workers
+        self.pending = collections.deque()
+        self.pool = multiprocessing.Pool(n_workers, initializer=_init_worker) if n_workers > 1 else None
+
+    def submit(self, func, args=(), kwds=None, callback=None):
+        """Runs func(*args, **kwds), and then calls `callback` (if provided) in the main process."""
+        kwds = kwds or {}
+        if self.pool is None:
+            func(*args, **kwds)
+            if callback is not None:
+                callback()
+            return
+        self.pending.append((self.pool.apply_async(_run_job, (func, args, kwds)), callback))
+        while len(self.pending) > self.max_pending:
+            self._wait_oldest()
+
+    def join(self):
+        """Waits for all submitted jobs to be completed."""
+        while self.pending:
+            self._wait_oldest()
+
+    def close(self):
+        """Waits for all submitted jobs, and shuts worker processes down."""
+        self.join()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def terminate(self):
+        """Drops pending jobs, and stops worker processes immediately."""
+        self.pending.clear()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def _wait_oldest(self):
+        result, callback = self.pending.popleft()
+        stage_profiler.merge(result.get())
+        if callback is not None:
+            callback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+def _init_worker():
+    """Makes sure that worker processes render figures with the non-interactive Agg backend, in figures of their own."""
+    matplotlib.use("Agg")
+    figure_pool.clear()
+    stage_profiler.drain()
+
+
+def _run_job(func, args, kwds):
+    """Runs a job inside a worker process, and returns the stage records made meanwhile."""
+    func(*args, **kwds)
+    return stage_profiler.drain()
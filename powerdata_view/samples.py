@@ -0,0 +1,94 @@
+import pickle
+import tqdm
+import os
+
+from powerdata_view.metrics import hash_file, list_data_files
+
+
+SAMPLES_DIR = "samples"
+
+
+def get_sample_cache_dir(data_dir, cache_name):
+    """Directory of the binary caches of the samples of a dataset, stored next to its metrics."""
+    return os.path.join(data_dir, "powerdata_view", SAMPLES_DIR, cache_name)
+
+
+def get_sample_cache_path(filepath, cache_name):
+    """Path of the binary cache of a sample file."""
+    data_dir, file = os.path.split(filepath)
+    return os.path.join(get_sample_cache_dir(data_dir, cache_name), file + ".pkl")
+
+
+def load_cached_sample(filepath, loader, cache_name, version=None):
+    """Loads a sample from its binary cache, or using `loader` if the cache is missing or stale.
+
+    The cache records the size, modification time and content hash of the source file, along with the `version` of
+    the loader. It is rebuilt whenever the source content or the version changes, and is merely refreshed if only the
+    modification time of the source has changed.
+    """
+    cache_path = get_sample_cache_path(filepath, cache_name)
+    stat = os.stat(filepath)
+    entry = read_sample_entry(cache_path)
+    if (entry is not None) and (entry["version"] == version):
+        if (entry["size"] == stat.st_size) and (entry["mtime"] == stat.st_mtime_ns):
+            return read_sample(cache_path)
+        content_hash = hash_file(filepath)
+        if entry["hash"] == content_hash:
+            sample = read_sample(cache_path)
+            write_sample(cache_path, dict(entry, size=stat.st_size, mtime=stat.st_mtime_ns), sample)
+            return sample
+    else:
+        content_hash = hash_file(filepath)
+    sample = loader(filepath)
+    entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": content_hash, "version": version}
+    write_sample(cache_path, entry, sample)
+    return sample
+
+
+def read_sample_entry(cache_path):
+    """Reads the source entry of a cached sample, without reading the sample itself. Returns None if there is none."""
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def read_sample(cache_path):
+    """Reads a cached sample, stored right after its source entry."""
+    with open(cache_path, 'rb') as f:
+        pickle.load(f)
+        return pickle.load(f)
+
+
+def write_sample(cache_path, entry, sample):
+    """Writes a cached sample along with its source entry.
+
+    The file is written under a temporary name and then renamed, so that concurrent workers never read partial files.
+    """
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(sample, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+def ingest_samples(data_dir, loader, cache_name, version=None):
+    """Builds the binary cache of all samples of `data_dir`, so that later runs do not parse source files again.
+
+    Samples whose cache is up to date are left untouched, and caches of deleted samples are removed.
+    """
+    data_files = list_data_files(data_dir)
+    for file in tqdm.tqdm(data_files, desc='Ingesting samples of {}'.format(data_dir)):
+        filepath = os.path.join(data_dir, file)
+        entry = read_sample_entry(get_sample_cache_path(filepath, cache_name))
+        stat = os.stat(filepath)
+        if (entry is not None) and (entry["version"] == version) and (entry["size"] == stat.st_size) and \
+                (entry["mtime"] == stat.st_mtime_ns):
+            continue
+        load_cached_sample(filepath, loader, cache_name, version)
+    cache_dir = get_sample_cache_dir(data_dir, cache_name)
+    for cache_file in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+        if cache_file.endswith(".pkl") and (cache_file[:-len(".pkl")] not in data_files):
+            os.remove(os.path.join(cache_dir, cache_file))
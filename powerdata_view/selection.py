@@ -0,0 +1,36 @@
+import fnmatch
+
+
+# Groups of metrics, defined as case-insensitive glob patterns on metrics names, so that they apply to all processors.
+METRICS_GROUPS = {
+    "voltage": ["*voltage*"],
+    "current": ["*current*", "*loading percent*"],
+    "reactive": ["*reactive*"],
+    "joule": ["*joule*"],
+    "load": ["load *"],
+    "shunt": ["shunt *"],
+    "generation": ["generat*"],
+    "violations": ["*illicit*", "*violation*"],
+    "costs": ["*cost"],
+    "disconnections": ["*in service*", "*n-1", "*n-2"],
+}
+
+
+def match_any(name, patterns):
+    """Checks whether `name` matches any of the case-insensitive glob `patterns`."""
+    return any(fnmatch.fnmatch(name.lower(), pattern.lower()) for pattern in patterns)
+
+
+def select_metrics(names, groups=None, include=None, exclude=None):
+    """Selects metrics names that belong to one of `groups` or match one of the `include` patterns, and that do not
+    match any of the `exclude` patterns. All metrics are selected if neither `groups` nor `include` are provided.
+
+    Patterns are case-insensitive globs (e.g. `"*Voltage*"`), and groups are keys of METRICS_GROUPS.
+    """
+    patterns = list(include or [])
+    for group in groups or []:
+        if group not in METRICS_GROUPS:
+            raise ValueError("Metrics group {} is not valid.".format(group))
+        patterns += METRICS_GROUPS[group]
+    selected = [name for name in names if (not patterns) or match_any(name, patterns)]
+    return [name for name in selected if not match_any(name, exclude or [])]
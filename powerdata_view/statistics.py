@@ -0,0 +1,481 @@
+import numpy as np
+import pandas as pd
+import warnings
+
+
+# Number of rows of the chunks in which aggregates are read by `iter_chunks`.
+CHUNK_SIZE = 2 ** 20
+
+
+class QuantileSketch:
+    """Mergeable sketch of a distribution, from which quantiles are estimated (a merging t-digest).
+
+    Values are stored as is until there are more than `buffer_size` of them, so that quantiles of small columns are
+    exact. Beyond that, sorted values are merged into centroids (mean and weight), which never span more than one unit
+    of the arcsine scale function of the t-digest: between `compression` / 2 and `compression` centroids are kept,
+    which are smaller in the tails.
+    """
+
+    def __init__(self, compression=1000, buffer_size=10000):
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        """Adds an array of (non NaN) values."""
+        if len(values) == 0:
+            return
+        values = np.sort(np.asarray(values, dtype=float))
+        self.min, self.max = min(self.min, values[0]), max(self.max, values[-1])
+        if len(self.means) + len(values) <= self.buffer_size:
+            self.means = np.concatenate([self.means, values])
+            self.weights = np.concatenate([self.weights, np.ones(len(values))])
+            return
+        # Large chunks are compressed on their own first, which only requires sorting their values.
+        means, weights = self._compress(values, np.ones(len(values)))
+        self.means = np.concatenate([self.means, means])
+        self.weights = np.concatenate([self.weights, weights])
+        self.compress()
+
+    def merge(self, other):
+        """Adds all values of another sketch."""
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self.means = np.concatenate([self.means, other.means])
+        self.weights = np.concatenate([self.weights, other.weights])
+        if len(self.means) > self.buffer_size:
+            self.compress()
+
+    def compress(self):
+        """Merges sorted centroids whose cumulative weights fall into the same unit of the arcsine scale function."""
+        order = np.argsort(self.means, kind='stable')
+        self.means, self.weights = self._compress(self.means[order], self.weights[order])
+
+    def _compress(self, means, weights):
+        # Cumulative weights before and after each centroid, on the scale function (in units).
+        after = np.cumsum(weights)
+        k_before, k_after = self._scale(after - weights, after[-1]), self._scale(after, after[-1])
+        unit = np.floor(k_before)
+        # Centroids are merged with their neighbours of the same unit. Those that overlap the next unit are kept as is,
+        # so that merged centroids never span more than one unit, however many times they are compressed.
+        inside = k_after <= unit + 1 + 1e-9
+        key = np.where(inside, unit, -1)
+        starts = np.flatnonzero(np.concatenate([[True], (key[1:] != key[:-1]) | ~inside[1:] | ~inside[:-1]]))
+        weights_sum = np.add.reduceat(weights, starts)
+        return np.add.reduceat(means * weights, starts) / weights_sum, weights_sum
+
+    def _scale(self, cumulative_weight, total_weight):
+        """Arcsine scale function of the t-digest, which maps cumulative weights to [0, compression / 2]."""
+        ratio = np.clip(2 * cumulative_weight / total_weight - 1, -1, 1)
+        return self.compression / (2 * np.pi) * (np.arcsin(ratio) + np.pi / 2)
+
+    def quantile(self, q):
+        """Estimates quantiles `q` by linear interpolation between centroids, as `numpy.quantile` does between values.
+
+        Each centroid stands at the middle rank of the values it holds, and the min and max at the first and last ranks.
+        """
+        q = np.asarray(q, dtype=float)
+        if len(self.means) == 0:
+            return np.full(q.shape, np.nan)
+        order = np.argsort(self.means, kind='stable')
+        means, weights = self.means[order], self.weights[order]
+        ranks = np.cumsum(weights) - weights + (weights - 1) / 2
+        n = weights.sum()
+        return np.interp(q * (n - 1), np.concatenate([[0], ranks, [n - 1]]),
+                         np.concatenate([[self.min], means, [self.max]]))
+
+
+class StreamingStatistics:
+    """Statistics of the columns of a table, computed in a single pass over chunks of rows, and mergeable.
+
+    For each column, NaN values are left aside, and the count, mean, standard deviation, min, max and `quantiles` are
+    computed (see `summary`), quantiles being estimated with a `QuantileSketch`. Means and variances of chunks are
+    combined with the parallel algorithm of Chan et al. If `correlation` is True, sums of products over rows where both
+    columns are set are accumulated for each pair of columns (see `correlation`). Values are shifted by the first value
+    of each column beforehand, which avoids losing precision when summing squares.
+    """
+
+    def __init__(self, columns, quantiles=(0.25, 0.5, 0.75), correlation=True, compression=1000, buffer_size=10000):
+        n_columns = len(columns)
+        self.columns = list(columns)
+        self.quantiles = list(quantiles)
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+        self.sketches = [QuantileSketch(compression, buffer_size) for _ in self.columns] if self.quantiles else None
+        self.with_correlation = correlation
+        self.shift = None
+        self.pair_count = np.zeros((n_columns, n_columns))
+        self.pair_sum = np.zeros((n_columns, n_columns))
+        self.pair_sum_sq = np.zeros((n_columns, n_columns))
+        self.pair_prod = np.zeros((n_columns, n_columns))
+
+    def update(self, chunk):
+        """Adds a chunk of rows (a dataframe, or an array of shape (n_rows, n_columns)). Missing values are NaN."""
+        if isinstance(chunk, pd.DataFrame):
+            chunk = chunk.to_numpy(dtype=float, na_value=np.nan)
+        values = np.asarray(chunk, dtype=float)
+        n_rows, n_columns = values.shape
+        mask = ~np.isnan(values)
+        # Chunks without missing values (the most common case) are not masked, which saves copies.
+        complete = mask.all()
+        if complete:
+            count = np.full(n_columns, float(n_rows))
+            filled = values
+        else:
+            count = mask.sum(axis=0).astype(float)
+            filled = np.where(mask, values, 0.)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = filled.sum(axis=0) / count
+        deviations = values - mean
+        if not complete:
+            deviations[~mask] = 0.
+        self._combine_moments(count, mean, np.einsum('ij,ij->j', deviations, deviations))
+        self.min = np.fmin(self.min, np.fmin.reduce(values, axis=0, initial=np.inf))
+        self.max = np.fmax(self.max, np.fmax.reduce(values, axis=0, initial=-np.inf))
+        if self.sketches is not None:
+            for j, sketch in enumerate(self.sketches):
+                sketch.update(values[:, j] if complete else values[mask[:, j], j])
+
+        if self.with_correlation:
+            if self.shift is None:
+                first = mask.argmax(axis=0)
+                self.shift = np.where(mask.any(axis=0), values[first, np.arange(n_columns)], 0.)
+            centered = values - self.shift
+            if complete:
+                self.pair_count += n_rows
+                self.pair_sum += centered.sum(axis=0)[:, np.newaxis]
+                self.pair_sum_sq += np.einsum('ij,ij->j', centered, centered)[:, np.newaxis]
+            else:
+                centered[~mask] = 0.
+                present = mask.astype(float)
+                self.pair_count += present.T @ present
+                self.pair_sum += centered.T @ present
+                self.pair_sum_sq += (centered * centered).T @ present
+            self.pair_prod += centered.T @ centered
+
+    def merge(self, other):
+        """Adds the statistics of another instance, computed over other rows of the same columns."""
+        self._combine_moments(other.count, other.mean, other.m2)
+        self.min, self.max = np.fmin(self.min, other.min), np.fmax(self.max, other.max)
+        if self.sketches is not None:
+            for sketch, other_sketch in zip(self.sketches, other.sketches):
+                sketch.merge(other_sketch)
+
+        if self.with_correlation and (other.shift is not None):
+            if self.shift is None:
+                self.shift = other.shift.copy()
+            # Sums of the other instance are shifted by `delta` to match the shift of this one.
+            delta = (other.shift - self.shift)[:, np.newaxis]
+            count, other_sum = other.pair_count, other.pair_sum
+            self.pair_count += count
+            self.pair_sum += other_sum + count * delta
+            self.pair_sum_sq += other.pair_sum_sq + 2 * delta * other_sum + count * delta ** 2
+            self.pair_prod += other.pair_prod + delta * other_sum.T + delta.T * other_sum + count * delta * delta.T
+
+    def _combine_moments(self, count, mean, m2):
+        total = self.count + count
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            delta = mean - self.mean
+            new_mean = np.where(count == 0, self.mean, self.mean + delta * count / total)
+            new_m2 = np.where(count == 0, self.m2, self.m2 + m2 + delta ** 2 * self.count * count / total)
+        self.mean = np.where(self.count == 0, mean, new_mean)
+        self.m2 = np.where(self.count == 0, m2, new_m2)
+        self.count = total
+
+    def summary(self):
+        """Returns count, mean, std, min, quantiles and max of each column, laid out as `DataFrame.describe`."""
+        defined = self.count > 0
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            std = np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+        rows = {"count": self.count, "mean": np.where(defined, self.mean, np.nan), "std": std,
+                "min": np.where(defined, self.min, np.nan)}
+        for i, q in enumerate(self.quantiles):
+            rows["{:g}%".format(100 * q)] = np.array([sketch.quantile(q) for sketch in self.sketches])
+        rows["max"] = np.where(defined, self.max, np.nan)
+        return pd.DataFrame(rows, index=self.columns).T
+
+    def correlation(self):
+        """Returns the Pearson correlation of each pair of columns over rows where both are set, as `DataFrame.corr`.
+
+        Correlations are NaN if less than two rows are shared, or if one of the columns is constant over them.
+        """
+        if not self.with_correlation:
+            raise ValueError("Correlation was not computed.")
+        count, pair_sum = self.pair_count, self.pair_sum
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            covariance = self.pair_prod - pair_sum * pair_sum.T / count
+            variance = self.pair_sum_sq - pair_sum ** 2 / count
+            correlation = covariance / np.sqrt(variance * variance.T)
+        correlation = np.where((count > 1) & (variance > 0) & (variance.T > 0), np.clip(correlation, -1, 1), np.nan)
+        return pd.DataFrame(correlation, index=self.columns, columns=self.columns)
+
+
+class Histograms:
+    """Mergeable histograms of the columns of a table, over `bins` bins of `val_range`, accumulated over chunks of rows.
+
+    Each chunk is binned by `numpy.histogram`, so that counts are the same as if all rows had been binned at once.
+    """
+
+    def __init__(self, n_columns, val_range, bins=100):
+        self.val_range = val_range
+        self.bins = bins
+        self.edges = np.histogram_bin_edges(np.empty(0), bins=bins, range=val_range)
+        self.counts = np.zeros((n_columns, bins), dtype=np.int64)
+
+    def update(self, values):
+        """Adds an array of rows, of shape (n_rows, n_columns). NaN values are left aside."""
+        for j in range(self.counts.shape[0]):
+            data = values[:, j]
+            self.counts[j] += np.histogram(data[~np.isnan(data)], bins=self.bins, range=self.val_range)[0]
+
+    def merge(self, other):
+        """Adds the counts of another instance, over the same bins."""
+        self.counts += other.counts
+
+
+class CorrelationHistograms:
+    """Mergeable histograms of correlation plots, accumulated over chunks of rows.
+
+    Values are binned over `bins` bins of `val_range` (see `bin_indices`). The histogram of each column is accumulated,
+    along with the 2D histogram of each pair of columns (over rows where both are set) if `pairs` is True. Only pairs
+    (i, j) with i < j are stored, the others being their transposes.
+    """
+
+    def __init__(self, n_columns, val_range, bins=100, pairs=False):
+        self.bins = bins
+        self.edges = np.histogram_bin_edges(np.empty(0), bins=bins, range=val_range)
+        self.counts = np.zeros((n_columns, bins), dtype=np.int64)
+        self.pair_counts = {(i, j): np.zeros((bins, bins), dtype=np.int64)
+                            for i in range(n_columns) for j in range(i + 1, n_columns)} if pairs else None
+
+    def update(self, values):
+        """Adds an array of rows, of shape (n_rows, n_columns). Missing values are NaN."""
+        mask = ~np.isnan(values)
+        bins = bin_indices(values, mask, self.edges)
+        for i in range(self.counts.shape[0]):
+            self.counts[i] += np.bincount(bins[mask[:, i], i], minlength=self.bins)
+        for (i, j), counts in (self.pair_counts or {}).items():
+            common = mask[:, i] & mask[:, j]
+            counts += np.bincount(bins[common, i] * self.bins + bins[common, j],
+                                  minlength=self.bins ** 2).reshape(self.bins, self.bins)
+
+    def merge(self, other):
+        """Adds the counts of another instance, over the same bins."""
+        self.counts += other.counts
+        for pair, counts in (self.pair_counts or {}).items():
+            counts += other.pair_counts[pair]
+
+    def pair(self, i, j):
+        """2D histogram of columns i (rows) and j (columns)."""
+        return self.pair_counts[i, j] if i < j else self.pair_counts[j, i].T
+
+
+class ReservoirSample:
+    """Mergeable uniform sample of at most `max_rows` rows, drawn from chunks of rows (bottom-k reservoir sampling).
+
+    Each row is given a random key, and rows with the `max_rows` smallest keys are kept, in their order (all rows if
+    `max_rows` is None). Keys are drawn in the order rows are added, so that sampling rows by chunks or all at once
+    (see `plot.reservoir_sample`) keeps the same rows for the same seed.
+    """
+
+    def __init__(self, max_rows, seed=0):
+        self.max_rows = max_rows
+        self.rng = np.random.default_rng(seed)
+        self.n_rows = 0
+        self.keys = np.empty(0)
+        self.positions = np.empty(0, dtype=np.int64)
+        self.rows = None
+
+    def update(self, values):
+        """Adds an array of rows (or of values)."""
+        keys = self.rng.random(len(values)) if self.max_rows is not None else np.zeros(len(values))
+        self._add(keys, np.arange(self.n_rows, self.n_rows + len(values)), values)
+        self.n_rows += len(values)
+
+    def merge(self, other):
+        """Adds the sample of another instance, whose rows come after those of this one."""
+        if other.rows is not None:
+            self._add(other.keys, other.positions + self.n_rows, other.rows)
+        self.n_rows += other.n_rows
+
+    def _add(self, keys, positions, values):
+        if (self.max_rows is not None) and (len(keys) > self.max_rows):
+            selected = np.argpartition(keys, self.max_rows)[:self.max_rows]
+            keys, positions, values = keys[selected], positions[selected], values[selected]
+        if self.rows is not None:
+            keys = np.concatenate([self.keys, keys])
+            positions = np.concatenate([self.positions, positions])
+            values = np.concatenate([self.rows, values])
+        if (self.max_rows is not None) and (len(keys) > self.max_rows):
+            selected = np.argpartition(keys, self.max_rows)[:self.max_rows]
+            keys, positions, values = keys[selected], positions[selected], values[selected]
+        self.keys, self.positions, self.rows = keys, positions, values
+
+    def sample(self):
+        """Returns the sampled rows, in the order they were added."""
+        order = np.argsort(self.positions)
+        return self.rows[order]
+
+
+class AggregateAccumulator:
+    """Accumulators of an aggregate (one column per version) whose rows are read by chunks, from which its tables and
+    plots are rendered without holding the aggregate in memory.
+
+    Rows are added in two passes (see `update`). The first pass computes statistics (see `StreamingStatistics`), the
+    number of True values of each column, and a sample of at most `sample_size` rows unless it is 0 (see
+    `ReservoirSample`). The second pass, which needs ranges known after the first one (see `start_second_pass`),
+    computes histograms of each column over `val_range` along with boxplot whiskers and fliers if `histograms` is True
+    (at most `max_fliers` fliers are sampled per column), and histograms of correlation plots over the range of the
+    aggregate if `correlation_histograms` is True (with 2D histograms if `pairs` is True).
+    Like dataframes, it has `columns`, and `count` and `sum` methods, so that it can be plotted as one.
+    """
+
+    def __init__(self, columns, is_bool=False, quantiles=(0.25, 0.5, 0.75), correlation=False, histograms=False,
+                 correlation_histograms=False, pairs=False, sample_size=0, bins=100, max_fliers=10000,
+                 buffer_size=10000):
+        self.columns = pd.Index(columns)
+        self.is_bool = is_bool
+        self.statistics = StreamingStatistics(columns, quantiles=quantiles, correlation=correlation,
+                                              buffer_size=buffer_size)
+        self.sums = np.zeros(len(columns))
+        self.sample = None if sample_size == 0 else ReservoirSample(sample_size)
+        self.with_histograms = histograms
+        self.with_correlation_histograms = correlation_histograms
+        self.pairs = pairs
+        self.bins = bins
+        self.max_fliers = max_fliers
+        self.second_pass = False
+        self.histograms = None
+        self.correlation_histograms = None
+        self.correlation_range = None
+
+    @property
+    def needs_second_pass(self):
+        return self.with_histograms or self.with_correlation_histograms
+
+    def update(self, values):
+        """Adds an array of rows, of shape (n_rows, n_columns), to the current pass. Missing values are NaN."""
+        if not self.second_pass:
+            self.statistics.update(values)
+            self.sums += np.nansum(values, axis=0)
+            if self.sample is not None:
+                self.sample.update(values)
+            return
+        if self.histograms is not None:
+            self.histograms.update(values)
+            for j in range(len(self.columns)):
+                data = values[:, j]
+                data = data[~np.isnan(data)]
+                low, high = data >= self.fences[j, 0], data <= self.fences[j, 1]
+                # Whiskers are the lowest value above the low fence, and the highest value below the high one.
+                self.whiskers[j, 0] = np.fmin.reduce(data[low], initial=self.whiskers[j, 0])
+                self.whiskers[j, 1] = np.fmax.reduce(data[high], initial=self.whiskers[j, 1])
+                self.fliers[j].update(data[~(low & high)])
+        if self.correlation_histograms is not None:
+            self.correlation_histograms.update(values)
+
+    def start_second_pass(self, val_range):
+        """Ends the first pass. Histograms of the second one are computed over `val_range` (as in summary plots)."""
+        self.second_pass = True
+        if self.with_histograms:
+            self.histograms = Histograms(len(self.columns), val_range, self.bins)
+            # Values beyond 1.5 interquartile range from the quartiles are fliers, as in `cbook.boxplot_stats`.
+            q1, q3 = [np.array([sketch.quantile(q) for sketch in self.statistics.sketches]) for q in [0.25, 0.75]]
+            self.fences = np.column_stack([q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)])
+            self.whiskers = np.column_stack([np.full(len(self.columns), np.inf), np.full(len(self.columns), -np.inf)])
+            self.fliers = [ReservoirSample(self.max_fliers, seed=j) for j in range(len(self.columns))]
+        if self.with_correlation_histograms:
+            _min, _max = np.min(self.statistics.min), np.max(self.statistics.max)
+            self.correlation_range = [_min - 0.1 * (_max - _min), _max + 0.1 * (_max - _min)]
+            self.correlation_histograms = CorrelationHistograms(len(self.columns), self.correlation_range,
+                                                                pairs=self.pairs)
+
+    def merge(self, other):
+        """Adds the accumulators of another instance, built over other rows in the same pass.
+
+        In the second pass, both instances should have been started from the same first pass (e.g. from copies of
+        merged instances), so that they share ranges and boxplot fences.
+        """
+        self.statistics.merge(other.statistics)
+        self.sums += other.sums
+        if self.sample is not None:
+            self.sample.merge(other.sample)
+        if self.histograms is not None:
+            self.histograms.merge(other.histograms)
+            self.whiskers = np.column_stack([np.fmin(self.whiskers[:, 0], other.whiskers[:, 0]),
+                                             np.fmax(self.whiskers[:, 1], other.whiskers[:, 1])])
+            for fliers, other_fliers in zip(self.fliers, other.fliers):
+                fliers.merge(other_fliers)
+        if self.correlation_histograms is not None:
+            self.correlation_histograms.merge(other.correlation_histograms)
+
+    def count(self):
+        """Number of non missing values of each column."""
+        return pd.Series(self.statistics.count, index=self.columns)
+
+    def sum(self):
+        """Sum of each column (the number of True values of boolean aggregates)."""
+        return pd.Series(self.sums, index=self.columns)
+
+    def boxplot_stats(self):
+        """Boxplot statistics of each column, laid out as `cbook.boxplot_stats`. Quartiles are estimated by sketches."""
+        summary = self.statistics.summary()
+        out = {}
+        for j, name in enumerate(self.columns):
+            count, mean, q1, med, q3 = summary[name][["count", "mean", "25%", "50%", "75%"]]
+            if count == 0:
+                out[name] = dict(label=name, fliers=np.array([]), mean=np.nan, med=np.nan, q1=np.nan, q3=np.nan,
+                                 iqr=np.nan, cilo=np.nan, cihi=np.nan, whislo=np.nan, whishi=np.nan)
+                continue
+            iqr = q3 - q1
+            whislo = self.whiskers[j, 0] if self.whiskers[j, 0] <= q1 else q1
+            whishi = self.whiskers[j, 1] if self.whiskers[j, 1] >= q3 else q3
+            fliers = self.fliers[j].sample() if self.fliers[j].rows is not None else np.empty(0)
+            out[name] = dict(label=name, mean=mean, iqr=iqr, cilo=med - 1.57 * iqr / np.sqrt(count),
+                             cihi=med + 1.57 * iqr / np.sqrt(count), whishi=whishi, whislo=whislo,
+                             fliers=np.concatenate([fliers[fliers < whislo], fliers[fliers > whishi]]),
+                             q1=q1, med=med, q3=q3)
+        return out
+
+
+def iter_chunks(df, chunk_size=CHUNK_SIZE):
+    """Iterates over chunks of `chunk_size` rows of a dataframe."""
+    for start in range(0, len(df.index), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def bin_indices(values, mask, edges):
+    """Bin of each value among equal bins of `edges`, values beyond edges falling into the first or last bin.
+
+    Values where `mask` is False (e.g. NaN values) are set to the first bin.
+    """
+    n_bins = len(edges) - 1
+    bins = (np.where(mask, values, edges[0]) - edges[0]) * (n_bins / (edges[-1] - edges[0]))
+    return np.clip(bins.astype(np.intp), 0, n_bins - 1)
+
+
+def compute_statistics(chunks, columns, **kwargs):
+    """Computes the statistics of `columns` (see `StreamingStatistics`) in a single pass over chunks of rows."""
+    statistics = StreamingStatistics(columns, **kwargs)
+    for chunk in chunks:
+        statistics.update(chunk)
+    return statistics
+
+
+def format_values(values, fmt):
+    """Formats all values at once with a printf-style format (e.g. "%.2e"). Labels of dataframes and series are kept."""
+    strings = np.char.mod(fmt, np.asarray(values, dtype=float))
+    if isinstance(values, pd.DataFrame):
+        return pd.DataFrame(strings, index=values.index, columns=values.columns)
+    elif isinstance(values, pd.Series):
+        return pd.Series(strings, index=values.index, name=values.name)
+    return strings
@@ -0,0 +1,274 @@
+from abc import ABC, abstractmethod
+import pyarrow.parquet as pq
+import pyarrow as pa
+import pandas as pd
+import numpy as np
+import json
+import uuid
+import os
+
+
+class MetricsStorage(ABC):
+    """Abstract Base Class for a metrics storage backend.
+
+    It saves and loads metrics dataframes (one row per snapshot, one column per object), one file per metrics.
+    """
+
+    extension = None
+
+    def list_metrics(self, path):
+        """Lists the names of metrics stored in directory `path`."""
+        return sorted(os.path.splitext(filename)[0] for filename in os.listdir(path)
+                      if filename.endswith(self.extension))
+
+    def get_path(self, path, name):
+        """Path of the file in which metrics `name` is stored."""
+        return os.path.join(path, name + self.extension)
+
+    @abstractmethod
+    def save(self, df, path, name):
+        """Saves metrics dataframe `df` as `name` in directory `path`. Should be overridden."""
+        pass
+
+    @abstractmethod
+    def load(self, path, name, columns=None):
+        """Loads metrics `name` from directory `path`, only reading `columns` if provided. Should be overridden."""
+        pass
+
+    def remove(self, path, name):
+        """Removes metrics `name` from directory `path`."""
+        os.remove(self.get_path(path, name))
+
+    def iter_chunks(self, path, name, chunk_size):
+        """Iterates over chunks of about `chunk_size` snapshots of metrics `name`, as dataframes.
+
+        By default, the whole file is loaded first. Backends that can read part of a file override it, so that metrics
+        larger than memory can be read.
+        """
+        df = self.load(path, name)
+        for start in range(0, len(df.index), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+
+class CSVStorage(MetricsStorage):
+    """Stores metrics as CSV files. Simple and human-readable, but slow and heavy for large datasets."""
+
+    extension = '.csv'
+
+    def save(self, df, path, name):
+        df.to_csv(self.get_path(path, name))
+
+    def load(self, path, name, columns=None):
+        usecols = None
+        if columns is not None:
+            columns = set(columns)
+            usecols = lambda c: (c in columns) or c.startswith('Unnamed: 0')
+        return restore_bool_dtype(pd.read_csv(self.get_path(path, name), index_col=0, usecols=usecols))
+
+    def iter_chunks(self, path, name, chunk_size):
+        with pd.read_csv(self.get_path(path, name), index_col=0, chunksize=chunk_size) as reader:
+            for chunk in reader:
+                yield restore_bool_dtype(chunk)
+
+
+class ParquetStorage(MetricsStorage):
+    """Stores metrics as Parquet files, using `pyarrow`. Columnar and compressed, keeps dtypes.
+
+    Files are written in row groups of `row_group_size` snapshots, which are the smallest parts that can be read
+    (see `iter_chunks`).
+    """
+
+    extension = '.parquet'
+    row_group_size = 2 ** 16
+
+    def save(self, df, path, name):
+        restore_bool_dtype(df).to_parquet(self.get_path(path, name), row_group_size=self.row_group_size)
+
+    def load(self, path, name, columns=None):
+        return pd.read_parquet(self.get_path(path, name), columns=None if columns is None else list(columns))
+
+    def iter_chunks(self, path, name, chunk_size):
+        # Row groups are read one at a time (`iter_batches` keeps buffers of the whole file until it is done).
+        parquet_file = pq.ParquetFile(self.get_path(path, name))
+        row_groups = (parquet_file.read_row_group(i) for i in range(parquet_file.num_row_groups))
+        for table in slice_tables(row_groups, chunk_size):
+            yield table.to_pandas()
+
+
+class FeatherStorage(MetricsStorage):
+    """Stores metrics as Feather (Arrow IPC) files, using `pyarrow`. Very fast to read and write, keeps dtypes."""
+
+    extension = '.feather'
+    index_column = '__sample__'
+
+    def save(self, df, path, name):
+        restore_bool_dtype(df).reset_index(names=self.index_column).to_feather(self.get_path(path, name))
+
+    def load(self, path, name, columns=None):
+        if columns is not None:
+            columns = [self.index_column] + list(columns)
+        df = pd.read_feather(self.get_path(path, name), columns=columns)
+        return df.set_index(self.index_column).rename_axis(None)
+
+    def iter_chunks(self, path, name, chunk_size):
+        # Record batches (of 64K rows by default) are read one at a time.
+        with pa.memory_map(self.get_path(path, name)) as source:
+            reader = pa.ipc.open_file(source)
+            batches = (pa.Table.from_batches([reader.get_batch(i)]) for i in range(reader.num_record_batches))
+            for table in slice_tables(batches, chunk_size):
+                yield table.to_pandas().set_index(self.index_column).rename_axis(None)
+
+
+class NumpyStorage(MetricsStorage):
+    """Stores metrics as raw NumPy arrays (`.npy` files), which are memory-mapped when loaded.
+
+    Snapshot and object names are stored in a small JSON sidecar next to each array. Loading does not copy nor
+    deserialize anything: dataframes are views of read-only memory maps, whose pages are read from disk on access and
+    shared through the OS page cache by all processes reading the same metrics. Only numeric and boolean metrics can be
+    stored. Boolean metrics with missing values are stored as floats (NaN being missing), and converted back on load.
+
+    Each save writes a new array file, named after a random version, and the sidecar names the array it describes.
+    The sidecar is replaced last, in one atomic step, so that an array is never read along with the labels of another.
+    """
+
+    extension = '.npy'
+    sidecar_extension = '.labels.json'
+
+    def list_metrics(self, path):
+        return sorted(filename[:-len(self.sidecar_extension)] for filename in os.listdir(path)
+                      if filename.endswith(self.sidecar_extension))
+
+    def get_path(self, path, name):
+        """Path of the sidecar file in which snapshot and object names of metrics `name` are stored, along with the
+        name of its array file."""
+        return os.path.join(path, name + self.sidecar_extension)
+
+    def save(self, df, path, name):
+        df = restore_bool_dtype(df)
+        nullable = any(isinstance(dtype, pd.BooleanDtype) for dtype in df.dtypes)
+        values = df.to_numpy(dtype=float, na_value=np.nan) if nullable else df.to_numpy()
+        if values.dtype == object:
+            raise TypeError("Metrics {} is neither numeric nor boolean, and cannot be stored as an array.".format(name))
+        version = uuid.uuid4().hex
+        array_name = "{}.{}{}".format(name, version, self.extension)
+        with open(os.path.join(path, array_name), 'wb') as f:
+            np.save(f, values)
+        previous = self._read_labels(path, name) if os.path.exists(self.get_path(path, name)) else None
+        labels = {"array": array_name, "index": df.index.tolist(), "columns": df.columns.tolist(),
+                  "nullable_bool": nullable}
+        tmp_path = "{}.{}.tmp".format(self.get_path(path, name), version)
+        with open(tmp_path, 'w') as f:
+            json.dump(labels, f)
+        os.replace(tmp_path, self.get_path(path, name))
+        # Memory maps of the previous array remain valid after it is removed.
+        if previous is not None:
+            self._remove_array(path, previous)
+
+    def load(self, path, name, columns=None):
+        values, labels = self._load(path, name)
+        df_columns = pd.Index(labels["columns"])
+        if columns is not None:
+            positions = df_columns.get_indexer([c for c in columns if c in df_columns])
+            values, df_columns = values[:, positions], df_columns[positions]
+        return self._to_frame(values, labels["index"], df_columns, labels["nullable_bool"])
+
+    def iter_chunks(self, path, name, chunk_size):
+        values, labels = self._load(path, name)
+        for start in range(0, values.shape[0], chunk_size):
+            yield self._to_frame(values[start:start + chunk_size], labels["index"][start:start + chunk_size],
+                                 labels["columns"], labels["nullable_bool"])
+
+    def remove(self, path, name):
+        labels = self._read_labels(path, name)
+        os.remove(self.get_path(path, name))
+        self._remove_array(path, labels)
+
+    def _read_labels(self, path, name):
+        with open(self.get_path(path, name), 'r') as f:
+            return json.load(f)
+
+    def _remove_array(self, path, labels):
+        try:
+            os.remove(os.path.join(path, labels["array"]))
+        except FileNotFoundError:
+            pass
+
+    def _load(self, path, name):
+        """Memory-maps the array of metrics `name`, along with its labels.
+
+        If the array has been removed in the meantime by a concurrent save, the new sidecar is read.
+        """
+        labels = self._read_labels(path, name)
+        while True:
+            try:
+                return np.load(os.path.join(path, labels["array"]), mmap_mode='r'), labels
+            except FileNotFoundError:
+                current = self._read_labels(path, name)
+                if current["array"] == labels["array"]:
+                    raise
+                labels = current
+
+    def _to_frame(self, values, index, columns, nullable_bool):
+        df = pd.DataFrame(values, index=index, columns=columns, copy=False)
+        return df.astype('boolean') if nullable_bool else df
+
+
+def get_storage(identifier):
+    if identifier == 'CSVStorage':
+        return CSVStorage()
+    elif identifier == 'ParquetStorage':
+        return ParquetStorage()
+    elif identifier == 'FeatherStorage':
+        return FeatherStorage()
+    elif identifier == 'NumpyStorage':
+        return NumpyStorage()
+    else:
+        raise NotImplementedError
+
+
+def find_storage(path):
+    """Returns the storage backend of metrics stored in `path`, or None if there are none."""
+    for identifier in ['CSVStorage', 'ParquetStorage', 'FeatherStorage', 'NumpyStorage']:
+        storage = get_storage(identifier)
+        if storage.list_metrics(path):
+            return storage
+    return None
+
+
+def convert_metrics(path, source, target, delete_source=False):
+    """Converts all metrics stored in `path` from a storage backend to another, e.g. to convert CSV caches."""
+    for name in source.list_metrics(path):
+        target.save(source.load(path, name), path, name)
+        if delete_source:
+            source.remove(path, name)
+
+
+def slice_tables(tables, chunk_size):
+    """Regroups Arrow tables with the same schema (e.g. parts of a file) into tables of `chunk_size` rows.
+
+    Only the last table may be smaller. Tables are sliced without copies.
+    """
+    pending = None
+    for table in tables:
+        pending = table if pending is None else pa.concat_tables([pending, table])
+        while pending.num_rows >= chunk_size:
+            yield pending.slice(0, chunk_size)
+            pending = pending.slice(chunk_size)
+    if (pending is not None) and pending.num_rows:
+        yield pending
+
+
+def restore_bool_dtype(df):
+    """Casts metrics tables that only contain booleans to `bool`, or to the nullable `boolean` if values are missing.
+
+    Boolean tables get an `object` dtype whenever a value is missing (e.g. after merging or reading a CSV file).
+    """
+    if any(not (pd.api.types.is_bool_dtype(dtype) or dtype == object) for dtype in df.dtypes):
+        return df
+    if all(pd.api.types.is_bool_dtype(dtype) for dtype in df.dtypes):
+        return df if df.notna().all().all() else df.astype('boolean')
+    values = df.to_numpy(dtype=object)
+    isna = pd.isna(values)
+    if not all(isinstance(v, (bool, np.bool_)) for v in values[~isna]):
+        return df
+    return df.astype('boolean') if isna.any() else df.astype(bool)
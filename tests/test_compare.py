@@ -0,0 +1,156 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from powerdata_view.compare import aggregate_versions, aggregate_versions_chunked, read_chunks, OBJECT_BUFFER_SIZE
+from powerdata_view.plot import FloatSummary
+
+
+def float_versions():
+    """Versions of a float metrics whose snapshots and objects partially overlap, with missing values."""
+    rng = np.random.default_rng(0)
+    a = pd.DataFrame(rng.normal(size=(4, 3)), index=["s0", "s1", "s2", "s3"], columns=["o0", "o1", "o2"])
+    a.iloc[1, 2] = np.nan
+    b = pd.DataFrame(rng.normal(size=(3, 3)), index=["s1", "s3", "s4"], columns=["o0", "o2", "o3"])
+    c = pd.DataFrame(rng.normal(size=(4, 3)), index=["s0", "s1", "s2", "s3"], columns=["o0", "o1", "o2"])
+    return {"A": a, "B": b, "C": c}
+
+
+def reference_aggregates(metrics_name, df_dict, focus):
+    """Aggregates built version by version with pandas, as they were before versions were aligned at once."""
+    first = next(iter(df_dict.values()))
+    if focus == "all":
+        return {metrics_name: pd.concat([df.stack().rename(version) for version, df in df_dict.items()], axis=1)}
+    elif focus == "snapshot":
+        return {'{} - {}'.format(metrics_name, snapshot): pd.DataFrame(
+            {version: df.loc[snapshot] if snapshot in df.index else np.nan for version, df in df_dict.items()})
+            for snapshot in first.index}
+    return {'{} - {}'.format(metrics_name, name): pd.DataFrame(
+        {version: df[name] if name in df.columns else np.nan for version, df in df_dict.items()})
+        for name in first.columns}
+
+
+@pytest.mark.parametrize("focus", ["all", "snapshot", "object"])
+def test_aggregates_match_per_version_reference(focus):
+    """Aggregates of aligned versions hold the same values as those built version by version, missing ones as NaN."""
+    df_dict = float_versions()
+    reference = reference_aggregates("Bus Voltage (p.u.)", df_dict, focus)
+    aggregates = list(aggregate_versions("Bus Voltage (p.u.)", df_dict, focus=focus))
+    assert [name for name, _, _, _ in aggregates] == list(reference.keys())
+
+    all_values = pd.concat([df.stack() for df in df_dict.values()])
+    _min, _max = all_values.min(), all_values.max()
+    for name, aggregate, val_range, _ in aggregates:
+        expected = reference[name]
+        if focus == "all":
+            aggregate = aggregate.sort_index()
+            expected = expected.sort_index()
+        else:
+            # Objects (or snapshots) of other versions appear as missing values.
+            expected = expected.reindex(aggregate.index)
+        pd.testing.assert_frame_equal(aggregate, expected, check_names=False)
+        np.testing.assert_allclose(val_range, [_min - 0.1 * (_max - _min), _max + 0.1 * (_max - _min)])
+
+
+def test_bool_aggregates_and_row_counts():
+    """Boolean aggregates keep a boolean dtype, nullable if values are missing, and rows are counted per version."""
+    a = pd.DataFrame({"0": [True, False, True]}, index=["s0", "s1", "s2"])
+    b = pd.DataFrame({"0": [False, True]}, index=["s0", "s2"])
+    (_, aggregate, _, n_rows), = aggregate_versions("Snapshots with Illicit Voltage", {"A": a, "B": b},
+                                                    n_samples={"A": 3, "B": 4})
+    assert all(isinstance(dtype, pd.BooleanDtype) for dtype in aggregate.dtypes)
+    assert aggregate["A"].tolist() == [True, False, True]
+    assert aggregate["B"].isna().tolist() == [False, True, False]
+    assert n_rows.to_dict() == {"A": 3, "B": 4}
+
+    (_, aggregate, _, _), = aggregate_versions("Snapshots with Illicit Voltage", {"A": a, "B": a.copy()})
+    assert (aggregate.dtypes == bool).all()
+
+
+def large_float_versions(n_snapshots):
+    """Versions of a float metrics over `n_snapshots` snapshots, with snapshots and objects missing from some versions,
+    and missing values. Snapshots are listed in the same order by all versions, as they are stored."""
+    rng = np.random.default_rng(1)
+    snapshots = ["s{:05d}".format(i) for i in range(n_snapshots)]
+    a = pd.DataFrame(rng.normal(size=(n_snapshots, 4)), index=snapshots, columns=["o0", "o1", "o2", "o3"])
+    a.iloc[::11, 1] = np.nan
+    b = pd.DataFrame(rng.lognormal(size=(n_snapshots // 2, 3)), index=snapshots[::2], columns=["o0", "o2", "o4"])
+    c = pd.DataFrame(rng.normal(1., 2., size=(n_snapshots, 4)), index=snapshots, columns=["o0", "o1", "o2", "o3"])
+    return {"A": a, "B": b, "C": c}
+
+
+def chunked_aggregates(df_dict, focus, display, statistics, chunk_size, **kwargs):
+    """Aggregates of versions read by chunks, mapped by name to their accumulator, range of values and row counts."""
+    chunks = partial(read_chunks, {"Metrics": df_dict}, "Metrics", chunk_size)
+    n_samples = {version: 1000 for version in df_dict}
+    aggregates = aggregate_versions_chunked("Metrics", chunks, focus=focus, n_samples=n_samples, display=display,
+                                            statistics=statistics, **kwargs)
+    return {name: (accumulator, val_range, n_rows) for name, accumulator, val_range, n_rows in aggregates}
+
+
+def quartile_rank_error(aggregate, quartiles):
+    """Largest distance between quartile levels and the ranks (as a share of values) of estimated quartiles."""
+    q, errors = np.array([0.25, 0.5, 0.75]), []
+    for version in aggregate.columns:
+        values = np.sort(aggregate[version].dropna().to_numpy(dtype=float))
+        estimates = quartiles[version].to_numpy()
+        low = np.searchsorted(values, estimates, side='left') / len(values)
+        high = np.searchsorted(values, estimates, side='right') / len(values)
+        errors.append(np.maximum(0., np.maximum(low - q, q - high)).max())
+    return max(errors)
+
+
+@pytest.mark.parametrize("focus", ["all", "object"])
+@pytest.mark.parametrize("n_snapshots", [200, 5000])
+def test_chunked_summaries_match_in_memory_within_tolerance(focus, n_snapshots):
+    """Summary tables and plots rendered from chunks match those of aggregates held in memory, within the tolerance
+    stated in the README: statistics up to rounding, quartiles exactly within sketch buffers and within 2e-3 in rank
+    beyond, histograms exactly, and boxplot whiskers and fliers exactly as long as quartiles are."""
+    df_dict = large_float_versions(n_snapshots)
+    in_memory = {name: (aggregate, val_range, n_rows) for name, aggregate, val_range, n_rows in
+                 aggregate_versions("Metrics", df_dict, focus=focus, n_samples={version: 1000 for version in df_dict})}
+    tables = chunked_aggregates(df_dict, focus, "table", "summary", 128)
+    plots = chunked_aggregates(df_dict, focus, "plot", "summary", 128)
+    assert list(tables) == list(plots) == list(in_memory)
+
+    buffer_size = 10000 if focus == "all" else OBJECT_BUFFER_SIZE
+    for name, (aggregate, val_range, n_rows) in in_memory.items():
+        accumulator, chunked_range, chunked_n_rows = tables[name]
+        np.testing.assert_allclose(chunked_range, val_range, rtol=1e-12)
+        pd.testing.assert_series_equal(chunked_n_rows, n_rows)
+        summary, expected = accumulator.statistics.summary(), aggregate.describe()
+        moments = ["count", "mean", "std", "min", "max"]
+        pd.testing.assert_frame_equal(summary.loc[moments], expected.loc[moments], rtol=1e-12)
+        exact = aggregate.count().max() <= buffer_size
+        if exact:
+            pd.testing.assert_frame_equal(summary, expected, rtol=1e-12)
+        else:
+            assert quartile_rank_error(aggregate, summary.loc[["25%", "50%", "75%"]]) <= 2e-3
+
+        summary, expected = FloatSummary.from_accumulator(plots[name][0]), FloatSummary(aggregate, val_range)
+        for version in aggregate.columns:
+            np.testing.assert_array_equal(summary.counts[version], expected.counts[version])
+            np.testing.assert_allclose(summary.edges[version], expected.edges[version], rtol=1e-12)
+            if exact:
+                stats, expected_stats = summary.boxplot_stats[version], expected.boxplot_stats[version]
+                for key in ["mean", "q1", "med", "q3", "whislo", "whishi", "cilo", "cihi"]:
+                    np.testing.assert_allclose(stats[key], expected_stats[key], rtol=1e-12)
+                np.testing.assert_array_equal(np.sort(stats["fliers"]), np.sort(expected_stats["fliers"]))
+
+
+def test_chunked_correlations_and_bool_counts_match_in_memory():
+    """Correlation tables and boolean counts computed from chunks match those of aggregates held in memory."""
+    df_dict = large_float_versions(1000)
+    (_, aggregate, _, _), = aggregate_versions("Metrics", df_dict)
+    accumulator, _, _ = chunked_aggregates(df_dict, "all", "table", "correlation", 100)["Metrics"]
+    pd.testing.assert_frame_equal(accumulator.statistics.correlation(), aggregate.corr(), rtol=1e-10, atol=1e-12)
+
+    bool_dict = {version: df > 0.5 for version, df in df_dict.items()}
+    n_samples = {version: 1000 for version in df_dict}
+    (_, aggregate, _, n_rows), = aggregate_versions("Metrics", bool_dict, n_samples=n_samples)
+    accumulator, _, chunked_n_rows = chunked_aggregates(bool_dict, "all", "table", "summary", 100)["Metrics"]
+    pd.testing.assert_series_equal(accumulator.count(), aggregate.count().astype(float))
+    pd.testing.assert_series_equal(accumulator.sum(), aggregate.sum().astype(float))
+    pd.testing.assert_series_equal(chunked_n_rows, n_rows)
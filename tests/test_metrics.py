@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from powerdata_view.metrics import compute_metrics, compute_save_metrics, load_metrics, load_status
+from powerdata_view.metrics_processor.interface import MetricsProcessorInterface
+from powerdata_view.metrics_processor.pandapower import PandaPowerMetricsProcessor
+
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "example_data", "dataset_1")
+
+
+def copy_samples(data_dir, n_samples):
+    """Copies the first `n_samples` samples of the example dataset to `data_dir`."""
+    for file in sorted(os.listdir(EXAMPLE_DIR))[:n_samples]:
+        shutil.copy(os.path.join(EXAMPLE_DIR, file), os.path.join(data_dir, file))
+
+
+class ToyMetricsProcessor(MetricsProcessorInterface):
+    """Processor of toy samples (JSON lists of values), which records the samples it loads.
+
+    Samples listed in `diverging` fail their power flow, and values are multiplied by `scale`, which is a setting.
+    """
+
+    metrics_dict = {}
+
+    def __init__(self, scale=1., diverging=()):
+        super().__init__()
+        self.scale = scale
+        self.diverging = diverging
+        self.loaded = []
+        self.metrics_dict = {"Values": self.values}
+
+    def get_settings(self):
+        return {"scale": self.scale}
+
+    def load_power_grid(self, filepath):
+        self.loaded.append(os.path.basename(filepath))
+        with open(filepath, 'r') as f:
+            return {"name": os.path.basename(filepath), "values": json.load(f)}
+
+    def run_powerflow(self, power_grid):
+        if power_grid["name"] in self.diverging:
+            raise Exception("Power flow diverged")
+
+    def values(self, power_grid):
+        return self.scale * np.array(power_grid["values"], dtype=float), ["a", "b"]
+
+
+def write_sample(data_dir, file, values):
+    with open(os.path.join(data_dir, file), 'w') as f:
+        json.dump(values, f)
+
+
+def compute_toy_metrics(data_dir, metrics_processor, **kwargs):
+    """Updates the cached metrics of `data_dir`, and returns them along with the files loaded by the processor."""
+    compute_save_metrics(data_dir, metrics_processor, "Toy", **kwargs)
+    metrics_dir = os.path.join(data_dir, "powerdata_view", "Toy")
+    return load_metrics(metrics_dir)["Values"].sort_index(), metrics_processor.loaded
+
+
+def test_manifest_tracks_added_modified_and_deleted_samples(tmp_path):
+    """Only new and modified samples are processed, and rows of deleted samples are dropped."""
+    for i in range(3):
+        write_sample(tmp_path, "sample_{}.json".format(i), [i, i])
+    df, loaded = compute_toy_metrics(tmp_path, ToyMetricsProcessor())
+    assert loaded == ["sample_0.json", "sample_1.json", "sample_2.json"]
+
+    os.remove(os.path.join(tmp_path, "sample_0.json"))
+    write_sample(tmp_path, "sample_1.json", [10, 10])
+    write_sample(tmp_path, "sample_3.json", [3, 3])
+    # Touching a file without changing its content does not make it modified.
+    os.utime(os.path.join(tmp_path, "sample_2.json"), ns=(0, 0))
+    df, loaded = compute_toy_metrics(tmp_path, ToyMetricsProcessor())
+    assert loaded == ["sample_1.json", "sample_3.json"]
+    assert df.index.tolist() == ["sample_1", "sample_2", "sample_3"]
+    np.testing.assert_array_equal(df["a"].values, [10., 2., 3.])
+
+    _, loaded = compute_toy_metrics(tmp_path, ToyMetricsProcessor())
+    assert loaded == []
+
+
+def test_failed_samples_are_retried(tmp_path):
+    """Samples that diverged are processed again on the next run, unless `retry_failed` is False."""
+    for i in range(2):
+        write_sample(tmp_path, "sample_{}.json".format(i), [i, i])
+    df, _ = compute_toy_metrics(tmp_path, ToyMetricsProcessor(diverging=("sample_1.json",)))
+    assert df.index.tolist() == ["sample_0"]
+    status = load_status(os.path.join(tmp_path, "powerdata_view", "Toy"))["status"]
+    assert status.tolist() == ["converged", "diverged"]
+
+    _, loaded = compute_toy_metrics(tmp_path, ToyMetricsProcessor(), retry_failed=False)
+    assert loaded == []
+    df, loaded = compute_toy_metrics(tmp_path, ToyMetricsProcessor())
+    assert loaded == ["sample_1.json"]
+    assert df.index.tolist() == ["sample_0", "sample_1"]
+
+
+def test_settings_change_recomputes_metrics(tmp_path):
+    """All samples are processed again when settings of the metrics processor change."""
+    for i in range(2):
+        write_sample(tmp_path, "sample_{}.json".format(i), [i, i])
+    compute_toy_metrics(tmp_path, ToyMetricsProcessor())
+    df, loaded = compute_toy_metrics(tmp_path, ToyMetricsProcessor(scale=2.))
+    assert loaded == ["sample_0.json", "sample_1.json"]
+    np.testing.assert_array_equal(df["a"].values, [0., 2.])
+
+
+def test_parallel_metrics_match_serial(tmp_path):
+    """Metrics computed by a pool of workers are identical to serial ones, rows being kept in the order of files."""
+    copy_samples(tmp_path, 4)
+    metrics_processor = PandaPowerMetricsProcessor()
+    serial_status, parallel_status = {}, {}
+    serial = compute_metrics(tmp_path, metrics_processor, status_dict=serial_status)
+    parallel = compute_metrics(tmp_path, metrics_processor, n_workers=2, chunk_size=1, status_dict=parallel_status)
+    assert serial.keys() == parallel.keys()
+    for name in serial:
+        pd.testing.assert_frame_equal(serial[name], parallel[name])
+    assert {file: status["status"] for file, status in serial_status.items()} == \
+           {file: status["status"] for file, status in parallel_status.items()}
@@ -0,0 +1,72 @@
+import os
+import shutil
+
+import numpy as np
+import pandapower as pp
+
+from powerdata_view.metrics_processor.pandapower import PandaPowerMetricsProcessor
+
+
+EXAMPLE_SAMPLE = os.path.join(os.path.dirname(__file__), "..", "example_data", "dataset_1", "sample_000.json")
+
+
+def test_recycled_powerflow_converges(tmp_path):
+    """Samples that share the structure of the previous one are simulated on recycled structures, and converge."""
+    first = os.path.join(tmp_path, "sample_000.json")
+    second = os.path.join(tmp_path, "sample_001.json")
+    shutil.copy(EXAMPLE_SAMPLE, first)
+    power_grid = pp.from_json(first)
+    power_grid.load.p_mw *= 1.05
+    power_grid.load.q_mvar *= 1.05
+    pp.to_json(power_grid, second)
+
+    metrics_processor = PandaPowerMetricsProcessor(reuse_structure=True)
+    metrics_names = ["Bus Voltage (p.u.)"]
+    _, _, first_status = metrics_processor.process_sample(first, metrics_names)
+    _, row, second_status = metrics_processor.process_sample(second, metrics_names)
+    assert first_status["status"] == "converged"
+    assert second_status["status"] == "converged"
+    assert second_status["iterations"] is not None
+
+    # Recycled results match those of a full power flow.
+    pp.runpp(power_grid, init='results', enforce_q_lims=True, delta_q=0.)
+    values, _ = row["Bus Voltage (p.u.)"]
+    np.testing.assert_allclose(values, power_grid.res_bus.vm_pu.values, atol=1e-8)
+
+
+
+
+def test_recycled_powerflow_matches_full_powerflow_at_q_limits(tmp_path):
+    """Samples give the same results and number of iterations with and without reused structures, both being
+    initialized from the results stored in the sample, including when a generator reaches its reactive limit (its PV
+    bus being switched to PQ) and for the samples that follow it."""
+    first = os.path.join(tmp_path, "sample_000.json")
+    shutil.copy(EXAMPLE_SAMPLE, first)
+    power_grid = pp.from_json(first)
+    # Stored results differ from the solution of the previous sample, which recycled structures hold.
+    power_grid.res_bus["vm_pu"] = 1.
+    power_grid.res_bus["va_degree"] = 0.
+    power_grid.load.p_mw *= 1.05
+    power_grid.load.q_mvar *= 1.05
+    second = os.path.join(tmp_path, "sample_001.json")
+    pp.to_json(power_grid, second)
+    # Generator 12 cannot hold a set point 0.1 p.u. lower within its reactive limits.
+    power_grid.load.p_mw /= 1.05
+    power_grid.load.q_mvar /= 1.05
+    power_grid.gen.loc[12, "vm_pu"] -= 0.1
+    third = os.path.join(tmp_path, "sample_002.json")
+    pp.to_json(power_grid, third)
+
+    metrics_names = ["Bus Voltage (p.u.)"]
+    reused_processor = PandaPowerMetricsProcessor(reuse_structure=True)
+    fresh_processor = PandaPowerMetricsProcessor()
+    for sample in [first, second, third, first]:
+        _, reused_row, reused_status = reused_processor.process_sample(sample, metrics_names)
+        _, fresh_row, fresh_status = fresh_processor.process_sample(sample, metrics_names)
+        assert reused_status["status"] == fresh_status["status"] == "converged"
+        assert reused_status["iterations"] == fresh_status["iterations"]
+        np.testing.assert_allclose(reused_row["Bus Voltage (p.u.)"][0], fresh_row["Bus Voltage (p.u.)"][0], atol=1e-8)
+
+    # The bus of generator 12 switched to PQ, and lies above its set point.
+    pp.runpp(power_grid, init='results', enforce_q_lims=True, delta_q=0.)
+    assert power_grid.res_bus.vm_pu[power_grid.gen.bus[12]] > power_grid.gen.vm_pu[12] + 1e-3
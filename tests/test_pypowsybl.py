@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pytest
+
+pp = pytest.importorskip("pypowsybl")
+
+from powerdata_view.metrics_processor.pypowsybl import PyPowSyblMetricsProcessor, SAMPLE_VARIANT
+
+
+def write_samples(data_dir, format='XIIDM', extension='.xiidm'):
+    """Writes two samples of the IEEE 14 network, which only differ in loads and generation set points."""
+    network = pp.network.create_ieee14()
+    first = os.path.join(data_dir, "sample_000" + extension)
+    network.save(first, format=format)
+    loads = network.get_loads()
+    network.update_loads(id=loads.index, p0=1.05 * loads.p0.values, q0=1.05 * loads.q0.values)
+    generators = network.get_generators()
+    network.update_generators(id=generators.index, target_p=1.05 * generators.target_p.values)
+    second = os.path.join(data_dir, "sample_001" + extension)
+    network.save(second, format=format)
+    return [first, second]
+
+
+def assert_same_metrics(reused, fresh):
+    """Checks that two samples processed with and without reused structures give the same metrics and status."""
+    (_, reused_row, reused_status), (_, fresh_row, fresh_status) = reused, fresh
+    assert reused_status["status"] == fresh_status["status"]
+    assert reused_status["status"] in ["converged", "metric_error"]
+    assert reused_row.keys() == fresh_row.keys()
+    for key, (values, names) in fresh_row.items():
+        reused_values, reused_names = reused_row[key]
+        np.testing.assert_array_equal(reused_names, names)
+        np.testing.assert_allclose(reused_values, values, rtol=1e-9, atol=1e-9)
+
+
+def test_reused_variant_matches_fresh_load(tmp_path):
+    """A sample applied as a variant of the base network gives the same metrics as the same sample loaded fresh."""
+    samples = write_samples(tmp_path)
+    reused_processor = PyPowSyblMetricsProcessor(reuse_structure=True)
+    fresh_processor = PyPowSyblMetricsProcessor()
+    for sample in samples:
+        assert_same_metrics(reused_processor.process_sample(sample), fresh_processor.process_sample(sample))
+    # The second sample shares the structure of the first one, and was applied as a variant of the base network.
+    assert reused_processor.base_network.get_working_variant_id() == SAMPLE_VARIANT
+    assert reused_processor.load_power_grid(samples[1]) is reused_processor.base_network
+
+
+@pytest.mark.parametrize("format, extension", [("JIIDM", ".jiidm"), ("BIIDM", ".biidm")])
+def test_other_formats_are_loaded_from_scratch(tmp_path, format, extension):
+    """Samples that are not plain XIIDM files are loaded from scratch when structures are reused."""
+    samples = write_samples(tmp_path, format, extension)
+    reused_processor = PyPowSyblMetricsProcessor(reuse_structure=True)
+    fresh_processor = PyPowSyblMetricsProcessor()
+    for sample in samples:
+        assert_same_metrics(reused_processor.process_sample(sample), fresh_processor.process_sample(sample))
+    assert reused_processor.base_network is None
@@ -0,0 +1,65 @@
+import json
+import os
+
+from powerdata_view.samples import load_cached_sample, ingest_samples, get_sample_cache_path, read_sample_entry
+
+
+class RecordingLoader:
+    """Loader of JSON samples, which records the files it parses."""
+
+    def __init__(self):
+        self.loaded = []
+
+    def __call__(self, filepath):
+        self.loaded.append(os.path.basename(filepath))
+        with open(filepath, 'r') as f:
+            return json.load(f)
+
+
+def write_sample(data_dir, file, values):
+    with open(os.path.join(data_dir, file), 'w') as f:
+        json.dump(values, f)
+    return os.path.join(data_dir, file)
+
+
+def test_touched_sample_is_refreshed_without_parsing(tmp_path):
+    """A source whose modification time changed but not its content is read from the cache, whose entry is updated."""
+    filepath = write_sample(tmp_path, "sample_0.json", [1, 2])
+    loader = RecordingLoader()
+    assert load_cached_sample(filepath, loader, "toy") == [1, 2]
+    os.utime(filepath, ns=(0, 0))
+    assert load_cached_sample(filepath, loader, "toy") == [1, 2]
+    assert loader.loaded == ["sample_0.json"]
+    assert read_sample_entry(get_sample_cache_path(filepath, "toy"))["mtime"] == 0
+
+
+def test_replaced_sample_or_new_version_is_parsed_again(tmp_path):
+    """A source replaced by a different content of the same size is parsed again, and so is a source whose cache was
+    built by another version of the loader."""
+    filepath = write_sample(tmp_path, "sample_0.json", [1, 2])
+    loader = RecordingLoader()
+    load_cached_sample(filepath, loader, "toy")
+    stat = os.stat(filepath)
+    write_sample(tmp_path, "sample_0.json", [3, 4])
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert load_cached_sample(filepath, loader, "toy") == [3, 4]
+    assert load_cached_sample(filepath, loader, "toy", version="2") == [3, 4]
+    assert loader.loaded == ["sample_0.json"] * 3
+    assert load_cached_sample(filepath, loader, "toy", version="2") == [3, 4]
+    assert len(loader.loaded) == 3
+
+
+def test_ingest_skips_cached_samples_and_removes_deleted_ones(tmp_path):
+    """Ingesting a dataset only parses samples whose cache is missing or stale, and drops caches of deleted samples."""
+    first = write_sample(tmp_path, "sample_0.json", [0])
+    second = write_sample(tmp_path, "sample_1.json", [1])
+    loader = RecordingLoader()
+    ingest_samples(tmp_path, loader, "toy")
+    assert loader.loaded == ["sample_0.json", "sample_1.json"]
+
+    os.remove(first)
+    write_sample(tmp_path, "sample_2.json", [2])
+    ingest_samples(tmp_path, loader, "toy")
+    assert loader.loaded == ["sample_0.json", "sample_1.json", "sample_2.json"]
+    assert not os.path.exists(get_sample_cache_path(first, "toy"))
+    assert os.path.exists(get_sample_cache_path(second, "toy"))
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from powerdata_view.statistics import QuantileSketch, compute_statistics, iter_chunks
+
+QUANTILES = np.array([0.001, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 0.999])
+
+# Bound on the rank error of quantiles estimated beyond the buffer of sketches, as stated in the README.
+RANK_TOLERANCE = 2e-3
+
+
+def distributions(n_values):
+    """Values of several distributions: skewed, with many ties, and sorted (e.g. snapshots stored in order)."""
+    rng = np.random.default_rng(0)
+    return {"normal": rng.normal(size=n_values), "lognormal": rng.lognormal(size=n_values),
+            "ties": rng.integers(0, 20, n_values).astype(float), "sorted": np.sort(rng.normal(size=n_values))}
+
+
+def rank_error(values, q, estimates):
+    """Distance between quantile levels `q` and the range of ranks (as a share of values) of their estimates."""
+    values = np.sort(values)
+    low = np.searchsorted(values, estimates, side='left') / len(values)
+    high = np.searchsorted(values, estimates, side='right') / len(values)
+    return np.maximum(0., np.maximum(low - q, q - high))
+
+
+def sketch_of(values, chunk_size):
+    sketch = QuantileSketch()
+    for start in range(0, len(values), chunk_size):
+        sketch.update(values[start:start + chunk_size])
+    return sketch
+
+
+@pytest.mark.parametrize("name", ["normal", "lognormal", "ties", "sorted"])
+def test_quantiles_are_exact_within_buffer(name):
+    """Up to `buffer_size` values, quantiles match numpy.quantile, whatever the chunks the values are added by."""
+    values = distributions(10000)[name]
+    np.testing.assert_allclose(sketch_of(values, 999).quantile(QUANTILES), np.quantile(values, QUANTILES),
+                               rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("name", ["normal", "lognormal", "ties", "sorted"])
+@pytest.mark.parametrize("chunk_size", [1000, 65536])
+def test_quantile_rank_error_is_bounded(name, chunk_size):
+    """Beyond the buffer, estimated quantiles lie within the stated rank error, including when sketches of separate
+    parts of the values are merged (as chunks rendered by several workers)."""
+    values = distributions(200000)[name]
+    assert rank_error(values, QUANTILES, sketch_of(values, chunk_size).quantile(QUANTILES)).max() <= RANK_TOLERANCE
+
+    parts = [sketch_of(part, chunk_size) for part in np.array_split(values, 4)]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    assert rank_error(values, QUANTILES, merged.quantile(QUANTILES)).max() <= RANK_TOLERANCE
+
+
+def test_summary_matches_describe():
+    """Statistics computed over chunks with missing values match `DataFrame.describe` when quantiles are exact."""
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(rng.normal(size=(3000, 3)), columns=["A", "B", "C"])
+    df.iloc[::7, 1] = np.nan
+    summary = compute_statistics(iter_chunks(df, 256), df.columns).summary()
+    pd.testing.assert_frame_equal(summary, df.describe(), rtol=1e-12)
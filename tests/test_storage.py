@@ -0,0 +1,111 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from powerdata_view.storage import CSVStorage, ParquetStorage, FeatherStorage, NumpyStorage, convert_metrics, \
+    find_storage
+
+STORAGES = [CSVStorage, ParquetStorage, FeatherStorage, NumpyStorage]
+
+
+def metrics_tables():
+    """Float, boolean and boolean-with-missing-values tables, as produced by metrics processors."""
+    index = ["sample_{}".format(i) for i in range(5)]
+    floats = pd.DataFrame({"bus 1": [1., 1.02, np.nan, 0.98, 1.01], "bus 2": [0.5, 0.25, 1., -1., 3.]}, index=index)
+    bools = pd.DataFrame({"0": [True, False, False, True, True]}, index=index)
+    # Merging tables of samples with different objects leaves missing values in object columns.
+    nullable_bools = pd.DataFrame({"line 1": [True, None, False, True, False],
+                                   "line 2": [False, False, None, None, True]}, index=index, dtype=object)
+    return {"Bus Voltage (p.u.)": floats, "Snapshots with Illicit Voltage": bools,
+            "Lines with Illicit Current": nullable_bools}
+
+
+@pytest.mark.parametrize("storage_class", STORAGES)
+def test_round_trip(tmp_path, storage_class):
+    """Tables are read back as written, boolean tables with missing values getting the nullable `boolean` dtype."""
+    storage = storage_class()
+    for name, df in metrics_tables().items():
+        storage.save(df, tmp_path, name)
+    assert storage.list_metrics(tmp_path) == sorted(metrics_tables().keys())
+
+    tables = metrics_tables()
+    pd.testing.assert_frame_equal(storage.load(tmp_path, "Bus Voltage (p.u.)"), tables["Bus Voltage (p.u.)"])
+    loaded = storage.load(tmp_path, "Snapshots with Illicit Voltage")
+    assert loaded.dtypes.iloc[0] == bool
+    pd.testing.assert_frame_equal(loaded, tables["Snapshots with Illicit Voltage"])
+    loaded = storage.load(tmp_path, "Lines with Illicit Current")
+    assert all(isinstance(dtype, pd.BooleanDtype) for dtype in loaded.dtypes)
+    pd.testing.assert_frame_equal(loaded, tables["Lines with Illicit Current"].astype('boolean'))
+
+
+@pytest.mark.parametrize("storage_class", STORAGES)
+def test_columns_and_chunks(tmp_path, storage_class):
+    """A subset of columns can be read, and chunks of snapshots add up to the whole table."""
+    storage = storage_class()
+    df = metrics_tables()["Bus Voltage (p.u.)"]
+    storage.save(df, tmp_path, "Bus Voltage (p.u.)")
+    pd.testing.assert_frame_equal(storage.load(tmp_path, "Bus Voltage (p.u.)", columns=["bus 2"]), df[["bus 2"]])
+    chunks = list(storage.iter_chunks(tmp_path, "Bus Voltage (p.u.)", 2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks), df)
+
+    storage.remove(tmp_path, "Bus Voltage (p.u.)")
+    assert storage.list_metrics(tmp_path) == []
+
+
+def test_convert_metrics_keeps_source(tmp_path):
+    """Converting a cache writes the target backend, and only deletes the source files if asked to."""
+    for name, df in metrics_tables().items():
+        CSVStorage().save(df, tmp_path, name)
+    assert isinstance(find_storage(tmp_path), CSVStorage)
+    convert_metrics(tmp_path, CSVStorage(), ParquetStorage())
+    assert ParquetStorage().list_metrics(tmp_path) == CSVStorage().list_metrics(tmp_path)
+    convert_metrics(tmp_path, ParquetStorage(), FeatherStorage(), delete_source=True)
+    assert ParquetStorage().list_metrics(tmp_path) == []
+    pd.testing.assert_frame_equal(FeatherStorage().load(tmp_path, "Snapshots with Illicit Voltage"),
+                                  metrics_tables()["Snapshots with Illicit Voltage"])
+
+
+def test_numpy_storage_swaps_sidecar_last(tmp_path):
+    """Each save writes a new array named by the sidecar, and removes the previous one once the sidecar is replaced."""
+    storage = NumpyStorage()
+    df = metrics_tables()["Bus Voltage (p.u.)"]
+    storage.save(df, tmp_path, "Bus Voltage (p.u.)")
+    previous = storage.load(tmp_path, "Bus Voltage (p.u.)")
+    storage.save(df + 1., tmp_path, "Bus Voltage (p.u.)")
+
+    with open(storage.get_path(tmp_path, "Bus Voltage (p.u.)"), 'r') as f:
+        labels = json.load(f)
+    assert sorted(os.listdir(tmp_path)) == sorted([labels["array"], "Bus Voltage (p.u.).labels.json"])
+    assert storage.list_metrics(tmp_path) == ["Bus Voltage (p.u.)"]
+    pd.testing.assert_frame_equal(storage.load(tmp_path, "Bus Voltage (p.u.)"), df + 1.)
+    # Memory maps of the previous array remain valid.
+    pd.testing.assert_frame_equal(previous, df)
+
+
+def test_numpy_storage_reads_new_sidecar_if_array_is_gone(tmp_path, monkeypatch):
+    """A reader that got the sidecar of a save whose array has since been removed reads the new sidecar."""
+    storage = NumpyStorage()
+    df = metrics_tables()["Bus Voltage (p.u.)"]
+    storage.save(df, tmp_path, "Bus Voltage (p.u.)")
+    stale_labels = storage._read_labels(tmp_path, "Bus Voltage (p.u.)")
+    storage.save(df + 1., tmp_path, "Bus Voltage (p.u.)")
+
+    read_labels = NumpyStorage._read_labels
+    calls = []
+
+    def read_stale_labels_first(self, path, name):
+        calls.append(name)
+        return stale_labels if len(calls) == 1 else read_labels(self, path, name)
+    monkeypatch.setattr(NumpyStorage, "_read_labels", read_stale_labels_first)
+    pd.testing.assert_frame_equal(storage.load(tmp_path, "Bus Voltage (p.u.)"), df + 1.)
+    assert len(calls) == 2
+
+
+def test_numpy_storage_rejects_object_tables(tmp_path):
+    """Only numeric and boolean tables can be stored as arrays."""
+    with pytest.raises(TypeError):
+        NumpyStorage().save(pd.DataFrame({"0": ["a", "b"]}), tmp_path, "Names")
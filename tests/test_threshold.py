@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pandapower as pp
+import pytest
+
+from powerdata_view.metrics_processor.cache import snapshot_context
+from powerdata_view.metrics_processor.pandapower import PandaPowerMetricsProcessor, bus_normalized_voltage, \
+    branch_normalized_current, generator_normalized_reactive_power
+from powerdata_view.metrics_processor.threshold import ThresholdFamily, ThresholdMetrics, SnapshotThresholdMetrics
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "example_data", "dataset_1")
+
+# Authorized range of normalized values for each eps, as written in the former per-eps metrics functions.
+PER_EPS_RANGES = {0.05: (0.05, 0.95), 0.1: (0.1, 0.9), 0.25: (0.25, 0.75), -0.05: (-0.05, 1.05), -0.1: (-0.1, 1.1)}
+
+# Normalized values that lie on or next to the bounds of all ranges.
+VALUES = np.array([-0.2, -0.1, -0.05, 0., 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 1., 1.05, 1.1, 1.2])
+
+
+def test_family_matches_per_eps_comparisons():
+    """Variants of a family flag the same objects as per-eps comparisons, including values on the bounds."""
+    names = np.arange(len(VALUES)).astype(str)
+    family = ThresholdFamily(lambda power_grid: (VALUES, names), list(PER_EPS_RANGES))
+    upper_family = ThresholdFamily(lambda power_grid: (VALUES, names), list(PER_EPS_RANGES), lower=False)
+    snapshot_context.clear()
+    power_grid = object()
+    for eps, (low, high) in PER_EPS_RANGES.items():
+        illicit, illicit_names = ThresholdMetrics(family, eps)(power_grid)
+        np.testing.assert_array_equal(illicit, (VALUES < low) | (VALUES > high))
+        np.testing.assert_array_equal(illicit_names, names)
+        illicit, _ = ThresholdMetrics(upper_family, eps)(power_grid)
+        np.testing.assert_array_equal(illicit, VALUES > high)
+        snapshot_illicit, _ = SnapshotThresholdMetrics([family, upper_family], eps)(power_grid)
+        assert snapshot_illicit == ((VALUES < low) | (VALUES > high)).any()
+    snapshot_context.clear()
+
+
+@pytest.mark.parametrize("sample", ["sample_000.json", "sample_001.json", "sample_003.json"])
+def test_pandapower_variants_match_per_eps_functions(sample):
+    """Eps-variants of PandaPower illicit metrics match the former per-eps functions on example samples."""
+    metrics_processor = PandaPowerMetricsProcessor()
+    power_grid = pp.from_json(os.path.join(EXAMPLE_DIR, sample))
+    metrics_processor.run_powerflow(power_grid)
+    snapshot_context.clear()
+    v, _ = bus_normalized_voltage(power_grid)
+    i, _ = branch_normalized_current(power_grid)
+    q, _ = generator_normalized_reactive_power(power_grid)
+    for eps, (low, high) in PER_EPS_RANGES.items():
+        expected = {
+            "Buses with Illicit Voltage": (v < low) | (v > high),
+            "Branches with Illicit Current": i > high,
+            "Generators with Illicit Reactive Power": (q < low) | (q > high),
+        }
+        for name, illicit in expected.items():
+            key = "{}, eps={}".format(name, eps)
+            if key in metrics_processor.metrics_dict:
+                values, _ = metrics_processor.metrics_dict[key](power_grid)
+                np.testing.assert_array_equal(values, illicit)
+        values, _ = metrics_processor.metrics_dict["Snapshots with Illicit Voltage, eps={}".format(eps)](power_grid)
+        assert values == expected["Buses with Illicit Voltage"].any()
+        if eps != 0.25:
+            values, _ = metrics_processor.metrics_dict["Snapshots with Illicit Values, eps={}".format(eps)](power_grid)
+            assert values == any(illicit.any() for illicit in expected.values())
+    snapshot_context.clear()